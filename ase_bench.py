@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import subprocess
+import tracemalloc
+
+# Headless benchmark for the viewer's update/draw/sidebar loop (SDL dummy driver, synthetic sources, no Aseprite)
+# Usage: python ase_bench.py [--ticks 600] [--scenario npcs_50 ...] [--out bench.json] [--label v43]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+WIN_W, WIN_H, SIDEBAR_W, DT = 1350, 850, 450, 16
+
+SCENARIOS = {
+    "baseline": {},
+    "npcs_10": {"npcs": 10},
+    "npcs_50": {"npcs": 50},
+    "zoom_6": {"npcs": 5, "zoom": 6.0},
+    "hitboxes_off": {"npcs": 10, "hitboxes": False},
+    "afterimages": {"afterimages": True},
+    "bg_4k": {"bg": (3840, 2160)},
+    "crowd_500": {"crowd": 500},
+    "stress": {"npcs": 50, "zoom": 6.0, "afterimages": True, "bg": (3840, 2160)},
+    "native": {"npcs": 10, "native": True},
+    "native_zoom_6": {"npcs": 5, "zoom": 6.0, "native": True},
+    "native_stress": {"npcs": 50, "zoom": 6.0, "afterimages": True, "bg": (3840, 2160), "native": True},
+    "npcs_spread": {"npcs": 100, "spread": 20000},
+    "npcs_spread_nolod": {"npcs": 100, "spread": 20000, "lod": False},
+    "npcs_spread_history": {"npcs": 100, "spread": 20000, "history": True},
+}
+DEFAULTS = {"npcs": 0, "crowd": 0, "zoom": 3.0, "hitboxes": True, "afterimages": False, "bg": None, "native": False, "spread": 0, "lod": True, "history": False}
+
+class BenchKeys(dict):
+    # Stands in for pygame.key.get_pressed(): any key not set reads as released
+    def __getitem__(self, k): return self.get(k, False)
+
+def synthetic_bundle(pygame, seed, slots, frames_per_tag=4, size=(48, 64), canvas=(128, 128)):
+    # One tag per profile slot (so auto_map_profile maps everything), coloured frames and hit/hurt slices
+    rng = random.Random(seed); frames = []; tags = {}; hit_keys = []
+    for t_idx, slot in enumerate(slots):
+        tags[slot] = (t_idx * frames_per_tag, t_idx * frames_per_tag + frames_per_tag - 1)
+        for f in range(frames_per_tag):
+            surf = pygame.Surface(size, pygame.SRCALPHA); col = (rng.randint(60, 255), rng.randint(60, 255), rng.randint(60, 255), 255)
+            pygame.draw.ellipse(surf, col, (0, f, size[0], size[1] - f)); pygame.draw.rect(surf, (20, 20, 20, 255), (size[0]//3, size[1]//4, 6, 6))
+            frames.append({'img': surf, 'ox': -size[0] // 2, 'oy': -size[1], 'duration': 100})
+        if "Attack" in slot: hit_keys.append({'frame': tags[slot][0] + 1, 'bounds': {'x': canvas[0]//2, 'y': canvas[1]//2 - 40, 'w': 40, 'h': 24}})
+    slices = {"hurtbox": [{'frame': 0, 'bounds': {'x': canvas[0]//2 - size[0]//2, 'y': canvas[1]//2 - size[1], 'w': size[0], 'h': size[1]}}], "hitbox": hit_keys}
+    return {'frames': frames, 'tags': tags, 'slices': slices, 'tag_list': sorted(tags), 'orig_w': canvas[0], 'orig_h': canvas[1], 'layer_cels': None}
+
+def build_player(viewer, pygame, sc):
+    player = viewer.AsepritePlayer(); slots = list(viewer.AseProfile("", 0).mappings.keys())
+    player.sources.append(viewer.AseSource("synthetic_player.aseprite", 0, data=synthetic_bundle(pygame, 0, slots), atlas=player.atlas)); player.add_profile("PLAYER", 0)
+    for i in range(sc["npcs"]):
+        sid = len(player.sources); player.sources.append(viewer.AseSource(f"synthetic_npc{i}.aseprite", sid, data=synthetic_bundle(pygame, sid, slots), atlas=player.atlas))
+        player.add_profile(f"NPC_{i+1}", sid, is_npc=True)
+    for ai in player.ai_list:
+        if sc["spread"]: ai.x = ai.prev_x = ai.spawn_x = random.uniform(-sc["spread"] / 2, sc["spread"] / 2) # NPCs over a wide level, most of them far off screen
+    player.lod_enabled = sc["lod"]; player.history_enabled = sc["history"]
+    if sc["crowd"]: player.add_profile("CROWD", 0); player.add_crowd(player.profiles[-1], sc["crowd"])
+    player.zoom = sc["zoom"]; player.show_hitboxes = sc["hitboxes"]; player.vfx_enabled = True; player.native_render = sc["native"]
+    if sc["bg"]:
+        bg = pygame.Surface(sc["bg"]); w, h = sc["bg"]
+        for y in range(0, h, 16): pygame.draw.rect(bg, (y * 255 // h, 80, 255 - y * 255 // h), (0, y, w, 16))
+        player.background.add(viewer.BgLayer(img=bg.convert(), alpha=200))
+    return player
+
+def scripted_input(viewer, pygame, player, tick, sc):
+    # Walk right/left in 2s stretches and fire dashes so afterimages stay alive
+    keys = BenchKeys(); keys[pygame.K_RIGHT if (tick // 120) % 2 == 0 else pygame.K_LEFT] = True
+    if sc["afterimages"] and tick % 20 == 0: player.dash_charges = 2; player.trigger_action(viewer.S_DASH)
+    return keys
+
+def step(viewer, pygame, screen, player, ui, tick, sc, times=None):
+    # Same order as ase_viewer.main(): play area cleared and clipped, retained UI panels, dirty-rect present
+    play_w, play_h = WIN_W - SIDEBAR_W, WIN_H - 70; play_rect = pygame.Rect(0, 0, play_w, WIN_H - 40); keys = scripted_input(viewer, pygame, player, tick, sc)
+    viewer.profiler.frame(); t0 = time.perf_counter(); screen.fill(player.bg_color, play_rect); player.advance(keys, 500, DT)
+    t1 = time.perf_counter(); screen.set_clip(play_rect); player.draw(screen, play_w, play_h); screen.set_clip(None)
+    t2 = time.perf_counter(); ui.draw_topbar(screen, player, play_w, SIDEBAR_W, WIN_H); ui.draw_sidebar(screen, player, play_w, SIDEBAR_W, WIN_H, (0, 0))
+    t3 = time.perf_counter(); ui.present(play_rect); t4 = time.perf_counter()
+    if times is not None:
+        for k, v in (("update", t1 - t0), ("draw", t2 - t1), ("ui", t3 - t2), ("frame", t4 - t0)): times[k].append(v * 1000)
+
+def percentiles(vals):
+    s = sorted(vals)
+    if not s: return {}
+    pick = lambda q: s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+    return {"p50": round(pick(0.5), 4), "p95": round(pick(0.95), 4), "p99": round(pick(0.99), 4), "mean": round(sum(s) / len(s), 4), "max": round(s[-1], 4)}
+
+def run_scenario(viewer, pygame, screen, name, ticks, warmup, alloc_ticks):
+    sc = dict(DEFAULTS, **SCENARIOS[name]); random.seed(0); viewer.profiler.__init__()
+    player = build_player(viewer, pygame, sc); ui = viewer.ViewerUI(); times = {"update": [], "draw": [], "ui": [], "frame": []}
+    for i in range(warmup): step(viewer, pygame, screen, player, ui, i, sc)
+    for i in range(ticks): step(viewer, pygame, screen, player, ui, warmup + i, sc, times)
+    scopes = {name: round(avg, 4) for name, avg, _ in viewer.profiler.summary(ticks) if name != "frame"} # Mean over the last timed ticks (profiler history is bounded)
+    # Separate pass under tracemalloc (it slows everything down): Python-heap bytes per tick; SDL pixel buffers are not traced
+    peaks = []; growth = []; tracemalloc.start()
+    for i in range(alloc_ticks):
+        tracemalloc.reset_peak(); before = tracemalloc.get_traced_memory()[0]
+        step(viewer, pygame, screen, player, ui, warmup + ticks + i, sc)
+        cur, peak = tracemalloc.get_traced_memory(); peaks.append(peak - before); growth.append(cur - before)
+    tracemalloc.stop(); player.reloader.stop()
+    result = {"config": {k: v for k, v in sc.items()}, "ticks": ticks, "frame_ms": percentiles(times["frame"]), "update_ms": percentiles(times["update"]), "draw_ms": percentiles(times["draw"]), "ui_ms": percentiles(times["ui"]),
+              "alloc": {"ticks": alloc_ticks, "peak_bytes_per_tick": percentiles(peaks), "retained_bytes_per_tick": round(sum(growth) / max(1, len(growth)), 1)},
+              "sprite_cache": {"hits": player.sprite_cache.hits, "misses": player.sprite_cache.misses}, "ui_builds": {"topbar": ui.topbar.builds, "sidebar": ui.sidebar.builds, "controls": ui.controls.builds}, "scopes_ms": scopes,
+              "lod": dict(zip(viewer.LOD_NAMES, player.lod_counts))}
+    return result
+
+def git_rev():
+    try: return subprocess.run(["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark for ase_viewer (prints JSON)")
+    parser.add_argument("--ticks", type=int, default=600); parser.add_argument("--warmup", type=int, default=60); parser.add_argument("--alloc-ticks", type=int, default=120)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="repeatable; default runs all")
+    parser.add_argument("--out", help="also write the JSON report to this file"); parser.add_argument("--label", help="free-form tag stored in the report (e.g. a version)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    args = parser.parse_args()
+    if args.list:
+        for name in SCENARIOS: print(f"{name}: {dict(DEFAULTS, **SCENARIOS[name])}")
+        return
+    out_path = os.path.abspath(args.out) if args.out else None
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy"); os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    # ase_viewer resets its log and reads ase_settings.json from the cwd: keep both away from the real project
+    work_dir = tempfile.mkdtemp(prefix="ase_bench_"); os.environ["ASE_DEBUG_LOG"] = os.path.join(work_dir, "ase_debug.log"); sys.path.insert(0, REPO_DIR); os.chdir(work_dir)
+    import pygame
+    pygame.init(); screen = pygame.display.set_mode((WIN_W, WIN_H))
+    import ase_viewer
+    report = {"label": args.label, "git": git_rev(), "python": platform.python_version(), "pygame": pygame.version.ver, "dt_ms": DT, "scenarios": {}}
+    for name in args.scenario or list(SCENARIOS):
+        report["scenarios"][name] = run_scenario(ase_viewer, pygame, screen, name, args.ticks, args.warmup, args.alloc_ticks)
+        print(f"[BENCH] {name}: p50 {report['scenarios'][name]['frame_ms']['p50']:.2f}ms p99 {report['scenarios'][name]['frame_ms']['p99']:.2f}ms", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f: f.write(text)
+    print(text)
+    pygame.quit()
+
+if __name__ == "__main__": main()
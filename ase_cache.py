@@ -0,0 +1,103 @@
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+
+# Content-addressed on-disk cache of decoded sources (no pygame): one file per entry, JSON metadata + raw pixel blobs read back via mmap
+# Entries are written to a temp file and renamed into place, so viewers sharing the directory never see a partial entry;
+# a reader that loses a race with another instance's eviction just gets a miss
+
+MAGIC = b"ASEC"
+VERSION = 2
+HEADER = struct.Struct("<4sIIQ") # magic, version, metadata length, blob area length
+ALIGN = 16
+TMP_MAX_AGE = 3600 # Temp files older than this were left by a crashed writer
+
+def align(n): return (n + ALIGN - 1) // ALIGN * ALIGN
+
+class DecodeCache:
+    def __init__(self, root, max_bytes=512 << 20):
+        self.root = root; self.max_bytes = max_bytes; self.hits = 0; self.misses = 0
+    @staticmethod
+    def digest(data): return hashlib.sha1(data).hexdigest() # Same as file_digest() of a file holding data
+    @staticmethod
+    def file_digest(path):
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""): h.update(chunk)
+        return h.hexdigest()
+    @staticmethod
+    def key(digest, visible_layers, variant=""):
+        return hashlib.sha1(f"{VERSION}|{variant}|{digest}|{json.dumps(sorted(visible_layers))}".encode("utf-8")).hexdigest()
+    def path(self, key): return os.path.join(self.root, key[:2], key + ".asec")
+    def load(self, key, build):
+        # build(meta, view) runs while the entry is mapped; view is a memoryview of the whole file (blob offsets are absolute)
+        # and must not be kept: copy pixels out of it before returning
+        p = self.path(key)
+        try:
+            with open(p, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, version, meta_len, data_len = HEADER.unpack_from(mm, 0); base = align(HEADER.size + meta_len)
+                if magic != MAGIC or version != VERSION or base + data_len != len(mm): raise ValueError("stale or truncated entry")
+                meta = json.loads(mm[HEADER.size:HEADER.size + meta_len].decode("utf-8")); meta["blobs"] = [(base + o, n) for o, n in meta["blobs"]]
+                view = memoryview(mm)
+                try: result = build(meta, view)
+                finally: view.release()
+        except FileNotFoundError: self.misses += 1; return None
+        except Exception:
+            self.misses += 1; self.remove(p); return None
+        try: os.utime(p) # mtime doubles as last-use time for LRU eviction
+        except OSError: pass
+        self.hits += 1
+        return result
+    def store(self, key, meta, blobs):
+        # blobs: list of bytes-like; meta["blobs"] is set to their (offset, length) spans, in the same order, when read back
+        spans = []; pos = 0
+        for b in blobs: spans.append((pos, len(b))); pos = align(pos + len(b))
+        text = json.dumps(dict(meta, blobs=spans)).encode("utf-8"); base = align(HEADER.size + len(text))
+        p = self.path(key); d = os.path.dirname(p)
+        try:
+            os.makedirs(d, exist_ok=True); fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=d)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(HEADER.pack(MAGIC, VERSION, len(text), pos)); f.write(text); f.write(b"\0" * (base - HEADER.size - len(text)))
+                    for (o, n), b in zip(spans, blobs): f.write(b); f.write(b"\0" * (align(n) - n))
+                    f.truncate(base + pos)
+                os.replace(tmp, p)
+            except BaseException:
+                self.remove(tmp); raise
+        except OSError: return False
+        self.evict()
+        return True
+    def entries(self):
+        out = []
+        try: dirs = os.listdir(self.root)
+        except OSError: return out
+        for sub in dirs:
+            try: names = os.listdir(os.path.join(self.root, sub))
+            except OSError: continue
+            for name in names:
+                p = os.path.join(self.root, sub, name)
+                try: st = os.stat(p)
+                except OSError: continue
+                out.append((st.st_mtime, st.st_size, p))
+        return out
+    def evict(self):
+        # Least recently used entries go first until the directory fits max_bytes; files another instance already removed (or has locked) are skipped
+        entries = self.entries(); now = time.time(); live = []
+        for mtime, size, p in entries:
+            if p.endswith(".tmp"):
+                if now - mtime > TMP_MAX_AGE: self.remove(p)
+            else: live.append((mtime, size, p))
+        total = sum(e[1] for e in live); removed = 0
+        for mtime, size, p in sorted(live):
+            if total <= self.max_bytes: break
+            if self.remove(p): total -= size; removed += 1
+        return removed
+    def remove(self, p):
+        try: os.remove(p); return True
+        except OSError: return False
+    def usage(self): return sum(e[1] for e in self.entries() if not e[2].endswith(".tmp"))
+    def stats(self): return f"Disk cache: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Headless batch export: every .aseprite/.ase under a folder -> packed atlas PNG page(s) + JSON metadata per file (SDL dummy driver, no window)
+# Usage: python ase_convert.py SRC_DIR --out OUT_DIR [--jobs 8] [--page-size 2048] [--pad 1] [--all-layers] [--force] [--log FILE]
+# Incremental: OUT_DIR/ase_convert_manifest.json remembers each file's content hash + options; unchanged files are skipped
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMAT_VERSION = 1
+MANIFEST = "ase_convert_manifest.json"
+
+def find_sources(root):
+    out = []
+    for d, dirs, files in os.walk(root):
+        dirs.sort(); out.extend(os.path.join(d, f) for f in sorted(files) if f.lower().endswith((".aseprite", ".ase")))
+    return out
+
+def options_key(args): return f"v{FORMAT_VERSION}|page={args.page_size}|pad={args.pad}|all_layers={args.all_layers}"
+
+def file_key(viewer, buf, args):
+    return hashlib.sha1(f"{viewer.ase_cache.DecodeCache.digest(buf)}|{options_key(args)}".encode("utf-8")).hexdigest()
+
+def pack(viewer, pygame, data, args):
+    # One TextureAtlas per file; pages are cropped to the packed area before saving. Frame order and ox/oy are exactly the viewer's,
+    # and frames with identical pixels point at the same rect (data['frames'] is decode()'s FrameTable)
+    table = data['frames']; atlas = viewer.TextureAtlas(page_size=args.page_size, pad=args.pad); images = atlas.add(0, table.images); pages = atlas.pages; rows = []
+    index = {id(p['surf']): i for i, p in enumerate(pages)}; extent = [[1, 1] for _ in pages]
+    for i, ox, oy, d in zip(table.image, table.ox, table.oy, table.durations):
+        img = images[i]; page = index[id(img.get_parent())]; (x, y), (w, h) = img.get_offset(), img.get_size()
+        extent[page][0] = max(extent[page][0], x + w); extent[page][1] = max(extent[page][1], y + h)
+        rows.append({'page': page, 'x': x, 'y': y, 'w': w, 'h': h, 'ox': ox, 'oy': oy, 'duration': d})
+    return [p['surf'].subsurface((0, 0, *extent[i])) for i, p in enumerate(pages)], rows
+
+def convert(viewer, pygame, path, rel, out_dir, args, buf=None):
+    # buf: the file's bytes the manifest key was computed from, so the outputs match that key even if the file is saved meanwhile
+    t0 = time.perf_counter(); src = viewer.AseSource(path, 0, defer=True); layers, visible = src.read_layers(buf)
+    if args.all_layers: visible = set(layers)
+    data = src.decode(visible, layers, buf)
+    if data is None: raise RuntimeError("decode failed")
+    t1 = time.perf_counter(); pages, rows = pack(viewer, pygame, data, args)
+    t2 = time.perf_counter(); stem = os.path.splitext(rel)[0]; base = os.path.join(out_dir, stem); os.makedirs(os.path.dirname(base), exist_ok=True)
+    names = [os.path.basename(stem) + (f"_{i}" if len(pages) > 1 else "") + ".png" for i in range(len(pages))]
+    for name, surf in zip(names, pages): pygame.image.save(surf, os.path.join(os.path.dirname(base), name))
+    meta = {"source": rel.replace(os.sep, "/"), "format": FORMAT_VERSION, "size": [data['orig_w'], data['orig_h']], "pages": names, "frames": rows,
+            "tags": {name: list(t) for name, t in data['tags'].items()}, "slices": data['slices'], "layers": layers, "visible_layers": sorted(visible)}
+    with open(base + ".json", "w", encoding="utf-8") as f: json.dump(meta, f, indent=1)
+    t3 = time.perf_counter(); outputs = [os.path.relpath(os.path.join(os.path.dirname(base), n), out_dir) for n in names] + [os.path.relpath(base + ".json", out_dir)]
+    return {"frames": len(rows), "pages": len(pages), "outputs": outputs, "decode_ms": (t1 - t0) * 1000, "pack_ms": (t2 - t1) * 1000, "write_ms": (t3 - t2) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a folder of .aseprite files to packed atlas PNGs + JSON metadata (headless)")
+    parser.add_argument("src", help="folder scanned recursively for .aseprite/.ase files"); parser.add_argument("--out", required=True, help="output folder (mirrors the source tree)")
+    parser.add_argument("--jobs", type=int, default=max(2, min(8, os.cpu_count() or 2)), help="worker threads"); parser.add_argument("--page-size", type=int, default=2048); parser.add_argument("--pad", type=int, default=1)
+    parser.add_argument("--all-layers", action="store_true", help="include layers hidden in the file"); parser.add_argument("--force", action="store_true", help="ignore the manifest and convert everything")
+    parser.add_argument("--log", help="conversion log file (default: a new ase_convert_*.log in the temp folder)")
+    args = parser.parse_args()
+    src_dir, out_dir = os.path.abspath(args.src), os.path.abspath(args.out)
+    if not os.path.isdir(src_dir): parser.error(f"not a folder: {args.src}")
+    os.makedirs(out_dir, exist_ok=True); os.environ.setdefault("SDL_VIDEODRIVER", "dummy"); os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    # ase_viewer resets its log on import: point it at this run's own file, so the output folder only gets outputs and earlier logs survive.
+    # The cwd stays the start folder, where the Aseprite path (CLI fallback) is configured
+    log_path = os.path.abspath(args.log) if args.log else os.path.join(tempfile.gettempdir(), time.strftime("ase_convert_%Y%m%d_%H%M%S") + f"_{os.getpid()}.log")
+    os.environ["ASE_DEBUG_LOG"] = log_path; sys.path.insert(0, REPO_DIR)
+    import pygame
+    pygame.init()
+    import ase_viewer
+    manifest_path = os.path.join(out_dir, MANIFEST); manifest = {}
+    if os.path.exists(manifest_path) and not args.force:
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f: manifest = json.load(f)
+        except Exception: manifest = {}
+    t_start = time.perf_counter(); lock = threading.Lock(); results = {}; skipped = []; failed = {}
+    def job(path):
+        rel = os.path.relpath(path, src_dir)
+        try:
+            with open(path, "rb") as f: buf = f.read()
+            key = file_key(ase_viewer, buf, args); old = manifest.get(rel)
+            if old and old.get("key") == key and all(os.path.exists(os.path.join(out_dir, o)) for o in old.get("outputs", [])):
+                with lock: skipped.append(rel)
+                return
+            res = convert(ase_viewer, pygame, path, rel, out_dir, args, buf); res["key"] = key
+            for o in (old or {}).get("outputs", []):
+                if o not in res["outputs"]:
+                    try: os.remove(os.path.join(out_dir, o)) # e.g. a page that is no longer needed
+                    except OSError: pass
+            with lock: results[rel] = res
+        except Exception as e:
+            with lock: failed[rel] = str(e)
+    paths = find_sources(src_dir)
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool: list(pool.map(job, paths))
+    for rel, res in results.items(): manifest[rel] = {"key": res["key"], "outputs": res["outputs"]}
+    for rel in [r for r in manifest if not os.path.exists(os.path.join(src_dir, r))]: del manifest[rel] # Sources deleted since the last run (outputs are left alone)
+    with open(manifest_path, "w", encoding="utf-8") as f: json.dump(manifest, f, indent=1)
+    wall = time.perf_counter() - t_start; total = lambda k: sum(r[k] for r in results.values())
+    print(f"[CONVERT] {len(paths)} files: {len(results)} converted, {len(skipped)} unchanged, {len(failed)} failed in {wall:.2f}s ({args.jobs} workers)")
+    if results:
+        print(f"[CONVERT] {sum(r['frames'] for r in results.values())} frames, {sum(r['pages'] for r in results.values())} pages | decode {total('decode_ms'):.0f}ms, pack {total('pack_ms'):.0f}ms, write {total('write_ms'):.0f}ms (summed over workers)")
+        for rel, r in sorted(results.items(), key=lambda e: -(e[1]['decode_ms'] + e[1]['pack_ms'] + e[1]['write_ms']))[:5]:
+            print(f"[CONVERT]   {rel}: {r['frames']} frames, {r['decode_ms'] + r['pack_ms'] + r['write_ms']:.0f}ms")
+    for rel, err in sorted(failed.items()): print(f"[CONVERT] FAILED {rel}: {err}", file=sys.stderr)
+    print(f"[CONVERT] log: {log_path}")
+    pygame.quit()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__": main()
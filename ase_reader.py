@@ -0,0 +1,167 @@
+import struct
+import zlib
+
+# Native .aseprite / .ase reader (no Aseprite CLI, no pygame)
+# Spec: https://github.com/aseprite/aseprite/blob/main/docs/ase-file-specs.md
+
+HEADER_MAGIC = 0xA5E0
+FRAME_MAGIC = 0xF1FA
+CHUNK_OLD_PALETTE = 0x0004
+CHUNK_OLD_PALETTE_2 = 0x0011
+CHUNK_LAYER = 0x2004
+CHUNK_CEL = 0x2005
+CHUNK_TAGS = 0x2018
+CHUNK_PALETTE = 0x2019
+CHUNK_SLICE = 0x2022
+
+LAYER_VISIBLE = 1
+LAYER_REFERENCE = 64
+LAYER_NORMAL, LAYER_GROUP, LAYER_TILEMAP = 0, 1, 2
+CEL_RAW, CEL_LINKED, CEL_COMPRESSED, CEL_TILEMAP = 0, 1, 2, 3
+
+class AseFormatError(Exception):
+    pass
+
+class _Reader:
+    def __init__(self, data, pos=0):
+        self.data = data; self.pos = pos
+    def unpack(self, fmt):
+        vals = struct.unpack_from("<" + fmt, self.data, self.pos); self.pos += struct.calcsize("<" + fmt)
+        return vals
+    def byte(self): return self.unpack("B")[0]
+    def word(self): return self.unpack("H")[0]
+    def short(self): return self.unpack("h")[0]
+    def dword(self): return self.unpack("I")[0]
+    def long(self): return self.unpack("i")[0]
+    def skip(self, n): self.pos += n
+    def string(self):
+        n = self.word(); s = self.data[self.pos:self.pos+n].decode("utf-8", "replace"); self.pos += n
+        return s
+
+class AseLayer:
+    def __init__(self, index, name, flags, layer_type, child_level, blend_mode, opacity):
+        self.index = index; self.name = name; self.flags = flags; self.type = layer_type; self.child_level = child_level
+        self.blend_mode = blend_mode; self.opacity = opacity; self.parent = None
+    @property
+    def is_visible(self):
+        # Hidden parent groups hide their children, like Aseprite's own export
+        layer = self
+        while layer:
+            if not layer.flags & LAYER_VISIBLE: return False
+            layer = layer.parent
+        return True
+    @property
+    def is_image(self): return self.type != LAYER_GROUP and not self.flags & LAYER_REFERENCE
+
+class AseCel:
+    def __init__(self, layer_index, x, y, opacity, z_index, w=0, h=0, raw=None, compressed=False, link=None):
+        self.layer_index = layer_index; self.x = x; self.y = y; self.opacity = opacity; self.z_index = z_index
+        self.w = w; self.h = h; self._raw = raw; self._compressed = compressed; self.link = link; self._rgba = None
+    def rgba(self, doc):
+        # Decoded lazily and memoized; linked cels are resolved to their source cel by AseFile
+        if self._rgba is None:
+            data = zlib.decompress(self._raw) if self._compressed else self._raw
+            self._rgba = doc.to_rgba(data, self.w * self.h); self._raw = None
+        return self._rgba
+
+class AseFrame:
+    def __init__(self, duration):
+        self.duration = duration; self.cels = {}
+    def ordered_cels(self):
+        # Aseprite draw order: layer index + z-index, ties broken by z-index
+        return sorted(self.cels.values(), key=lambda c: (c.layer_index + c.z_index, c.z_index))
+
+class AseFile:
+    def __init__(self, path=None, data=None):
+        if data is None:
+            with open(path, "rb") as f: data = f.read()
+        self.path = path; self.layers = []; self.frames = []; self.tags = {}; self.slices = {}; self.palette = []
+        self._parse(data)
+    def _parse(self, data):
+        if len(data) < 128: raise AseFormatError("file too small")
+        r = _Reader(data)
+        _size, magic, n_frames, self.width, self.height, self.depth, self.flags = r.unpack("IHHHHHI")
+        if magic != HEADER_MAGIC: raise AseFormatError(f"bad header magic {magic:#x}")
+        if self.depth not in (8, 16, 32): raise AseFormatError(f"unsupported color depth {self.depth}")
+        r.skip(2 + 4 + 4); self.transparent_index = r.byte()
+        r.pos = 128
+        for _ in range(n_frames):
+            start = r.pos; frame_size, magic, old_chunks, duration = r.unpack("IHHH"); r.skip(2); new_chunks = r.dword()
+            if magic != FRAME_MAGIC: raise AseFormatError(f"bad frame magic at {start}")
+            frame = AseFrame(duration); self.frames.append(frame)
+            for _ in range(new_chunks or old_chunks):
+                c_start = r.pos; c_size, c_type = r.unpack("IH")
+                self._parse_chunk(_Reader(data, r.pos), c_type, c_start + c_size, frame)
+                r.pos = c_start + c_size
+            r.pos = start + frame_size
+        self._link_layers(); self._resolve_links()
+    def _parse_chunk(self, r, c_type, end, frame):
+        if c_type == CHUNK_LAYER:
+            flags, l_type, child_level, _dw, _dh, blend, opacity = r.unpack("HHHHHHB"); r.skip(3); name = r.string()
+            if not self.flags & 1: opacity = 255
+            self.layers.append(AseLayer(len(self.layers), name, flags, l_type, child_level, blend, opacity))
+        elif c_type == CHUNK_CEL:
+            layer_index, x, y, opacity, cel_type, z_index = r.unpack("HhhBHh"); r.skip(5)
+            if cel_type == CEL_LINKED: frame.cels[layer_index] = AseCel(layer_index, x, y, opacity, z_index, link=r.word())
+            elif cel_type in (CEL_RAW, CEL_COMPRESSED):
+                w, h = r.unpack("HH")
+                frame.cels[layer_index] = AseCel(layer_index, x, y, opacity, z_index, w, h, r.data[r.pos:end], cel_type == CEL_COMPRESSED)
+            # CEL_TILEMAP needs tileset chunks; tilemap layers are skipped for now
+        elif c_type == CHUNK_TAGS:
+            count = r.word(); r.skip(8)
+            for _ in range(count):
+                t_from, t_to, direction, repeat = r.unpack("HHBH"); r.skip(6 + 3 + 1)
+                self.tags[r.string()] = {'from': t_from, 'to': t_to, 'direction': direction, 'repeat': repeat}
+        elif c_type == CHUNK_SLICE:
+            n_keys, s_flags = r.unpack("II"); r.skip(4); name = r.string(); keys = []
+            for _ in range(n_keys):
+                f_idx, x, y, w, h = r.unpack("IiiII"); key = {'frame': f_idx, 'bounds': {'x': x, 'y': y, 'w': w, 'h': h}}
+                if s_flags & 1: cx, cy, cw, ch = r.unpack("iiII"); key['center'] = {'x': cx, 'y': cy, 'w': cw, 'h': ch}
+                if s_flags & 2: px, py = r.unpack("ii"); key['pivot'] = {'x': px, 'y': py}
+                keys.append(key)
+            self.slices[name] = keys
+        elif c_type == CHUNK_PALETTE:
+            size, first, last = r.unpack("III"); r.skip(8)
+            if len(self.palette) < size: self.palette.extend([(0, 0, 0, 255)] * (size - len(self.palette)))
+            for i in range(first, last + 1):
+                p_flags = r.word(); self.palette[i] = r.unpack("BBBB")
+                if p_flags & 1: r.string()
+        elif c_type in (CHUNK_OLD_PALETTE, CHUNK_OLD_PALETTE_2) and not self.palette:
+            # Only used when the file has no new-style palette chunk (written before it existed)
+            idx = 0; pal = [(0, 0, 0, 255)] * 256
+            for _ in range(r.word()):
+                idx += r.byte(); n = r.byte() or 256
+                for _ in range(n):
+                    rgb = r.unpack("BBB")
+                    if c_type == CHUNK_OLD_PALETTE_2: rgb = tuple(v * 255 // 63 for v in rgb)
+                    if idx < 256: pal[idx] = rgb + (255,)
+                    idx += 1
+            self.palette = pal
+    def _link_layers(self):
+        stack = []
+        for layer in self.layers:
+            del stack[layer.child_level:]
+            layer.parent = stack[-1] if stack else None
+            stack.append(layer)
+    def _resolve_links(self):
+        for frame in self.frames:
+            for idx, cel in list(frame.cels.items()):
+                if cel.link is not None and cel.link < len(self.frames):
+                    src = self.frames[cel.link].cels.get(idx)
+                    if src is not None and src.link is None: frame.cels[idx] = src
+                    else: del frame.cels[idx]
+    def to_rgba(self, data, n_pixels):
+        if self.depth == 32: return bytes(data[:n_pixels * 4])
+        out = bytearray(n_pixels * 4)
+        if self.depth == 16:
+            v = data[0:n_pixels*2:2]; out[0::4] = v; out[1::4] = v; out[2::4] = v; out[3::4] = data[1:n_pixels*2:2]
+        else:
+            pal = (self.palette + [(0, 0, 0, 255)] * 256)[:256]
+            if 0 <= self.transparent_index < 256: pal[self.transparent_index] = (0, 0, 0, 0)
+            idx = bytes(data[:n_pixels])
+            for ch in range(4): out[ch::4] = idx.translate(bytes(c[ch] for c in pal))
+        return bytes(out)
+    def layer_names(self):
+        return [l.name for l in self.layers if l.is_image]
+    def visible_layer_names(self):
+        return {l.name for l in self.layers if l.is_image and l.is_visible}
@@ -9,12 +9,51 @@ import re
 import random
 import math
 import traceback
+import threading
+import queue
+import bisect
+import operator
+import itertools
+import time
+import select
+import struct
+import ctypes
+import base64
+import zlib
+import hashlib
+import gzip
+import tempfile
+import atexit
+from array import array
+from collections import OrderedDict, deque
+import ase_reader
+import ase_cache
+try:
+    import numpy as np
+except ImportError:
+    np = None # Crowd mode (AseCrowd) needs NumPy; everything else runs without it
 
 # Comprehensive Log Function
+# Buffered: callers (render loop, decode workers) only enqueue; a writer thread appends batches to the log and echoes them to stdout.
+# The queue is drained at exit, so crash reports from handle_exception still reach the file
+LOG_PATH = os.path.abspath(os.environ.get("ASE_DEBUG_LOG") or "ase_debug.log") # Tools (bench, batch convert) point this at their own folder
+log_queue = queue.SimpleQueue(); log_lock = threading.Lock()
 def log_debug(msg):
-    with open("ase_debug.log", "a", encoding="utf-8") as f:
-        f.write(f"{msg}\n")
-    print(msg)
+    log_queue.put(f"{msg}")
+def drain_log():
+    with log_lock: # Taken before popping, so the exit-time drain cannot overtake a batch the writer thread is still writing
+        batch = []
+        while True:
+            try: batch.append(log_queue.get_nowait())
+            except queue.Empty: break
+        if not batch: return
+        try:
+            with open(LOG_PATH, "a", encoding="utf-8") as f: f.write("".join(m + "\n" for m in batch))
+        except OSError: pass
+        for m in batch: print(m)
+def log_writer():
+    while True: time.sleep(0.05); drain_log()
+threading.Thread(target=log_writer, daemon=True).start(); atexit.register(drain_log)
 
 # Crash Catcher
 def handle_exception(exc_type, exc_value, exc_traceback):
@@ -28,9 +67,15 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 sys.excepthook = handle_exception
 
 # Clean old log
-if os.path.exists("ase_debug.log"): os.remove("ase_debug.log")
+if os.path.exists(LOG_PATH): os.remove(LOG_PATH)
 log_debug("[SYSTEM] v42 Selective Loading Updated")
 
+# Fixed simulation step: physics/AI/timers always advance in SIM_DT steps regardless of render rate
+SIM_HZ = 60
+SIM_DT = 1000.0 / SIM_HZ
+MAX_CATCHUP_STEPS = 5
+CACHE_DIR = "ase_cache" # Decoded-source cache (ase_cache.DecodeCache), shared by every viewer started from this directory
+
 class AsePathManager:
     def __init__(self):
         self.config_path = "config.json"
@@ -72,6 +117,12 @@ class AsePathManager:
 
 ase_manager = AsePathManager()
 
+def cli_startupinfo():
+    # Hides the console window on Windows; STARTUPINFO does not exist elsewhere
+    if not hasattr(subprocess, "STARTUPINFO"): return None
+    startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
 def select_file(ftypes):
     try:
         root = tk.Tk(); root.withdraw(); root.attributes("-topmost", True)
@@ -80,155 +131,1126 @@ def select_file(ftypes):
         return path
     except: return None
 
+# Aseprite layer blend modes (layer chunk "blend mode" word); the separable ones are composited in-process with the
+# W3C compositing formulas Aseprite uses, Hue/Saturation/Color/Luminosity are left to the CLI export
+BLEND_NORMAL = 0
+BLEND_NAMES = ["Normal", "Multiply", "Screen", "Overlay", "Darken", "Lighten", "Color Dodge", "Color Burn", "Hard Light", "Soft Light",
+               "Difference", "Exclusion", "Hue", "Saturation", "Color", "Luminosity", "Addition", "Subtract", "Divide"]
+def _blend_screen(b, s): return b + s - b * s
+def _blend_hard_light(b, s): return np.where(s <= 0.5, b * 2 * s, _blend_screen(b, 2 * s - 1))
+def _blend_soft_light(b, s):
+    d = np.where(b <= 0.25, ((16 * b - 12) * b + 4) * b, np.sqrt(b))
+    return np.where(s <= 0.5, b - (1 - 2 * s) * b * (1 - b), b + (2 * s - 1) * (d - b))
+def _blend_divide(b, s):
+    with np.errstate(divide="ignore", invalid="ignore"): return np.where(b <= 0, 0.0, np.where(b >= s, 1.0, b / s))
+def _blend_dodge(b, s):
+    with np.errstate(divide="ignore", invalid="ignore"): return np.where(b <= 0, 0.0, np.where(s >= 1, 1.0, np.minimum(1.0, b / (1 - s))))
+def _blend_burn(b, s):
+    with np.errstate(divide="ignore", invalid="ignore"): return np.where(b >= 1, 1.0, np.where(s <= 0, 0.0, 1 - np.minimum(1.0, (1 - b) / s)))
+BLEND_FUNCS = {1: lambda b, s: b * s, 2: _blend_screen, 3: lambda b, s: _blend_hard_light(s, b), 4: np.minimum if np else None, 5: np.maximum if np else None,
+               6: _blend_dodge, 7: _blend_burn, 8: _blend_hard_light, 9: _blend_soft_light, 10: lambda b, s: np.abs(b - s), 11: lambda b, s: b + s - 2 * b * s,
+               16: lambda b, s: np.minimum(1.0, b + s), 17: lambda b, s: np.maximum(0.0, b - s), 18: _blend_divide}
+
+def blend_supported(mode): return mode == BLEND_NORMAL or (np is not None and mode in BLEND_FUNCS)
+
+def blend_cel(canvas, img, x, y, alpha, mode):
+    # Draws img onto canvas at (x, y) with a separable blend mode: the source color is mixed with B(backdrop, source) by the
+    # backdrop's alpha, then composited source-over with the cel alpha (straight, non-premultiplied RGBA in and out)
+    if not blend_supported(mode): raise ValueError(f"blend mode {BLEND_NAMES[mode] if mode < len(BLEND_NAMES) else mode} needs the CLI export" + ("" if np is not None else " (NumPy missing)"))
+    r = pygame.Rect(x, y, *img.get_size()).clip(canvas.get_rect())
+    if not r.w or not r.h: return
+    sx, sy = r.x - x, r.y - y
+    cs = pygame.surfarray.array3d(img)[sx:sx+r.w, sy:sy+r.h] / 255.0; a_s = pygame.surfarray.array_alpha(img)[sx:sx+r.w, sy:sy+r.h, None] * (alpha / 65025.0)
+    rgb = pygame.surfarray.pixels3d(canvas)[r.x:r.right, r.y:r.bottom]; a_px = pygame.surfarray.pixels_alpha(canvas)[r.x:r.right, r.y:r.bottom]
+    cb = rgb / 255.0; a_b = a_px[..., None] / 255.0
+    mixed = (1 - a_b) * cs + a_b * BLEND_FUNCS[mode](cb, cs); a_o = a_s + a_b * (1 - a_s)
+    with np.errstate(divide="ignore", invalid="ignore"): co = np.where(a_o > 0, (a_s * mixed + a_b * (1 - a_s) * cb) / a_o, 0.0)
+    rgb[...] = np.clip(co * 255 + 0.5, 0, 255).astype(np.uint8); a_px[...] = np.clip(a_o[..., 0] * 255 + 0.5, 0, 255).astype(np.uint8)
+    del rgb, a_px # release the pixel references (unlocks the surface)
+
+def composite_cels(cels, visible_layers, canvas_w, canvas_h):
+    # cels: [(layer_name, img, x, y, alpha, blend_mode)] in draw order; output is trimmed like --trim (ox/oy relative to canvas center)
+    cels = [c for c in cels if c[0] in visible_layers]
+    # Only composite the cels' union inside the canvas instead of a full canvas-sized surface
+    region = pygame.Rect(0, 0, 0, 0)
+    if cels: region = pygame.Rect(cels[0][2], cels[0][3], *cels[0][1].get_size()).unionall([pygame.Rect(c[2], c[3], *c[1].get_size()) for c in cels]).clip(0, 0, canvas_w, canvas_h)
+    canvas = pygame.Surface((max(1, region.w), max(1, region.h)), pygame.SRCALPHA)
+    for _name, img, x, y, alpha, blend in cels:
+        if blend != BLEND_NORMAL: blend_cel(canvas, img, x - region.x, y - region.y, alpha, blend); continue
+        img.set_alpha(alpha if alpha < 255 else None); canvas.blit(img, (x - region.x, y - region.y))
+    bbox = canvas.get_bounding_rect()
+    if not bbox.w or not bbox.h: bbox = pygame.Rect(0, 0, 1, 1)
+    return {'img': canvas.subsurface(bbox), 'ox': region.x + bbox.x - canvas_w // 2, 'oy': region.y + bbox.y - canvas_h // 2}
+
+def pack_bundle(data):
+    # Decoded bundle -> (JSON metadata, raw RGBA blobs) for ase_cache; identical images (linked cels, repeated frames) are stored once
+    blobs = []; index = {}
+    def blob(img):
+        raw = pygame.image.tobytes(img, "RGBA"); i = index.get(raw)
+        if i is None: i = index[raw] = len(blobs); blobs.append(raw)
+        return [i, img.get_width(), img.get_height()]
+    frames = [blob(f['img']) + [f['ox'], f['oy'], f['duration']] for f in data['frames']]
+    layer_cels = None if data['layer_cels'] is None else [[[c[0]] + blob(c[1]) + [c[2], c[3], c[4], c[5]] for c in cels] for cels in data['layer_cels']]
+    return {'frames': frames, 'tags': data['tags'], 'slices': data['slices'], 'tag_list': data['tag_list'], 'orig_w': data['orig_w'], 'orig_h': data['orig_h'], 'layer_cels': layer_cels}, blobs
+
+def unpack_bundle(meta, view):
+    # Inverse of pack_bundle while the cache entry is mapped: pixels are copied out of the mapping, each blob once
+    spans = meta['blobs']; surfs = {}
+    def surf(i, w, h):
+        img = surfs.get(i)
+        if img is None:
+            o, n = spans[i]; img = surfs[i] = pygame.image.frombuffer(view[o:o+n], (w, h), "RGBA").copy() if n else pygame.Surface((w, h), pygame.SRCALPHA)
+        return img
+    frames = [{'img': surf(i, w, h), 'ox': ox, 'oy': oy, 'duration': d} for i, w, h, ox, oy, d in meta['frames']]
+    layer_cels = None if meta['layer_cels'] is None else [[(name, surf(i, w, h), x, y, a, bm) for name, i, w, h, x, y, a, bm in cels] for cels in meta['layer_cels']]
+    return {'frames': frames, 'tags': {k: tuple(v) for k, v in meta['tags'].items()}, 'slices': meta['slices'], 'tag_list': meta['tag_list'], 'orig_w': meta['orig_w'], 'orig_h': meta['orig_h'], 'layer_cels': layer_cels}
+
+# Auto-mapping: a tag matches a profile slot when both normalize to the same key (phase suffixes stripped, case/space/underscore-insensitive)
+TAG_SUFFIX = re.compile(r"(_|\s)?\(?(ready|loop|end)\)?", re.IGNORECASE)
+def normalize_tag(tag): return TAG_SUFFIX.sub("", tag).lower().replace(" ", "").replace("_", "")
+def normalize_slot(slot): return slot.lower().replace(" ", "").replace("_", "")
+def tag_phase(tag): tl = tag.lower(); return 0 if "ready" in tl else (2 if "end" in tl else 1)
+
+def build_slice_table(slices, n_frames, canvas_w, canvas_h):
+    # Per frame: [(name, x, y, w, h, is_hit)] of the slice keys active on it, relative to the canvas center (a key holds until the next one)
+    table = [[] for _ in range(n_frames)]
+    for name, keys in slices.items():
+        keys = sorted({k['frame']: k for k in reversed(keys)}.values(), key=lambda k: k['frame']); is_hit = "hit" in name.lower()
+        for i, key in enumerate(keys):
+            b = key['bounds']; end = keys[i+1]['frame'] if i + 1 < len(keys) else n_frames
+            if b['w'] <= 0 or b['h'] <= 0: continue # Empty key: slice hidden from this frame on
+            row = (name, b['x'] - canvas_w // 2, b['y'] - canvas_h // 2, b['w'], b['h'], is_hit)
+            for f in range(key['frame'], min(end, n_frames)): table[f].append(row)
+    return table
+
+class FrameTable:
+    # A source's frames as parallel arrays (offset, duration, image id per frame) over a list of unique images. Frames that trim to identical
+    # pixels (linked cels, hold frames, repeated loops) are deduplicated by content hash and share one surface (and one atlas slot)
+    __slots__ = ("ox", "oy", "durations", "image", "images", "digests", "saved")
+    def __init__(self, frames=(), known=None):
+        # frames: bundle dicts ({'img', 'ox', 'oy', 'duration'}); known: id(img) -> digest for surfaces hashed by an earlier table
+        self.ox = array("i"); self.oy = array("i"); self.durations = array("i"); self.image = array("I"); self.images = []; self.digests = []; self.saved = 0
+        index = {}; known = known or {}
+        for f in frames:
+            img = f['img']; digest = known.get(id(img))
+            if digest is None: digest = hashlib.blake2b(pygame.image.tobytes(img, "RGBA"), digest_size=16).digest() + struct.pack("<II", *img.get_size())
+            i = index.get(digest)
+            if i is None: i = index[digest] = len(self.images); self.images.append(img); self.digests.append(digest)
+            else: self.saved += img.get_width() * img.get_height() * 4
+            self.ox.append(int(f['ox'])); self.oy.append(int(f['oy'])); self.durations.append(int(f['duration'])); self.image.append(i)
+    def __len__(self): return len(self.image)
+    def img(self, i): return self.images[self.image[i]]
+    def dicts(self): return [{'img': self.images[i], 'ox': ox, 'oy': oy, 'duration': d} for i, ox, oy, d in zip(self.image, self.ox, self.oy, self.durations)]
+    def known(self): return {id(img): d for img, d in zip(self.images, self.digests)}
+    def nbytes(self): return sum(img.get_width() * img.get_height() * 4 for img in self.images)
+
 class AseSource:
-    def __init__(self, file_path, source_id):
-        self.id = source_id; self.file_path = os.path.abspath(file_path); self.name = os.path.basename(file_path)
-        self.frames = []; self.tags = {}; self.tag_list = []; self.slices = {}; self.orig_w = self.orig_h = 0
-        self.layers = []; self.visible_layers = set()
+    def __init__(self, file_path, source_id, data=None, atlas=None, cache=None, defer=False):
+        self.id = source_id; self.atlas = atlas; self.cache = cache; self.file_path = os.path.abspath(file_path); self.name = os.path.basename(file_path)
+        self.frames = FrameTable(); self.tags = {}; self.tag_list = []; self.tag_index = {}; self.slot_tags = {}; self.slices = {}; self.slice_table = []; self.slice_np = None; self.orig_w = self.orig_h = 0
+        self.layers = []; self.visible_layers = set(); self.layer_cels = None; self.version = 0; self.loaded = False; self.job_seq = 0; self.decode_lock = threading.Lock()
+        if data is not None: self.apply(data); return # In-memory source (benchmarks); nothing on disk to read or watch
         self.last_mtime = os.path.getmtime(self.file_path)
+        if defer:
+            # Loaded later through SourceReloader.load(); until then a blank frame keeps every draw/update path valid
+            self.frames = FrameTable([{'img': pygame.Surface((1, 1), pygame.SRCALPHA), 'ox': 0, 'oy': 0, 'duration': 100}]); self.slice_table = [[]]; return
         self.fetch_layers()
         self.export_and_load()
-    def fetch_layers(self):
+    def read_source(self):
+        # The file's bytes, read once per load: hashing and parsing the same buffer means a save between them can't mix two versions
+        try:
+            with open(self.file_path, "rb") as f: return f.read()
+        except OSError as e: log_debug(f"[WARN] Read failed for {self.name}: {e}"); return None
+    def read_layers(self, buf=None):
+        # (image layer names, visible layer names) without touching self, so it can run on a worker thread
+        try:
+            doc = ase_reader.AseFile(self.file_path, data=buf); layers = doc.layer_names()
+            log_debug(f"[LAYERS] Found in {self.name}: {layers}")
+            return layers, doc.visible_layer_names()
+        except Exception as e: log_debug(f"[WARN] Native layer read failed for {self.name}, falling back to CLI: {e}")
         try:
-            exe = ase_manager.get_path()
-            startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            res = subprocess.run([exe, "-b", "--list-layers", self.file_path], check=True, capture_output=True, text=True, startupinfo=startupinfo)
-            self.layers = [l.strip() for l in res.stdout.split("\n") if l.strip()]
-            self.visible_layers = set(self.layers) # Default all visible
-            log_debug(f"[LAYERS] Found in {self.name}: {self.layers}")
+            exe = ase_manager.get_path() if threading.current_thread() is threading.main_thread() else ase_manager.path
+            res = subprocess.run([exe, "-b", "--list-layers", self.file_path], check=True, capture_output=True, text=True, startupinfo=cli_startupinfo())
+            layers = [l.strip() for l in res.stdout.split("\n") if l.strip()]
+            log_debug(f"[LAYERS] Found in {self.name}: {layers}")
+            return layers, set(layers) # Default all visible
         except Exception as e: 
             log_debug(f"[ERROR] Fetch layers failed for {self.name}: {e}")
-            self.layers = []
-    def check_for_reload(self):
-        try:
-            current_mtime = os.path.getmtime(self.file_path)
-            if current_mtime > self.last_mtime:
-                self.last_mtime = current_mtime
-                self.export_and_load()
-                return True
-        except: pass
-        return False
+            return [], set()
+    def fetch_layers(self):
+        self.layers, self.visible_layers = self.read_layers()
     def export_and_load(self):
-        png_p = f"temp_{self.id}.png"; json_p = f"temp_{self.id}.json"
-        self.frames = []; self.tags = {}; self.slices = {}
+        # A failed decode keeps the last good frames; only a source that never loaded gets the blank placeholder
+        data = self.decode(self.visible_layers)
+        if data is not None: self.apply(data)
+        elif not self.loaded: self.apply({'frames': [{'img': pygame.Surface((32, 32), pygame.SRCALPHA), 'ox': 0, 'oy': 0, 'duration': 100}], 'tags': {}, 'slices': {}, 'tag_list': [], 'orig_w': 0, 'orig_h': 0, 'layer_cels': None})
+    def decode_initial(self):
+        # First load on a worker: layers and frames together; apply() takes the layer lists from the bundle
+        buf = self.read_source(); layers, visible = self.read_layers(buf); data = self.decode(visible, layers, buf)
+        if data is None: return None
+        data['layers'] = layers; data['visible_layers'] = visible
+        return data
+    def decode(self, visible_layers, layers=None, buf=None):
+        # Builds a new frames/tags/slices bundle without touching self, so it can run on a worker thread; None when every decoder failed
+        # (e.g. a file read mid-save), so callers keep what they have. 'frames' comes back as a finished FrameTable: hashing and
+        # deduplicating the frames happens here on the worker, apply() only uploads
+        data = self.decode_bundle(visible_layers, layers, buf)
+        if data is not None: data['frames'] = FrameTable(data['frames'])
+        return data
+    def decode_bundle(self, visible_layers, layers=None, buf=None):
+        # decode() with the frames still as bundle dicts (what decode_native/decode_cli return and the disk cache stores)
+        # With a disk cache, an unchanged file (same content hash and visible layers) is read back instead of decoded.
+        # buf: the file's bytes when the caller already read them (read_source); the cache key and the native decode both use it
+        if buf is None: buf = self.read_source()
+        key = digest = None; native = True
+        if self.cache is not None and buf is not None:
+            try:
+                t0 = time.perf_counter(); digest = self.cache.digest(buf); key = self.cache.key(digest, visible_layers); data = self.cache.load(key, unpack_bundle)
+                if data is not None: log_debug(f"[LOAD] {self.name} Success (disk cache, {(time.perf_counter()-t0)*1000:.1f}ms)."); return data
+            except Exception as e: log_debug(f"[WARN] Disk cache read failed for {self.name}: {e}")
         try:
-            exe = ase_manager.get_path()
-            startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            cmd = [exe, "-b"]
-            if len(self.visible_layers) < len(self.layers):
-                for l in self.layers:
-                    if l in self.visible_layers: cmd.extend(["--layer", l])
-            cmd.extend([self.file_path, "--trim", "--sheet", png_p, "--data", json_p, "--format", "json-array", "--list-tags", "--list-slices"])
-            subprocess.run(cmd, check=True, capture_output=True, startupinfo=startupinfo)
-            sheet = pygame.image.load(png_p).convert_alpha()
-            with open(json_p, 'r', encoding='utf-8') as f: data = json.load(f)
-            self.orig_w, self.orig_h = data['frames'][0]['sourceSize']['w'], data['frames'][0]['sourceSize']['h']
+            data = self.decode_native(visible_layers, buf)
+            log_debug(f"[LOAD] {self.name} Success (native).")
+        except Exception as e:
+            log_debug(f"[WARN] Native load failed for {self.name}, falling back to CLI export: {e}")
+            data = self.decode_cli(visible_layers, self.layers if layers is None else layers); native = False
+        # The CLI reads the file itself: only cache its result when the file still has the hashed content
+        if key and data is not None and not native:
+            try:
+                if self.cache.file_digest(self.file_path) != digest: key = None
+            except OSError: key = None
+        if key and data is not None:
+            try: self.cache.store(key, *pack_bundle(data))
+            except Exception as e: log_debug(f"[WARN] Disk cache write failed for {self.name}: {e}")
+        return data
+    def apply(self, data):
+        # Swaps a decoded bundle in at once; call on the main thread between frames. data['frames']: a FrameTable (decode()) or bundle dicts
+        frames = data['frames'] if isinstance(data['frames'], FrameTable) else FrameTable(data['frames'])
+        log_debug(f"[FRAMES] {self.name}: {len(frames)} frames -> {len(frames.images)} images, {frames.nbytes() / 1024:.0f}KB ({frames.saved / 1024:.0f}KB saved by dedupe)")
+        if self.atlas is not None: frames.images = self.atlas.add(self.id, frames.images); log_debug(f"[ATLAS] {self.name}: {len(frames.images)} images, {self.atlas.stats()}")
+        elif pygame.display.get_surface() is not None: frames.images = [img.convert_alpha() for img in frames.images]
+        self.frames, self.tags, self.slices, self.tag_list = frames, data['tags'], data['slices'], data['tag_list']
+        self.orig_w, self.orig_h = data['orig_w'], data['orig_h']; self.layer_cels = data['layer_cels']
+        self.slice_table = build_slice_table(self.slices, len(self.frames), self.orig_w, self.orig_h); self.slice_np = None; self.build_tag_index()
+        if 'layers' in data: self.layers = data['layers']; self.visible_layers = set(data['visible_layers'])
+        self.loaded = True; self.version += 1 # Invalidates anything derived from the old frames (SpriteCache)
+    def build_tag_index(self):
+        # normalized key -> positions in tag_list, built once per load; slot lookups then never re-run the regex over every tag
+        self.tag_index = {}; self.slot_tags = {}
+        for i, t in enumerate(self.tag_list): self.tag_index.setdefault(normalize_tag(t), []).append(i)
+    def candidates(self, slot):
+        # Tags auto-mapped to a profile slot (WALK also takes MOVE), ready -> loop -> end, file order within a phase
+        tags = self.slot_tags.get(slot)
+        if tags is None:
+            key = normalize_slot(slot); idx = sorted(self.tag_index.get(key, []) + (self.tag_index.get("move", []) if key == "walk" else []))
+            tags = self.slot_tags[slot] = sorted((self.tag_list[i] for i in idx), key=tag_phase)
+        return tags
+    def decode_native(self, visible_layers, buf=None):
+        # Decode the .aseprite file (or its bytes, buf) in-process; every image layer's cels are kept so layer toggles can recomposite in memory
+        doc = ase_reader.AseFile(self.file_path, data=buf); frames = []; layer_cels = []
+        for fr in doc.frames:
+            cels = []
+            for cel in fr.ordered_cels():
+                if cel.layer_index >= len(doc.layers) or not doc.layers[cel.layer_index].is_image: continue
+                layer = doc.layers[cel.layer_index]
+                cels.append((layer.name, pygame.image.frombytes(cel.rgba(doc), (cel.w, cel.h), "RGBA"), cel.x, cel.y, cel.opacity * layer.opacity // 255, layer.blend_mode))
+            layer_cels.append(cels); frames.append(dict(composite_cels(cels, visible_layers, doc.width, doc.height), duration=fr.duration))
+        # A hidden layer with a blend mode composite_cels can't do would fail on toggle; keep no per-layer data so toggles re-export
+        if not all(blend_supported(l.blend_mode) for l in doc.layers if l.is_image): layer_cels = None
+        tags = {name: (t['from'], t['to']) for name, t in doc.tags.items()}
+        return {'frames': frames, 'tags': tags, 'slices': doc.slices, 'tag_list': sorted(list(tags.keys())), 'orig_w': doc.width, 'orig_h': doc.height, 'layer_cels': layer_cels}
+    def set_layer_visible(self, name, visible):
+        # Recomposites only the frames that have a cel on this layer; returns False when there is no per-layer data (CLI fallback)
+        if visible: self.visible_layers.add(name)
+        else: self.visible_layers.discard(name)
+        if self.layer_cels is None: return False
+        t0 = time.perf_counter(); frames = self.frames.dicts(); known = self.frames.known(); n = 0
+        for i, cels in enumerate(self.layer_cels):
+            if i >= len(frames) or not any(c[0] == name for c in cels): continue
+            frames[i] = dict(frames[i], **composite_cels(cels, self.visible_layers, self.orig_w, self.orig_h)); n += 1
+        table = FrameTable(frames, known) # Untouched frames keep their digests; only the recomposited ones are hashed
+        if self.atlas is not None: table.images = self.atlas.add(self.id, table.images)
+        elif pygame.display.get_surface() is not None: table.images = [img if id(img) in known else img.convert_alpha() for img in table.images]
+        self.frames = table; self.version += 1
+        log_debug(f"[LAYERS] {self.name}: '{name}' {'on' if visible else 'off'}, recomposited {n}/{len(self.frames)} frames in {(time.perf_counter()-t0)*1000:.1f}ms")
+        return True
+    def slice_arrays(self):
+        # slice_table flattened to NumPy rows (frame f owns rows start[f]:start[f]+count[f]) for AseCrowd; built on first use
+        if self.slice_np is None:
+            rows = [r for frame in self.slice_table for r in frame]; count = np.array([len(frame) for frame in self.slice_table] + [0], int)
+            self.slice_np = {'start': np.concatenate(([0], np.cumsum(count)[:-1])), 'count': count, 'names': [r[0] for r in rows],
+                             'x': np.array([r[1] for r in rows], float), 'y': np.array([r[2] for r in rows], float), 'w': np.array([r[3] for r in rows], float), 'h': np.array([r[4] for r in rows], float), 'hit': np.array([r[5] for r in rows], bool)}
+        return self.slice_np
+    def decode_cli(self, visible_layers, layers):
+        # Each export gets its own temp folder, so sources (or ase_convert workers) exporting at the same time never share sheet files
+        frames = []; tags = {}; slices = {}; orig_w = orig_h = 0
+        try:
+            # Never open the Aseprite.exe picker dialog from a worker thread
+            exe = ase_manager.get_path() if threading.current_thread() is threading.main_thread() else ase_manager.path
+            if not exe: raise RuntimeError("Aseprite.exe path not configured")
+            with tempfile.TemporaryDirectory(prefix="ase_cli_") as tmp:
+                png_p = os.path.join(tmp, "sheet.png"); json_p = os.path.join(tmp, "sheet.json"); cmd = [exe, "-b"]
+                if len(visible_layers) < len(layers):
+                    for l in layers:
+                        if l in visible_layers: cmd.extend(["--layer", l])
+                cmd.extend([self.file_path, "--trim", "--sheet", png_p, "--data", json_p, "--format", "json-array", "--list-tags", "--list-slices"])
+                subprocess.run(cmd, check=True, capture_output=True, startupinfo=cli_startupinfo())
+                sheet = pygame.image.load(png_p)
+                with open(json_p, 'r', encoding='utf-8') as f: data = json.load(f)
+            orig_w, orig_h = data['frames'][0]['sourceSize']['w'], data['frames'][0]['sourceSize']['h']
             for f in data['frames']:
                 r, s = f['frame'], f['spriteSourceSize']
-                surf = pygame.Surface((r['w'], r['h']), pygame.SRCALPHA); surf.blit(sheet, (0, 0), (r['x'], r['y'], r['w'], r['h']))
-                self.frames.append({'img': surf, 'ox': s['x'] - self.orig_w // 2, 'oy': s['y'] - self.orig_h // 2, 'duration': f.get('duration', 100)})
+                frames.append({'img': sheet.subsurface((r['x'], r['y'], r['w'], r['h'])), 'ox': s['x'] - orig_w // 2, 'oy': s['y'] - orig_h // 2, 'duration': f.get('duration', 100)})
             if 'meta' in data:
                 if 'frameTags' in data['meta']:
-                    for t in data['meta']['frameTags']: self.tags[t['name']] = (t['from'], t['to'])
+                    for t in data['meta']['frameTags']: tags[t['name']] = (t['from'], t['to'])
                 if 'slices' in data['meta']:
-                    for s in data['meta']['slices']: self.slices[s['name']] = s['keys']
-            self.tag_list = sorted(list(self.tags.keys()))
+                    for s in data['meta']['slices']: slices[s['name']] = s['keys']
             log_debug(f"[LOAD] {self.name} Success.")
         except Exception as e: 
             log_debug(f"[ERROR] Load failed for {self.name}: {e}")
-            self.frames = [{'img': pygame.Surface((32,32), pygame.SRCALPHA), 'ox':0, 'oy':0, 'duration':100}]
-        finally:
-            for p in [png_p, json_p]: 
-                if os.path.exists(p): os.remove(p)
+            return None
+        return {'frames': frames, 'tags': tags, 'slices': slices, 'tag_list': sorted(list(tags.keys())), 'orig_w': orig_w, 'orig_h': orig_h, 'layer_cels': None}
+
+class Inotify:
+    # Minimal ctypes inotify binding (Linux only); watches directories and reports changed file paths
+    IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x2, 0x8, 0x80, 0x100
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True); self.fd = self.libc.inotify_init()
+        if self.fd < 0: raise OSError(ctypes.get_errno(), "inotify_init failed")
+        self.dirs = {}
+    @classmethod
+    def create(cls):
+        if not sys.platform.startswith("linux"): return None
+        try: return cls()
+        except Exception as e: log_debug(f"[WATCH] inotify unavailable, using stat polling: {e}"); return None
+    def add_dir(self, path):
+        if path in self.dirs.values(): return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE)
+        if wd >= 0: self.dirs[wd] = path
+    def read(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]: return []
+        buf = os.read(self.fd, 65536); pos = 0; paths = []
+        while pos + 16 <= len(buf):
+            wd, _mask, _cookie, n = struct.unpack_from("iIII", buf, pos); name = buf[pos+16:pos+16+n].rstrip(b"\0"); pos += 16 + n
+            if wd in self.dirs and name: paths.append(os.path.join(self.dirs[wd], os.fsdecode(name)))
+        return paths
+    def close(self): os.close(self.fd)
+
+class SourceReloader:
+    # Watches source files off the render thread (inotify, else batched stat polling), debounces saves and decodes on a pool of workers.
+    # Decoded bundles wait in a queue until poll() swaps them in from the main loop (surfaces are converted/atlased there), so neither
+    # a save nor opening a project blocks a frame; each source is usable as soon as its own bundle arrives.
+    def __init__(self, debounce=0.3, poll_interval=0.25, workers=None):
+        self.debounce = debounce; self.poll_interval = poll_interval; self.sources = {}; self.seen = {}; self.loaded = {}; self.pending = {}
+        self.lock = threading.Lock(); self.jobs = queue.Queue(); self.done = queue.Queue(); self.stop_event = threading.Event(); self.inotify = Inotify.create()
+        self.count_lock = threading.Lock(); self.active = 0; self.batch = 0 # Jobs not yet swapped in / jobs since the queue was last empty (progress bar)
+        self.workers = workers or max(2, min(8, os.cpu_count() or 2))
+        threading.Thread(target=self.watch_loop, daemon=True).start()
+        for _ in range(self.workers): threading.Thread(target=self.work_loop, daemon=True).start()
+    def stamp(self, path):
+        try: st = os.stat(path); return (st.st_mtime_ns, st.st_size)
+        except OSError: return None
+    def watch(self, src):
+        with self.lock: self.sources[src.file_path] = src; self.seen[src.file_path] = self.loaded[src.file_path] = self.stamp(src.file_path)
+        if self.inotify: self.inotify.add_dir(os.path.dirname(src.file_path))
+    def request(self, src):
+        # A source that has not finished its first load is loaded from scratch (its layer list is not known yet)
+        with self.count_lock:
+            if not self.active: self.batch = 0
+            self.active += 1; self.batch += 1; src.job_seq += 1; seq = src.job_seq
+        self.jobs.put((src, set(src.visible_layers) if src.loaded else None, seq))
+    def load(self, src):
+        self.watch(src); self.request(src)
+    def progress(self):
+        with self.count_lock: return (self.batch - self.active, self.batch) if self.active else None
+    def poll(self):
+        # -> [(source, first_load)]; a result superseded by a newer request for the same source is dropped
+        changed = []
+        while True:
+            try: src, data, seq = self.done.get_nowait()
+            except queue.Empty: return changed
+            with self.count_lock: self.active -= 1
+            if data is None or seq != src.job_seq: continue
+            first = not src.loaded; src.apply(data); changed.append((src, first))
+    def stop(self):
+        self.stop_event.set()
+        if self.inotify: self.inotify.close(); self.inotify = None
+    def scan(self):
+        time.sleep(self.poll_interval); changed = []
+        with self.lock: paths = list(self.sources)
+        for p in paths:
+            st = self.stamp(p)
+            if st != self.seen.get(p): self.seen[p] = st; changed.append(p)
+        return changed
+    def watch_loop(self):
+        while not self.stop_event.is_set():
+            try: changed = self.inotify.read(self.poll_interval) if self.inotify else self.scan()
+            except (OSError, ValueError, AttributeError): changed = self.scan()
+            now = time.monotonic()
+            with self.lock:
+                for p in changed:
+                    if p in self.sources: self.pending[p] = now
+                for p, t in list(self.pending.items()):
+                    # Fire only once the file has been quiet for the debounce window, and only if it really changed
+                    if now - t < self.debounce: continue
+                    del self.pending[p]; st = self.stamp(p)
+                    if st is not None and st != self.loaded.get(p): self.loaded[p] = self.seen[p] = st; self.request(self.sources[p])
+    def work_loop(self):
+        while not self.stop_event.is_set():
+            try: src, layers, seq = self.jobs.get(timeout=0.5)
+            except queue.Empty: continue
+            t0 = time.perf_counter(); data = None
+            try:
+                with src.decode_lock: # One decode per source at a time (the CLI export uses per-source temp files)
+                    t0 = time.perf_counter()
+                    if seq == src.job_seq: data = src.decode_initial() if layers is None else src.decode(layers)
+                if data is not None: profiler.span(f"decode {src.name}", t0, time.perf_counter() - t0); log_debug(f"[RELOAD] {src.name} decoded off-thread in {(time.perf_counter()-t0)*1000:.0f}ms")
+            except Exception as e: log_debug(f"[ERROR] Background reload failed for {src.name}: {e}")
+            self.done.put((src, data, seq))
+
+class TextCache:
+    # Rendered text surfaces keyed by (font, text, colour); LRU-bounded so ever-changing strings can't grow it without limit
+    def __init__(self, max_items=2048):
+        self.max_items = max_items; self.entries = OrderedDict(); self.fonts = {}
+    def font(self, size, bold=False):
+        # SysFont is slow (it searches the system font list): one instance per size
+        if (size, bold) not in self.fonts: self.fonts[(size, bold)] = pygame.font.SysFont("Arial", size, bold=bold)
+        return self.fonts[(size, bold)]
+    def render(self, font, text, color):
+        key = (font, text, tuple(color)); surf = self.entries.get(key)
+        if surf is None:
+            surf = self.entries[key] = font.render(text, True, color)
+            if len(self.entries) > self.max_items: self.entries.popitem(last=False)
+        else: self.entries.move_to_end(key)
+        return surf
+
+text_cache = TextCache()
+
+class FrameProfiler:
+    # Scoped wall-clock timers: begin(name)/end() pairs around main-loop subsystems (nesting allowed). Finished scopes go into a ring buffer
+    # for Chrome trace export and into per-frame totals for the overlay; span() records work timed elsewhere (decode workers)
+    def __init__(self, capacity=200000, history=240):
+        self.events = deque(maxlen=capacity); self.stack = []; self.totals = {}; self.frames = deque(maxlen=history); self.history = {}
+        self.frame_start = None; self.enabled = True; self.pid = os.getpid(); self.main_tid = threading.get_ident()
+    def begin(self, name):
+        if self.enabled: self.stack.append((name, time.perf_counter()))
+    def end(self):
+        if not self.stack: return
+        name, t0 = self.stack.pop(); dt = time.perf_counter() - t0
+        self.events.append((name, t0, dt, self.main_tid)); self.totals[name] = self.totals.get(name, 0.0) + dt
+    def span(self, name, t0, dt):
+        if self.enabled: self.events.append((name, t0, dt, threading.get_ident())) # deque.append is atomic: safe from worker threads
+    def frame(self):
+        # Called once at the top of every main-loop iteration: closes the previous frame
+        now = time.perf_counter(); self.stack.clear()
+        if self.frame_start is not None and self.enabled:
+            dt = now - self.frame_start; self.events.append(("frame", self.frame_start, dt, self.main_tid)); self.frames.append(dt * 1000)
+            for name in set(self.history) | set(self.totals): self.history.setdefault(name, deque(maxlen=self.frames.maxlen)).append(self.totals.get(name, 0.0) * 1000)
+        self.totals = {}; self.frame_start = now
+    def summary(self, n=60):
+        # [(name, avg ms, max ms)] over the last n frames, slowest first
+        rows = [(name, sum(list(h)[-n:]) / max(1, min(n, len(h))), max(list(h)[-n:] or [0])) for name, h in self.history.items()]
+        return sorted(rows, key=lambda r: -r[1])
+    def export_trace(self, path, seconds=10):
+        # Chrome trace (chrome://tracing, Perfetto) of the last `seconds`; the snapshot is taken here, JSON encoding and the write run on a thread
+        cutoff = time.perf_counter() - seconds; events = [e for e in list(self.events) if e[1] >= cutoff]; pid = self.pid
+        def write():
+            names = {self.main_tid: "main"}; trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": names.get(tid, f"worker {tid}")}} for tid in {e[3] for e in events}]
+            trace += [{"name": name, "cat": name.split(".")[0], "ph": "X", "ts": round(t0 * 1e6, 1), "dur": round(dt * 1e6, 1), "pid": pid, "tid": tid} for name, t0, dt, tid in events]
+            trace += [{"name": "frame_ms", "ph": "C", "ts": round(t0 * 1e6, 1), "pid": pid, "args": {"ms": round(dt * 1000, 3)}} for name, t0, dt, tid in events if name == "frame"]
+            try:
+                with open(path, "w", encoding="utf-8") as f: json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+                log_debug(f"[PROFILE] {len(events)} events ({seconds}s) -> {path}")
+            except Exception as e: log_debug(f"[ERROR] Trace export failed: {e}")
+        threading.Thread(target=write, daemon=True).start()
+        return len(events)
+
+profiler = FrameProfiler()
+
+class TextureAtlas:
+    # Shared pages holding every source's images (shelf packing, tallest first); each image comes back as a subsurface view into a page.
+    # Re-adding a source (reload, layer toggle) turns its old slots into dead space; once dead + free space outweighs live pixels everything is repacked
+    def __init__(self, page_size=2048, pad=1):
+        self.page_size = page_size; self.pad = pad; self.pages = []; self.owners = {}; self.repacks = 0; self.fmt = None
+    def new_page(self, w, h, need):
+        # Sized for the pixels still to place plus those live in smaller pages: small projects stay small, growth is geometric
+        need += sum(p['live'] for p in self.pages if p['surf'].get_width() < self.page_size); side = min(self.page_size, max(256, -(-int((need * 1.25) ** 0.5) // 64) * 64))
+        if self.fmt is None and pygame.display.get_surface() is not None: self.fmt = pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+        surf = pygame.Surface((max(side, w), max(side, h)), pygame.SRCALPHA, self.fmt) if self.fmt else pygame.Surface((max(side, w), max(side, h)), pygame.SRCALPHA) # Display pixel format without converting a whole page
+        page = {'surf': surf, 'shelves': [], 'top': 0, 'used': 0, 'live': 0}; self.pages.append(page)
+        return page
+    def place(self, w, h, need):
+        # First shelf with room, else a new shelf under the last one, else a new page; returns (page, x, y)
+        w += self.pad; h += self.pad
+        for page in self.pages:
+            pw, ph = page['surf'].get_size()
+            for shelf in page['shelves']:
+                if h <= shelf[1] and shelf[2] + w <= pw: shelf[2] += w; return page, shelf[2] - w, shelf[0]
+            if page['top'] + h <= ph and w <= pw: page['shelves'].append([page['top'], h, w]); page['top'] += h; return page, 0, page['top'] - h
+        page = self.new_page(w, h, need); page['shelves'].append([0, h, w]); page['top'] = h
+        return page, 0, 0
+    def put(self, img, need):
+        # Slots are never reused before a repack, so they are still zero: MAX is an exact copy and skips alpha blending
+        w, h = img.get_size(); page, x, y = self.place(w, h, need)
+        page['surf'].blit(img, (x, y), special_flags=pygame.BLEND_RGBA_MAX); page['used'] += w * h; page['live'] += w * h
+        return page, page['surf'].subsurface((x, y, w, h))
+    def add(self, owner, images):
+        # Copies the images in and returns a list of views into the atlas; the caller's own surfaces can be dropped afterwards
+        self.release(owner); out = list(images); slots = []; need = sum((img.get_width() + self.pad) * (img.get_height() + self.pad) for img in images)
+        for i in sorted(range(len(images)), key=lambda i: -images[i].get_height()):
+            page, sub = self.put(images[i], need); out[i] = sub; slots.append((page, sub.get_width() * sub.get_height())); need -= (sub.get_width() + self.pad) * (sub.get_height() + self.pad)
+        self.owners[owner] = (out, slots)
+        area = sum(p['surf'].get_width() * p['surf'].get_height() for p in self.pages)
+        if area > self.page_size ** 2 // 4 and area > 2 * sum(p['live'] for p in self.pages): self.repack()
+        return out
+    def release(self, owner):
+        if owner not in self.owners: return
+        for page, area in self.owners.pop(owner)[1]: page['live'] -= area
+        self.pages = [p for p in self.pages if p['live'] > 0]
+    def repack(self):
+        # Rebinds the owners' image lists in place, so sources keep their lists (FrameTable.images)
+        entries = sorted(((owner, images, i) for owner, (images, _) in self.owners.items() for i in range(len(images))), key=lambda e: -e[1][e[2]].get_height())
+        need = sum((images[i].get_width() + self.pad) * (images[i].get_height() + self.pad) for _, images, i in entries); self.pages = []; slots = {owner: [] for owner in self.owners}
+        for owner, images, i in entries:
+            page, images[i] = self.put(images[i], need); slots[owner].append((page, images[i].get_width() * images[i].get_height())); need -= (images[i].get_width() + self.pad) * (images[i].get_height() + self.pad)
+        self.owners = {owner: (images, slots[owner]) for owner, (images, _) in self.owners.items()}; self.repacks += 1
+    def stats(self):
+        total = sum(p['surf'].get_width() * p['surf'].get_height() for p in self.pages); live = sum(p['live'] for p in self.pages)
+        return f"Atlas: {len(self.pages)} pages, {total * 4 / 1048576:.1f}MB, {live / total if total else 0:.0%} live, {self.repacks} repacks"
+
+class SpriteCache:
+    # LRU of scaled/flipped frame surfaces for the current zoom, bounded by pixel memory
+    def __init__(self, budget_bytes=64 * 1024 * 1024):
+        self.budget = budget_bytes; self.entries = OrderedDict(); self.used = 0; self.zoom = None; self.versions = {}; self.hits = self.misses = 0
+    def clear(self):
+        self.entries.clear(); self.used = 0; self.versions.clear()
+    def drop_source(self, source_id):
+        for key in [k for k in self.entries if k[0] == source_id]: self.used -= self.entries.pop(key)[3]
+    def get(self, src, f_idx, zoom, facing_right, tint=None):
+        # tint: RGB multiplied into the scaled copy (dash ghosts); tinted variants are separate entries
+        if zoom != self.zoom: self.clear(); self.zoom = zoom
+        if self.versions.get(src.id) != src.version: self.drop_source(src.id); self.versions[src.id] = src.version
+        fr = src.frames; key = (src.id, fr.image[f_idx], fr.ox[f_idx], fr.oy[f_idx], facing_right, tint); entry = self.entries.get(key) # Duplicate frames share entries
+        if entry:
+            self.entries.move_to_end(key); self.hits += 1
+            return entry
+        self.misses += 1; img = fr.img(f_idx)
+        scaled = pygame.transform.scale(img, (int(img.get_width()*zoom), int(img.get_height()*zoom)))
+        ox, oy = fr.ox[f_idx]*zoom, fr.oy[f_idx]*zoom
+        if not facing_right: scaled = pygame.transform.flip(scaled, True, False); ox = -ox - scaled.get_width()
+        if tint: scaled.fill(tint + (255,), special_flags=pygame.BLEND_RGBA_MULT)
+        entry = (scaled, ox, oy, scaled.get_width() * scaled.get_height() * 4); self.entries[key] = entry; self.used += entry[3]
+        while self.used > self.budget and len(self.entries) > 1: self.used -= self.entries.popitem(last=False)[1][3]
+        return entry
+    def stats(self):
+        total = self.hits + self.misses
+        return f"Sprite cache: {len(self.entries)} surf, {self.used / 1048576:.1f}MB, hit {self.hits / total if total else 0:.0%} ({self.hits}/{total})"
+
+DEFAULT_PLATFORMS = [(200, 350, 200, 20), (500, 200, 200, 20), (-200, 250, 300, 20), (900, 300, 400, 20)]
+
+def load_level(path):
+    # Platform rects from a level file: {"platforms": [[x, y, w, h], ...]} or a Tiled JSON map (.tmj/.json)
+    with open(path, "r", encoding="utf-8") as f: data = json.load(f)
+    if "platforms" in data:
+        return [pygame.Rect(p["x"], p["y"], p["w"], p["h"]) if isinstance(p, dict) else pygame.Rect(*p) for p in data["platforms"]]
+    rects = []; tw, th = data.get("tilewidth", 16), data.get("tileheight", 16)
+    def walk(layers, ox, oy):
+        for layer in layers:
+            if not layer.get("visible", True): continue
+            lx, ly = ox + layer.get("offsetx", 0), oy + layer.get("offsety", 0)
+            if layer.get("type") == "group": walk(layer.get("layers", []), lx, ly)
+            elif layer.get("type") == "objectgroup":
+                for o in layer.get("objects", []):
+                    if o.get("width") and o.get("height") and not o.get("point") and "polygon" not in o and "polyline" not in o: rects.append(pygame.Rect(int(lx + o["x"]), int(ly + o["y"]), int(o["width"]), int(o["height"])))
+            elif layer.get("type") == "tilelayer":
+                for chunk in layer.get("chunks", [layer]): rects.extend(tile_runs(chunk, layer, lx, ly, tw, th))
+    walk(data.get("layers", []), 0, 0)
+    return rects
+
+def tile_runs(chunk, layer, ox, oy, tw, th):
+    # Each horizontal run of non-empty tiles becomes one rect, which keeps big tile maps to a manageable platform count
+    cells = chunk.get("data", [])
+    if isinstance(cells, str):
+        raw = base64.b64decode(cells); comp = layer.get("compression", "")
+        if comp == "zlib": raw = zlib.decompress(raw)
+        elif comp == "gzip": raw = gzip.decompress(raw)
+        cells = list(struct.unpack(f"<{len(raw) // 4}I", raw))
+    w = chunk.get("width", 0); bx, by = chunk.get("x", 0), chunk.get("y", 0); rects = []
+    for row in range(len(cells) // w if w else 0):
+        start = None
+        for col in range(w + 1):
+            solid = col < w and cells[row * w + col] & 0x0FFFFFFF
+            if solid and start is None: start = col
+            elif not solid and start is not None: rects.append(pygame.Rect(int(ox + (bx + start) * tw), int(oy + (by + row) * th), (col - start) * tw, th)); start = None
+    return rects
+
+class PlatformGrid:
+    # Uniform grid over platform rects: landing checks and draw culling only look at nearby cells, not the whole level
+    def __init__(self, platforms, cell=256):
+        self.platforms = platforms; self.cell = cell; self.cells = {}; self.cell_rects = {}
+        for i, p in enumerate(platforms):
+            for gx in range(p.left // cell, (p.right - 1) // cell + 1):
+                for gy in range(p.top // cell, (p.bottom - 1) // cell + 1):
+                    self.cells.setdefault((gx, gy), []).append(i); self.cell_rects.setdefault((gx, gy), []).append(p)
+    def at_point(self, x, y):
+        # int() truncates like Rect.collidepoint does with float coordinates
+        return self.cell_rects.get((int(x) // self.cell, int(y) // self.cell), ())
+    def indices_at_cells(self, keys):
+        found = set()
+        for k in keys: found.update(self.cells.get(k, ()))
+        return sorted(found)
+    def in_rect(self, left, top, right, bottom):
+        c = self.cell; found = set()
+        for gx in range(int(left) // c, int(right) // c + 1):
+            for gy in range(int(top) // c, int(bottom) // c + 1): found.update(self.cells.get((gx, gy), ()))
+        return [self.platforms[i] for i in found]
+
+class BgLayer:
+    # One background image. parallax: share of the camera movement it follows (0 = pinned to the screen, 1 = moves with the world)
+    # The scaled pixels are cached: tiled layers keep one scaled tile while it is small, others (and big tiles, e.g. at high zoom) only the
+    # region around the view (plus half a view of margin)
+    FIELDS = ("path", "off_x", "off_y", "zoom", "alpha", "parallax", "tile_x", "tile_y")
+    TILE_CACHE_VIEWS = 4 # Largest scaled tile, in view areas, that is cached whole
+    def __init__(self, path=None, img=None, off_x=0, off_y=0, zoom=1.0, alpha=255, parallax=0.1, tile_x=False, tile_y=False):
+        self.path = path; self.img = img; self.off_x = off_x; self.off_y = off_y; self.zoom = zoom; self.alpha = alpha; self.parallax = parallax; self.tile_x = tile_x; self.tile_y = tile_y
+        self.cache = None; self.cache_key = None; self.cache_rect = None; self.cache_alpha = None; self.builds = 0
+        if self.img is None and path:
+            try: self.img = pygame.image.load(path).convert_alpha()
+            except Exception as e: log_debug(f"[ERROR] BG layer load failed for {path}: {e}")
+    def to_dict(self): return {k: getattr(self, k) for k in self.FIELDS}
+    def scaled(self, key, rect):
+        sx0, sy0, sx1, sy1 = rect; s = key[2]; pw, ph = int(sx1 * s) - int(sx0 * s), int(sy1 * s) - int(sy0 * s)
+        if pw < 1 or ph < 1: return None
+        self.cache = pygame.transform.scale(self.img.subsurface((sx0, sy0, sx1 - sx0, sy1 - sy0)), (pw, ph)); self.cache_key = key; self.cache_rect = rect; self.cache_alpha = None; self.builds += 1
+        return self.cache
+    def wrapped(self, key, rect):
+        # Scaled pixels of the tiled plane over rect (scaled px, relative to the tile at the origin): each tile overlapping it
+        # contributes only its own piece, scaled on source pixel boundaries like scaled()
+        ul, ut, ur, ub = rect; bw, bh, s = key[:3]; iw, ih = self.img.get_size()
+        self.cache = pygame.Surface((ur - ul, ub - ut), pygame.SRCALPHA)
+        for j in range(ut // bh, -(-ub // bh)):
+            for i in range(ul // bw, -(-ur // bw)):
+                sx0, sy0 = int(max(0, ul - i * bw) / s), int(max(0, ut - j * bh) / s); sx1, sy1 = min(iw, int(math.ceil(min(bw, ur - i * bw) / s))), min(ih, int(math.ceil(min(bh, ub - j * bh) / s)))
+                pw, ph = int(sx1 * s) - int(sx0 * s), int(sy1 * s) - int(sy0 * s)
+                if pw < 1 or ph < 1: continue
+                self.cache.blit(pygame.transform.scale(self.img.subsurface((sx0, sy0, sx1 - sx0, sy1 - sy0)), (pw, ph)), (i * bw + int(sx0 * s) - ul, j * bh + int(sy0 * s) - ut))
+        self.cache_key = key; self.cache_rect = rect; self.cache_alpha = None; self.builds += 1
+        return self.cache
+    def draw(self, screen, cx, cy, cam_x, cam_y, zoom, view_w, view_h):
+        if self.img is None or self.alpha <= 0: return
+        iw, ih = self.img.get_size(); s = self.zoom * zoom * 0.5; bw, bh = int(iw * s), int(ih * s)
+        if bw < 1 or bh < 1: return
+        bx = int(cx + (self.off_x - cam_x * self.parallax) * zoom - bw // 2); by = int(cy + (self.off_y - cam_y * self.parallax) * zoom - bh // 2); key = (bw, bh, s)
+        if (self.tile_x or self.tile_y) and bw * bh > self.TILE_CACHE_VIEWS * view_w * view_h:
+            # Plane px under the view, shifted to the first tile on tiled axes; rebuilt only when they leave the cached window
+            ul, ut, ur, ub = -bx, -by, view_w - bx, view_h - by
+            if not self.tile_x: ul, ur = max(0, ul), min(bw, ur)
+            if not self.tile_y: ut, ub = max(0, ut), min(bh, ub)
+            if ul >= ur or ut >= ub: return
+            kx, ky = (ul // bw if self.tile_x else 0), (ut // bh if self.tile_y else 0); ul, ur, ut, ub = ul - kx * bw, ur - kx * bw, ut - ky * bh, ub - ky * bh
+            key += ("wrap",); r = self.cache_rect
+            if self.cache_key != key or ul < r[0] or ut < r[1] or ur > r[2] or ub > r[3]:
+                mx, my = view_w // 2 + 1, view_h // 2 + 1; ul, ut, ur, ub = ul - mx, ut - my, ur + mx, ub + my
+                if not self.tile_x: ul, ur = max(0, ul), min(bw, ur)
+                if not self.tile_y: ut, ub = max(0, ut), min(bh, ub)
+                self.wrapped(key, (ul, ut, ur, ub))
+            surf = self.cache; blits = [(surf, (bx + kx * bw + self.cache_rect[0], by + ky * bh + self.cache_rect[1]))]
+        elif self.tile_x or self.tile_y:
+            if self.cache_key != key or self.cache_rect != (0, 0, iw, ih): self.scaled(key, (0, 0, iw, ih))
+            surf = self.cache; xs = range(bx % bw - bw, view_w, bw) if self.tile_x else (bx,); ys = range(by % bh - bh, view_h, bh) if self.tile_y else (by,)
+            blits = [(surf, (x, y)) for y in ys for x in xs]
+        else:
+            # Source pixels under the view; rescale only when they leave the cached region
+            vl, vt, vr, vb = max(0, -bx), max(0, -by), min(bw, view_w - bx), min(bh, view_h - by)
+            if vl >= vr or vt >= vb: return
+            need = (int(vl / s), int(vt / s), min(iw, int(math.ceil(vr / s))), min(ih, int(math.ceil(vb / s)))); r = self.cache_rect
+            if self.cache_key != key or not r or need[0] < r[0] or need[1] < r[1] or need[2] > r[2] or need[3] > r[3]:
+                mx, my = int(view_w / 2 / s) + 1, int(view_h / 2 / s) + 1
+                if not self.scaled(key, (max(0, need[0] - mx), max(0, need[1] - my), min(iw, need[2] + mx), min(ih, need[3] + my))): return
+            surf = self.cache; blits = [(surf, (bx + int(self.cache_rect[0] * s), by + int(self.cache_rect[1] * s)))]
+        if self.cache_alpha != self.alpha: surf.set_alpha(int(self.alpha) if self.alpha < 255 else None); self.cache_alpha = self.alpha
+        screen.blits(blits, False)
+
+class ParallaxBackground:
+    # Background layers, drawn first to last (first = farthest); `selected` is the layer the BG settings sliders edit
+    def __init__(self):
+        self.layers = []; self.selected = 0
+    def add(self, layer):
+        self.layers.append(layer); self.selected = len(self.layers) - 1; return layer
+    def remove(self, idx):
+        if 0 <= idx < len(self.layers): del self.layers[idx]
+        self.selected = max(0, min(self.selected, len(self.layers) - 1))
+    def current(self): return self.layers[self.selected] if 0 <= self.selected < len(self.layers) else None
+    def state(self): return (self.selected, tuple(tuple(l.to_dict().values()) for l in self.layers))
+    def to_settings(self): return {"bg_layers": [l.to_dict() for l in self.layers], "bg_selected": self.selected}
+    def load_settings(self, data):
+        # Settings written before layers existed keep one image as flat bg_path/bg_off_x/... keys
+        items = data.get("bg_layers")
+        if items is None: items = [{k[3:]: v for k, v in data.items() if k[3:] in BgLayer.FIELDS}] if data.get("bg_path") else []
+        self.layers = [BgLayer(**{k: v for k, v in d.items() if k in BgLayer.FIELDS}) for d in items if isinstance(d, dict)]
+        self.selected = max(0, min(int(data.get("bg_selected", 0)), len(self.layers) - 1))
+    def draw(self, screen, cx, cy, cam_x, cam_y, zoom, view_w, view_h):
+        for layer in self.layers: layer.draw(screen, cx, cy, cam_x, cam_y, zoom, view_w, view_h)
+    def stats(self): return f"BG {len(self.layers)} layers, {sum(l.builds for l in self.layers)} rescales"
+
+class HitEngine:
+    # Hit/hurt slice overlaps per sim step: boxes come from the sources' slice tables, hurtboxes are sorted by left edge and
+    # each hitbox only scans the window of lefts that can reach it (widest hurtbox bounds the window), then a full AABB test
+    def __init__(self, master):
+        self.master = master; self.events = []; self.new_events = []; self.contacts = set(); self.total = 0
+    def add_entity(self, owners, keys, hits, hurts, owner, key, source_idx, f_idx, x, y, facing_right):
+        # key: stable int per entity (player 0, NPCs 1.., then crowd agents) so contacts can be matched across steps
+        if source_idx >= len(self.master.sources): return
+        table = self.master.sources[source_idx].slice_table
+        if not table: return
+        oid = len(owners); owners.append(owner); keys.append(key)
+        for name, bx, by, bw, bh, is_hit in table[min(max(0, f_idx), len(table)-1)]:
+            left = x + bx if facing_right else x - bx - bw # Mirrored the same way draw_sprite mirrors the outline
+            (hits if is_hit else hurts).append((left, y + by, left + bw, y + by + bh, oid, name))
+    def collect(self):
+        # events: [{'attacker','hit','victim','hurt','rect'}]; NPCs are AseAI objects, crowd agents (crowd, index)
+        m = self.master; owners = []; keys = []; hits = []; hurts = []; events = []; new_events = []; contacts = set(); prev = self.contacts
+        if m.visible and m.profiles: self.add_entity(owners, keys, hits, hurts, m, 0, m.current_source(), m.frame_idx, m.x, m.y, m.facing_right)
+        for k, ai in enumerate(m.ai_list):
+            if ai.visible: self.add_entity(owners, keys, hits, hurts, ai, k + 1, ai.current_source(), ai.frame_idx, ai.x, ai.y, ai.facing_right)
+        base = len(m.ai_list) + 1
+        for crowd in m.crowds: crowd.slice_boxes(owners, keys, hits, hurts, base); base += crowd.n
+        if hits and hurts:
+            hurts.sort(key=lambda b: b[0]); lefts = [b[0] for b in hurts]; reach = max(b[2] - b[0] for b in hurts)
+            for hl, ht, hr, hb, hid, hname in hits:
+                for i in range(bisect.bisect_right(lefts, hl - reach), bisect.bisect_left(lefts, hr)):
+                    ul, ut, ur, ub, uid, uname = hurts[i]
+                    if uid != hid and ur > hl and ut < hb and ub > ht:
+                        l = hl if hl > ul else ul; t = ht if ht > ut else ut
+                        ev = {'attacker': owners[hid], 'hit': hname, 'victim': owners[uid], 'hurt': uname, 'rect': (l, t, (hr if hr < ur else ur) - l, (hb if hb < ub else ub) - t)}; events.append(ev)
+                        # new_events: first event of each attacker/victim pair that was not touching on the previous step
+                        pair = keys[hid] << 32 | keys[uid]
+                        if pair not in contacts:
+                            contacts.add(pair)
+                            if pair not in prev: new_events.append(ev)
+        self.events = events; self.new_events = new_events; self.contacts = contacts; self.total += len(events)
+        return events
+
+class VfxPool:
+    # Fixed-capacity effect pool (dash ghosts, hit sparks, landing/dash dust) in preallocated parallel lists. Live particles sit in
+    # slots [0, n) and a dead one is swapped with the last, so spawning, updating and drawing never allocate; spawns past capacity are dropped
+    GHOST, SPARK, DUST = range(3)
+    GHOST_TINT = (100, 150, 255)
+    def __init__(self, master, capacity=512):
+        self.master = master; self.capacity = capacity; self.n = 0; self.dropped = 0; self.dots = {}
+        self.kind = [0] * capacity; self.x = [0.0] * capacity; self.y = [0.0] * capacity; self.vx = [0.0] * capacity; self.vy = [0.0] * capacity
+        self.alpha = [0.0] * capacity; self.fade = [0.0] * capacity; self.size = [0.0] * capacity; self.grow = [0.0] * capacity
+        self.src = [0] * capacity; self.frame = [0] * capacity; self.right = [True] * capacity; self.color = [(255, 255, 255)] * capacity
+        self.fields = (self.kind, self.x, self.y, self.vx, self.vy, self.alpha, self.fade, self.size, self.grow, self.src, self.frame, self.right, self.color)
+    def spawn(self, kind, x, y, vx=0.0, vy=0.0, alpha=255.0, fade=15.0, size=0.0, grow=0.0, src=0, frame=0, right=True, color=(255, 255, 255)):
+        if self.n >= self.capacity: self.dropped += 1; return -1
+        i = self.n; self.n += 1
+        self.kind[i] = kind; self.x[i] = x; self.y[i] = y; self.vx[i] = vx; self.vy[i] = vy; self.alpha[i] = alpha; self.fade[i] = fade
+        self.size[i] = size; self.grow[i] = grow; self.src[i] = src; self.frame[i] = frame; self.right[i] = right; self.color[i] = color
+        return i
+    def ghost(self, x, y, src, frame, right):
+        return self.spawn(self.GHOST, x, y, alpha=180.0, fade=15.0, src=src, frame=frame, right=right)
+    def sparks(self, x, y, count=6, color=(250, 204, 21)):
+        free = self.capacity - self.n
+        if count > free: self.dropped += count - free; count = free
+        for _ in range(count):
+            ang = random.uniform(0, math.tau); sp = random.uniform(2.0, 6.0)
+            self.spawn(self.SPARK, x, y, math.cos(ang) * sp, math.sin(ang) * sp - 1.5, 255.0, 22.0, random.uniform(1.5, 3.0), -0.08, color=color)
+    def dust(self, x, y, count=4):
+        for k in range(count):
+            d = k - (count - 1) / 2; self.spawn(self.DUST, x + d * 6, y - 2, d * 0.8, -random.uniform(0.3, 0.7), 160.0, 8.0, 3.0, 0.25, color=(170, 170, 160))
+    def kill(self, i):
+        j = self.n - 1
+        if i != j:
+            for f in self.fields: f[i] = f[j]
+        self.n = j
+    def clear(self): self.n = 0
+    def update(self, dt):
+        step = dt / SIM_DT; i = 0
+        while i < self.n:
+            a = self.alpha[i] - self.fade[i] * step
+            if a <= 0: self.kill(i); continue
+            self.alpha[i] = a
+            if self.kind[i] != self.GHOST:
+                self.x[i] += self.vx[i] * step; self.y[i] += self.vy[i] * step; self.size[i] = max(0.5, self.size[i] + self.grow[i] * step)
+                if self.kind[i] == self.SPARK: self.vy[i] += 0.25 * step
+            i += 1
+    def dot(self, r, color):
+        surf = self.dots.get((r, color))
+        if surf is None: surf = self.dots[(r, color)] = pygame.Surface((r * 2, r * 2), pygame.SRCALPHA); pygame.draw.circle(surf, color, (r, r), r)
+        return surf
+    def draw(self, screen, cam_x, cam_y, cx, cy, front):
+        # Ghosts and dust go behind the sprites (front=False), sparks on top; surface alpha does the fading, so cached images are shared
+        m = self.master; zoom = m.render_zoom; back = m.render_alpha - 1.0
+        for i in range(self.n):
+            k = self.kind[i]
+            if (k == self.SPARK) != front: continue
+            if k == self.GHOST:
+                if self.src[i] >= len(m.sources) or not m.sources[self.src[i]].frames: continue
+                src = m.sources[self.src[i]]; scaled, ox, oy, _ = m.sprite_cache.get(src, min(max(0, self.frame[i]), len(src.frames)-1), zoom, self.right[i], self.GHOST_TINT)
+                scaled.set_alpha(int(self.alpha[i])); screen.blit(scaled, (int(cx + (self.x[i] - cam_x)*zoom + ox), int(cy + (self.y[i] - cam_y)*zoom + oy)))
+            else:
+                # Moving particles are drawn back along their velocity by the interpolation remainder
+                r = max(1, int(self.size[i] * zoom)); dot = self.dot(r, self.color[i]); dot.set_alpha(int(self.alpha[i]))
+                screen.blit(dot, (int(cx + (self.x[i] + self.vx[i] * back - cam_x)*zoom) - r, int(cy + (self.y[i] + self.vy[i] * back - cam_y)*zoom) - r))
+
+class StateHistory:
+    # Per-tick snapshots of the player and NPCs for rewind/scrubbing. A tick packs into one binary record: numbers as float64 plus a type
+    # byte each (so ints/bools restore as such), strings and lists interned to u32 ids. Every KEY_INTERVAL ticks, or when the layout
+    # changes (NPC added/removed), the record is kept zlib-compressed as a keyframe; other ticks keep the compressed XOR against their keyframe,
+    # so any tick decodes from at most two blobs. Whole keyframe groups are dropped oldest-first past max_bytes. Crowds are not recorded.
+    # NPC records carry the AseAI uid, so restoring after NPCs were added or removed still lands each record on its own NPC.
+    # Recording costs more than stepping a sparse level, so it only runs while player.history_enabled (off by default)
+    KEY_INTERVAL = 120
+    PLAYER_NUM = ("x", "y", "vx", "vy", "cam_x", "cam_y", "grounded", "jumps_left", "facing_right", "frame_idx", "anim_timer", "combo_step", "combo_reset_timer", "attack_buffer", "action_slot",
+                  "action_step", "loop_counter", "dash_charges", "dash_timer", "attack_move_timer", "swap_timer", "visible", "pbomb_pause_timer", "shake_timer", "shake_intensity", "ghost_timer", "lod_tick") # + dash_cooldowns
+    PLAYER_OBJ = ()
+    AI_NUM = ("uid", "x", "y", "vx", "vy", "grounded", "facing_right", "frame_idx", "anim_timer", "action_slot", "action_step", "ai_timer", "swap_timer", "visible", "lod_tier", "lod_last", "lod_due")
+    AI_OBJ = ("decision",)
+    TYPE_CODES = {bool: 1, int: 2} # anything else restores as float
+    CASTS = (float, bool, int)
+    def __init__(self, master, max_bytes=4 << 20):
+        self.master = master; self.max_bytes = max_bytes
+        # Per entity kind: record layout and attrgetters (C-level attribute fetches keep packing ~50 NPCs per tick cheap)
+        self.player_spec = self.spec(self.PLAYER_NUM, self.PLAYER_OBJ, 2); self.ai_spec = self.spec(self.AI_NUM, self.AI_OBJ)
+        self.clear()
+    def spec(self, num, objs, tail=0):
+        n = len(num) + tail; return struct.Struct(f"<{n}d{n}s{len(objs)}I"), self.getter(num), self.getter(objs), num, objs
+    @staticmethod
+    def getter(names):
+        # attrgetter returns a bare value for one name (and needs at least one): always hand back a tuple
+        if len(names) > 1: return operator.attrgetter(*names)
+        return (lambda o: (getattr(o, names[0]),)) if names else (lambda o: ())
+    def clear(self):
+        self.groups = [] # [first_tick, keyframe (zlib), [delta (zlib) for first_tick+1, ...]]
+        self.end = 0; self.bytes = 0; self.cursor = None; self.key_raw = None; self.read_key = (None, None); self.ids = {}; self.values = []
+    def span(self): return (self.groups[0][0] if self.groups else self.end), self.end
+    def freeze(self, v): return tuple(self.freeze(e) for e in v) if isinstance(v, list) else v
+    def thaw(self, v): return [self.thaw(e) for e in v] if isinstance(v, tuple) else v
+    def intern(self, v):
+        i = self.ids.get(v)
+        if i is None: i = self.ids[v] = len(self.values); self.values.append(v)
+        return i
+    def pack_entity(self, spec, o, tail=()):
+        rec, get_num, get_objs, _, _ = spec; vals = get_num(o) + tuple(tail); keys = []; ids = self.ids
+        for v in get_objs(o):
+            if type(v) is list: v = self.freeze(v)
+            i = ids.get(v)
+            keys.append(self.intern(v) if i is None else i)
+        return rec.pack(*vals, bytes(map(self.TYPE_CODES.get, map(type, vals), itertools.repeat(0))), *keys)
+    def unpack_entity(self, spec, data, off, o, tail=None):
+        rec, _, _, num, objs = spec; vals = rec.unpack_from(data, off); n = len(num) + (len(tail) if tail is not None else 0); casts = self.CASTS
+        out = [casts[c](v) for c, v in zip(vals[n], vals[:n])]
+        for name, v in zip(num, out): setattr(o, name, v)
+        if tail is not None: tail[:] = out[len(num):]
+        for name, k in zip(objs, vals[n + 1:]): setattr(o, name, self.thaw(self.values[k]))
+    def pack_tick(self):
+        m = self.master; spec = self.ai_spec; parts = [struct.pack("<I", len(m.ai_list)), self.pack_entity(self.player_spec, m, m.dash_cooldowns)]
+        parts.extend(self.pack_entity(spec, ai) for ai in m.ai_list)
+        return b"".join(parts)
+    def xor(self, a, b):
+        if np is not None: return (np.frombuffer(a, np.uint8) ^ np.frombuffer(b, np.uint8)).tobytes()
+        return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(len(a), "little")
+    def record(self):
+        # Called once per sim step, after the step
+        data = self.pack_tick(); g = self.groups[-1] if self.groups else None
+        if g is None or self.end - g[0] >= self.KEY_INTERVAL or len(data) != len(self.key_raw):
+            z = zlib.compress(data); self.groups.append([self.end, z, []]); self.key_raw = data
+        else: z = zlib.compress(self.xor(data, self.key_raw), 1); g[2].append(z)
+        self.bytes += len(z); self.end += 1
+        while self.bytes > self.max_bytes and len(self.groups) > 1:
+            g = self.groups.pop(0); self.bytes -= len(g[1]) + sum(map(len, g[2]))
+    def group_at(self, tick): return bisect.bisect_right([g[0] for g in self.groups], tick) - 1
+    def raw(self, tick):
+        g = self.groups[self.group_at(tick)]; key = self.read_key[1] if self.read_key[0] is g else None
+        if key is None: key = zlib.decompress(g[1]); self.read_key = (g, key)
+        k = tick - g[0]
+        return key if k == 0 else self.xor(zlib.decompress(g[2][k - 1]), key)
+    def restore(self, data):
+        # NPCs added since the tick keep their current state; ones removed since are skipped
+        m = self.master; n = struct.unpack_from("<I", data)[0]; off = 4
+        self.unpack_entity(self.player_spec, data, off, m, m.dash_cooldowns); off += self.player_spec[0].size
+        rec = self.ai_spec[0]; by_uid = {ai.uid: ai for ai in m.ai_list}
+        for _ in range(n):
+            ai = by_uid.get(int(rec.unpack_from(data, off)[0])) # uid is the first AI field
+            if ai is not None: self.unpack_entity(self.ai_spec, data, off, ai)
+            off += rec.size
+        m.prev_x, m.prev_y, m.prev_cam_x, m.prev_cam_y = m.x, m.y, m.cam_x, m.cam_y
+        for ai in m.ai_list: ai.prev_x, ai.prev_y = ai.x, ai.y
+    def seek(self, tick):
+        # Enters scrub mode: advance() stops stepping the simulation until resume()/live()
+        if not self.groups: return
+        first, end = self.span(); self.cursor = min(max(int(tick), first), end - 1); self.restore(self.raw(self.cursor))
+        m = self.master; m.vfx.clear(); m.hits.collect(); m.sim_accum = 0.0; m.render_alpha = 1.0
+    def step(self, n): self.seek((self.end - 1 if self.cursor is None else self.cursor) + n)
+    def resume(self):
+        # Play on from the shown tick. Later ticks are discarded: the AI rolls random decisions, so that future can't be replayed anyway
+        if self.cursor is None: return
+        i = self.group_at(self.cursor); g = self.groups[i]; k = self.cursor - g[0]
+        for old in self.groups[i + 1:]: self.bytes -= len(old[1]) + sum(map(len, old[2]))
+        self.bytes -= sum(map(len, g[2][k:])); del self.groups[i + 1:]; del g[2][k:]
+        self.key_raw = zlib.decompress(g[1]); self.end = self.cursor + 1; self.cursor = None
+    def live(self):
+        if self.cursor is not None: self.seek(self.end - 1); self.resume()
+    def stats(self):
+        first, end = self.span(); n = end - first
+        return f"History: {n} ticks ({n * SIM_DT / 1000:.1f}s), {self.bytes / 1024:.0f}KB in {len(self.groups)} keyframes ({self.bytes / max(1, n):.0f}B/tick)"
+
+# Profile slots, in mapping order; entities hold the playing slot as an index into this list (-1: none)
+SLOT_NAMES = ["IDLE", "WALK", "JUMP", "FALL", "ComboAttack_1", "ComboAttack_2", "ComboAttack_3", "ComboAttack_4", "JUMPATTACK", "POWERBOMB", "DASH", "SKILL 1", "SKILL 2", "SKILL 3", "HURT", "Swap_Enter", "Swap_Exit"]
+S_IDLE, S_WALK, S_JUMP, S_FALL, S_COMBO_1, S_COMBO_2, S_COMBO_3, S_COMBO_4, S_JUMPATTACK, S_POWERBOMB, S_DASH, S_SKILL_1, S_SKILL_2, S_SKILL_3, S_HURT, S_SWAP_ENTER, S_SWAP_EXIT = range(len(SLOT_NAMES))
+F_COMBO, F_SKILL, F_LOOP, F_DASH, F_SWAP_EXIT = 1, 2, 4, 8, 16 # ActionTable.e_flags: slot kind, then "(loop)" / "DASH" / "Swap_Exit" tags
+SLOT_FLAGS = [F_COMBO if "ComboAttack" in n else (F_SKILL if "SKILL" in n else 0) for n in SLOT_NAMES]
+
+class ActionTable:
+    # A profile's mappings compiled into flat parallel lists, so per-tick animation is index lookups instead of tag-name matching.
+    # Entry e is one tag of a slot's chain (slot_first[s] .. slot_first[s] + slot_len[s]); per entry: source, frame range, flags,
+    # the next entry in the chain (-1 at the end) and the source's frame durations. Tags missing from their source are left out
+    def __init__(self, profile=None, sources=()):
+        n = len(SLOT_NAMES); self.slot_first = [0] * n; self.slot_len = [0] * n; self.slot_mapped = [False] * n; self.first = [-1] * n
+        self.e_src = []; self.e_from = []; self.e_to = []; self.e_flags = []; self.e_next = []; self.e_durs = []; durs = {}
+        if profile is None: return
+        for s, name in enumerate(SLOT_NAMES):
+            tags = profile.mappings.get(name, []); self.slot_mapped[s] = bool(tags); self.slot_first[s] = len(self.e_src)
+            for sid, tag in tags:
+                if sid >= len(sources) or tag not in sources[sid].tags: continue
+                if sid not in durs: durs[sid] = sources[sid].frames.durations
+                lo, hi = sources[sid].tags[tag]; self.e_src.append(sid); self.e_from.append(lo); self.e_to.append(hi); self.e_durs.append(durs[sid]); self.e_next.append(len(self.e_src))
+                self.e_flags.append(SLOT_FLAGS[s] | (F_LOOP if "(loop)" in tag.lower() else 0) | (F_DASH if tag == "DASH" else 0) | (F_SWAP_EXIT if tag == "Swap_Exit" else 0))
+            self.slot_len[s] = len(self.e_src) - self.slot_first[s]
+            if self.slot_len[s]: self.e_next[-1] = -1
+        self.first = [self.slot_first[s] if self.slot_len[s] else -1 for s in range(n)] # Entry a slot starts on (-1: nothing playable)
+    def entry(self, slot, step):
+        # (slot, step) survives recompiles: a chain that shrank under a playing entity just reads as finished
+        return self.slot_first[slot] + step if slot >= 0 and 0 <= step < self.slot_len[slot] else -1
 
 class AseProfile:
     def __init__(self, name, source_idx):
-        self.name = name; self.source_idx = source_idx
-        self.mappings = { "IDLE": [], "WALK": [], "JUMP": [], "FALL": [], "ComboAttack_1": [], "ComboAttack_2": [], "ComboAttack_3": [], "ComboAttack_4": [], "JUMPATTACK": [], "POWERBOMB": [], "DASH": [], "SKILL 1": [], "SKILL 2": [], "SKILL 3": [], "HURT": [], "Swap_Enter": [], "Swap_Exit": [] }
+        self.name = name; self.source_idx = source_idx; self.auto_map = {} # slot -> candidates last auto-mapped (see auto_map_profile)
+        self.mappings = {slot: [] for slot in SLOT_NAMES}
+        self.rev = 0; self.table = ActionTable(); self.table_key = None # Bump rev after editing mappings in place
+    def compile(self, sources, versions):
+        key = (self.rev, versions)
+        if key != self.table_key: self.table = ActionTable(self, sources); self.table_key = key
+        return self.table
+
+# NPC update tiers (AsepritePlayer.update_ai): by distance past the edge of the drawn view
+AI_NEAR, AI_MID, AI_FAR = range(3)
+LOD_NAMES = ("near", "mid", "far")
 
 class AseAI:
+    uids = itertools.count(1) # Stable ids for StateHistory records (list positions shift when NPCs are removed)
     def __init__(self, master, profile):
-        self.master = master; self.profile = profile; self.spawn_x = random.randint(300, 1500); self.spawn_y = 500
-        self.x, self.y = self.spawn_x, self.spawn_y; self.vx = self.vy = 0; self.grounded = True; self.facing_right = random.choice([True, False])
-        self.frame_idx = 0; self.anim_timer = 0; self.active_tag_info = None; self.action_queue = []; self.action_end_frame = -1; self.ai_timer = random.randint(30, 90); self.decision = "IDLE"
-        self.swap_timer = 0; self.visible = True; self.active_action_slot = None
-    def update(self, ground_y, dt):
+        self.uid = next(AseAI.uids); self.master = master; self.profile = profile; self.spawn_x = random.randint(300, 1500); self.spawn_y = 500
+        self.x, self.y = self.spawn_x, self.spawn_y; self.prev_x, self.prev_y = self.x, self.y; self.vx = self.vy = 0; self.grounded = True; self.facing_right = random.choice([True, False])
+        self.frame_idx = 0; self.anim_timer = 0; self.action_slot = -1; self.action_step = 0; self.ai_timer = random.randint(30, 90); self.decision = "IDLE"
+        self.swap_timer = 0; self.visible = True; self.lod_tier = AI_NEAR; self.lod_last = self.lod_due = master.lod_tick # Steps of the last update / next FAR slice
+    def current_source(self):
+        e = self.profile.table.entry(self.action_slot, self.action_step)
+        return self.profile.table.e_src[e] if e >= 0 else self.profile.source_idx
+    def update(self, ground_y, dt, steps=1):
+        # steps > 1: one coarse update standing in for that many sim steps (far NPCs); velocities and timers are scaled, frames catch up
         if self.swap_timer > 0:
-            self.swap_timer -= dt
+            self.swap_timer -= dt * steps
             if self.swap_timer <= 0:
-                self.x, self.y = self.spawn_x, self.spawn_y; self.visible = True; self.trigger_action("Swap_Enter")
+                self.x, self.y = self.prev_x, self.prev_y = self.spawn_x, self.spawn_y; self.visible = True; self.trigger_action(S_SWAP_ENTER)
             return
-        self.ai_timer -= 1; dist_p = self.master.x - self.x
+        self.ai_timer -= steps; dist_p = self.master.x - self.x
         if self.ai_timer <= 0:
             choices = ["IDLE", "CHASE", "ATTACK", "DASH", "JUMP", "SWAP"] if abs(dist_p) < 600 else ["IDLE", "WALK_L", "WALK_R"]
             self.decision = random.choice(choices); self.ai_timer = random.randint(40, 120)
-            if self.decision == "SWAP": self.trigger_action("Swap_Exit")
-            elif self.decision == "ATTACK" and abs(dist_p) < 200: self.facing_right = dist_p > 0; self.trigger_action(f"ComboAttack_{random.randint(1,4)}")
-            elif self.decision == "DASH": self.facing_right = dist_p > 0; self.trigger_action("DASH")
+            if self.decision == "SWAP": self.trigger_action(S_SWAP_EXIT)
+            elif self.decision == "ATTACK" and abs(dist_p) < 200: self.facing_right = dist_p > 0; self.trigger_action(S_COMBO_1 + random.randint(0, 3))
+            elif self.decision == "DASH": self.facing_right = dist_p > 0; self.trigger_action(S_DASH)
             elif self.decision == "JUMP" and self.grounded: self.vy = self.master.jump_power; self.grounded = False
-        self.vx *= 0.85
-        if not self.active_tag_info:
+        t = self.profile.table; e = t.entry(self.action_slot, self.action_step) if self.action_slot >= 0 else -1
+        if e < 0: self.action_slot = -1
+        # A coarse update moves by the sum of the per-step velocities: vx decays geometrically (coasting), vy grows by gravity each step
+        coast = self.vx * 0.85 * (1 - 0.85 ** steps) / 0.15 if steps > 1 else None
+        self.vx *= 0.85 if steps == 1 else 0.85 ** steps
+        if e < 0:
             if self.decision == "WALK_R": self.vx = 4; self.facing_right = True
             elif self.decision == "WALK_L": self.vx = -4; self.facing_right = False
             elif self.decision == "CHASE": self.vx = 5.5 if dist_p > 0 else -5.5; self.facing_right = dist_p > 0
+            if self.decision in ("WALK_R", "WALK_L", "CHASE"): coast = None # Set to the same speed every step
             if abs(dist_p) < 100: self.decision = "IDLE"
-        if self.active_tag_info and self.active_tag_info[1] == "DASH": self.vy = 0
-        else: self.vy += self.master.gravity
-        self.x += self.vx; self.y += self.vy
+        g = self.master.gravity
+        if e >= 0 and t.e_flags[e] & F_DASH: self.vy = 0; dy = 0
+        else: dy = self.vy * steps + g * steps * (steps + 1) / 2; self.vy += g * steps
+        y0 = self.y; self.x += self.vx * steps if coast is None else coast; self.y += dy
+        if steps > 1 and self.vy > 0 and y0 < ground_y: self.land_swept(y0) # Walkers on the ground skip it
         if self.y >= ground_y: self.y = ground_y; self.vy = 0; self.grounded = True
         if self.vy >= 0:
-            for plat in self.master.platforms:
+            for plat in self.master.platform_grid.at_point(self.x, self.y):
                 if plat.collidepoint(self.x, self.y) and self.y - self.vy <= plat.top + 10: self.y = plat.top; self.vy = 0; self.grounded = True
-        if self.grounded and self.active_tag_info:
-            if "(loop)" in self.active_tag_info[1].lower(): self.active_tag_info = None; self.active_action_slot = None
-        target_info = None
-        if not self.active_tag_info:
-            state = "WALK" if self.grounded and abs(self.vx) > 0.5 else ("IDLE" if self.grounded else ("JUMP" if self.vy < 0 else "FALL"))
-            m = self.profile.mappings.get(state, []) if self.profile else []; target_info = m[0] if m else None
-        else: target_info = self.active_tag_info
-        if target_info:
-            src = self.master.sources[target_info[0]]; tr = src.tags.get(target_info[1], (0,0))
-            if self.frame_idx < tr[0] or self.frame_idx > tr[1]: self.frame_idx = tr[0]; self.anim_timer = 0
+        if self.grounded and e >= 0 and t.e_flags[e] & F_LOOP: self.action_slot = e = -1
+        acting = e >= 0
+        if not acting: e = t.first[S_WALK if self.grounded and abs(self.vx) > 0.5 else (S_IDLE if self.grounded else (S_JUMP if self.vy < 0 else S_FALL))]
+        if e >= 0:
+            lo, hi = t.e_from[e], t.e_to[e]; durs = t.e_durs[e]
+            if self.frame_idx < lo or self.frame_idx > hi: self.frame_idx = lo; self.anim_timer = 0
             if not self.master.is_paused:
-                self.anim_timer += dt * self.master.playback_speed
-                if self.frame_idx < len(src.frames):
-                    frame_duration = src.frames[self.frame_idx]['duration']
-                    if self.anim_timer >= frame_duration:
-                        self.frame_idx += 1; self.anim_timer = 0
-                        if self.active_tag_info and self.frame_idx > self.action_end_frame:
-                            if target_info[1] == "Swap_Exit": self.visible = False; self.swap_timer = 500; self.active_tag_info = None; self.active_action_slot = None; return
-                            if "(loop)" in target_info[1].lower(): self.frame_idx = tr[0]
-                            elif self.action_queue: self.active_tag_info = self.action_queue.pop(0); s = self.master.sources[self.active_tag_info[0]]; self.frame_idx, self.action_end_frame = s.tags.get(self.active_tag_info[1], (0,0))
-                            else: self.active_tag_info = None; self.active_action_slot = None
-                        elif self.frame_idx > tr[1]: self.frame_idx = tr[0]
-                else: self.frame_idx = tr[0]
+                # At most one frame per step, as at full rate; a coarse update keeps the remainder so skipped time is not lost
+                self.anim_timer += dt * self.master.playback_speed * steps
+                for _ in range(steps):
+                    if self.frame_idx >= len(durs): self.frame_idx = lo; break
+                    if self.anim_timer < durs[self.frame_idx]: break
+                    self.anim_timer = self.anim_timer - durs[self.frame_idx] if steps > 1 else 0; self.frame_idx += 1
+                    if acting and self.frame_idx > hi:
+                        flags = t.e_flags[e]; nxt = t.e_next[e]
+                        if flags & F_SWAP_EXIT: self.visible = False; self.swap_timer = 500; self.action_slot = -1; return
+                        if flags & F_LOOP: self.frame_idx = lo
+                        elif nxt >= 0: self.action_step += 1; self.frame_idx = t.e_from[nxt]; break
+                        else: self.action_slot = -1; break
+                    elif self.frame_idx > hi: self.frame_idx = lo
+    def land_swept(self, prev_y):
+        # A coarse move can pass through a 20px platform: land on the highest top crossed since prev_y (the end-point check below misses it)
+        for plat in sorted(self.master.platform_grid.in_rect(self.x, prev_y, self.x, self.y), key=lambda p: p.top):
+            if plat.left <= self.x < plat.right and prev_y <= plat.top + 10 and self.y >= plat.top: self.y = plat.top; self.vy = 0; self.grounded = True; return
     def trigger_action(self, slot):
-        tags = self.profile.mappings.get(slot, [])
-        if tags:
-            self.active_action_slot = slot
-            self.action_queue = list(tags); self.active_tag_info = self.action_queue.pop(0)
-            src = self.master.sources[self.active_tag_info[0]]; self.frame_idx, self.action_end_frame = src.tags.get(self.active_tag_info[1], (0,0)); self.anim_timer = 0
-            if slot == "DASH": self.vx = 8 if self.facing_right else -8
+        e = self.profile.table.first[slot]
+        if e >= 0:
+            self.action_slot = slot; self.action_step = 0; self.frame_idx = self.profile.table.e_from[e]; self.anim_timer = 0
+            if slot == S_DASH: self.vx = 8 if self.facing_right else -8
+
+class AseCrowd:
+    # Struct-of-arrays version of AseAI for large crowds: same decisions, physics and animation rules, batched with NumPy
+    IDLE, CHASE, ATTACK, DASH, JUMP, SWAP, WALK_L, WALK_R = range(8)
+    SLOTS = [S_SWAP_ENTER, S_SWAP_EXIT, S_DASH, S_COMBO_1, S_COMBO_2, S_COMBO_3, S_COMBO_4]
+    SLOT_SWAP_ENTER, SLOT_SWAP_EXIT, SLOT_DASH, SLOT_COMBO_1 = 0, 1, 2, 3
+    STATES = [S_IDLE, S_WALK, S_JUMP, S_FALL]
+    def __init__(self, master, profile, count):
+        self.master = master; self.profile = profile; self.n = count; self.rng = np.random.default_rng(); n = count
+        self.spawn_x = self.rng.integers(300, 1501, n).astype(float); self.spawn_y = np.full(n, 500.0)
+        self.x = self.spawn_x.copy(); self.y = self.spawn_y.copy(); self.prev_x = self.x.copy(); self.prev_y = self.y.copy()
+        self.vx = np.zeros(n); self.vy = np.zeros(n); self.grounded = np.ones(n, bool); self.facing_right = self.rng.random(n) < 0.5
+        self.frame_idx = np.zeros(n, int); self.anim_timer = np.zeros(n); self.ai_timer = self.rng.integers(30, 91, n); self.decision = np.full(n, self.IDLE)
+        self.act_slot = np.full(n, -1); self.act_step = np.zeros(n, int); self.act_tag = np.full(n, -1); self.act_end = np.full(n, -1)
+        self.swap_timer = np.zeros(n); self.visible = np.ones(n, bool); self.signature = None
+    def compile(self):
+        # NumPy copy of the profile's ActionTable (its entries are the tag rows); a trailing dummy entry makes index -1 safe
+        t = self.profile.table; flat = []; offsets = {}; tag_off = []
+        for d in t.e_durs:
+            if id(d) not in offsets: offsets[id(d)] = len(flat); flat.extend(d)
+            tag_off.append(offsets[id(d)])
+        self.tag_from = np.array(t.e_from + [0]); self.tag_to = np.array(t.e_to + [0]); self.tag_src = np.array(t.e_src + [0]); flags = np.array(t.e_flags + [0])
+        self.tag_loop = (flags & F_LOOP) > 0; self.tag_dash = (flags & F_DASH) > 0; self.tag_swap_exit = (flags & F_SWAP_EXIT) > 0
+        self.tag_off = np.array(tag_off + [0]); self.tag_frames = np.array([len(d) for d in t.e_durs] + [0]); self.durations = np.array(flat + [100], float)
+        self.state_tags = np.array([t.first[s] for s in self.STATES])
+        self.slot_first = np.array([t.slot_first[s] for s in self.SLOTS] + [0]); self.slot_len = np.array([t.slot_len[s] for s in self.SLOTS] + [0])
+        self.act_slot[:] = -1; self.act_tag[:] = -1
+    def clear_action(self, m):
+        self.act_slot[m] = -1; self.act_tag[m] = -1
+    def trigger(self, mask, slot):
+        slot = np.broadcast_to(slot, mask.shape); m = mask & (self.slot_len[slot] > 0)
+        if not m.any(): return
+        self.act_slot[m] = slot[m]; self.act_step[m] = 0; self.act_tag[m] = self.slot_first[slot[m]]
+        self.frame_idx[m] = self.tag_from[self.act_tag[m]]; self.act_end[m] = self.tag_to[self.act_tag[m]]; self.anim_timer[m] = 0
+        d = m & (slot == self.SLOT_DASH); self.vx[d] = np.where(self.facing_right[d], 8, -8)
+    def update(self, ground_y, dt):
+        signature = self.profile.table # Recompiled by AsepritePlayer.sync_tables() whenever the mappings or a source change
+        if signature is not self.signature: self.compile(); self.signature = signature
+        master = self.master; rng = self.rng; n = self.n; d = self.decision
+        in_swap = self.swap_timer > 0; self.swap_timer[in_swap] -= dt; back = in_swap & (self.swap_timer <= 0)
+        if back.any():
+            self.x[back] = self.prev_x[back] = self.spawn_x[back]; self.y[back] = self.prev_y[back] = self.spawn_y[back]; self.visible[back] = True; self.trigger(back, self.SLOT_SWAP_ENTER)
+        live = ~in_swap; self.ai_timer[live] -= 1; dist = master.x - self.x
+        decide = live & (self.ai_timer <= 0)
+        if decide.any():
+            k = int(decide.sum()); near = np.abs(dist[decide]) < 600
+            d[decide] = np.where(near, rng.integers(0, 6, k), np.array([self.IDLE, self.WALK_L, self.WALK_R])[rng.integers(0, 3, k)]); self.ai_timer[decide] = rng.integers(40, 121, k)
+            self.trigger(decide & (d == self.SWAP), self.SLOT_SWAP_EXIT)
+            m = decide & (d == self.ATTACK) & (np.abs(dist) < 200); self.facing_right[m] = dist[m] > 0; self.trigger(m, self.SLOT_COMBO_1 + rng.integers(0, 4, n))
+            m = decide & (d == self.DASH); self.facing_right[m] = dist[m] > 0; self.trigger(m, self.SLOT_DASH)
+            m = decide & (d == self.JUMP) & self.grounded; self.vy[m] = master.jump_power; self.grounded[m] = False
+        self.vx[live] *= 0.85; free = live & (self.act_tag < 0)
+        m = free & (d == self.WALK_R); self.vx[m] = 4; self.facing_right[m] = True
+        m = free & (d == self.WALK_L); self.vx[m] = -4; self.facing_right[m] = False
+        m = free & (d == self.CHASE); self.vx[m] = np.where(dist[m] > 0, 5.5, -5.5); self.facing_right[m] = dist[m] > 0
+        d[free & (np.abs(dist) < 100)] = self.IDLE
+        dashing = live & (self.act_tag >= 0) & self.tag_dash[self.act_tag]; self.vy[dashing] = 0; self.vy[live & ~dashing] += master.gravity
+        self.x[live] += self.vx[live]; self.y[live] += self.vy[live]
+        m = live & (self.y >= ground_y); self.y[m] = ground_y; self.vy[m] = 0; self.grounded[m] = True
+        falling = live & (self.vy >= 0)
+        if falling.any():
+            # Candidate platforms come from the grid cells the falling agents occupy, in level order like the scalar loop
+            grid = master.platform_grid; candidates = grid.platforms
+            if len(candidates) > 32:
+                keys = np.unique(np.stack([self.x[falling].astype(int) // grid.cell, self.y[falling].astype(int) // grid.cell], 1), axis=0)
+                candidates = [grid.platforms[i] for i in grid.indices_at_cells(map(tuple, keys.tolist()))]
+            for plat in candidates:
+                m = falling & (self.x >= plat.left) & (self.x < plat.right) & (self.y >= plat.top) & (self.y < plat.bottom) & (self.y - self.vy <= plat.top + 10)
+                self.y[m] = plat.top; self.vy[m] = 0; self.grounded[m] = True
+        self.clear_action(live & self.grounded & (self.act_tag >= 0) & self.tag_loop[self.act_tag])
+        state = np.where(self.grounded & (np.abs(self.vx) > 0.5), 1, np.where(self.grounded, 0, np.where(self.vy < 0, 2, 3)))
+        active = self.act_tag >= 0; target = np.where(active, self.act_tag, self.state_tags[state]); anim = live & (target >= 0)
+        tr0 = self.tag_from[target]; tr1 = self.tag_to[target]
+        m = anim & ((self.frame_idx < tr0) | (self.frame_idx > tr1)); self.frame_idx[m] = tr0[m]; self.anim_timer[m] = 0
+        if master.is_paused: return
+        self.anim_timer[anim] += dt * master.playback_speed
+        n_frames = self.tag_frames[target]; valid = self.frame_idx < n_frames
+        dur = self.durations[np.where(valid, self.tag_off[target] + np.clip(self.frame_idx, 0, np.maximum(n_frames - 1, 0)), -1)]
+        adv = anim & valid & (self.anim_timer >= dur); self.frame_idx[adv] += 1; self.anim_timer[adv] = 0
+        ended = adv & active & (self.frame_idx > self.act_end); wrap = adv & ~ended & (self.frame_idx > tr1)
+        m = ended & self.tag_swap_exit[target]; self.visible[m] = False; self.swap_timer[m] = 500; self.clear_action(m); ended &= ~m
+        m = ended & self.tag_loop[target]; self.frame_idx[m] = tr0[m]; ended &= ~m
+        nxt = ended & (self.act_step + 1 < self.slot_len[self.act_slot])
+        self.act_step[nxt] += 1; self.act_tag[nxt] = self.slot_first[self.act_slot[nxt]] + self.act_step[nxt]
+        self.frame_idx[nxt] = self.tag_from[self.act_tag[nxt]]; self.act_end[nxt] = self.tag_to[self.act_tag[nxt]]; self.clear_action(ended & ~nxt)
+        self.frame_idx[wrap] = tr0[wrap]
+        m = anim & ~valid; self.frame_idx[m] = tr0[m]
+    def slice_boxes(self, owners, keys, hits, hurts, key_base):
+        # HitEngine boxes for every visible agent, gathered per source from the flattened slice tables
+        if self.signature is None: return
+        sources = self.master.sources; src_ids = np.where(self.act_tag >= 0, self.tag_src[self.act_tag], self.profile.source_idx)
+        for sid in np.unique(src_ids[self.visible]).tolist():
+            if sid >= len(sources) or not sources[sid].slice_table: continue
+            t = sources[sid].slice_arrays(); agents = np.nonzero(self.visible & (src_ids == sid))[0]
+            frames = np.clip(self.frame_idx[agents], 0, len(sources[sid].slice_table) - 1); count = t['count'][frames]; total = int(count.sum())
+            if not total: continue
+            agent = np.repeat(agents, count); rows = np.repeat(t['start'][frames] - np.cumsum(count) + count, count) + np.arange(total)
+            bw = t['w'][rows]; left = np.where(self.facing_right[agent], self.x[agent] + t['x'][rows], self.x[agent] - t['x'][rows] - bw); top = self.y[agent] + t['y'][rows]
+            uniq, inv = np.unique(agent, return_inverse=True); oids = (inv + len(owners)).tolist(); owners.extend((self, i) for i in uniq.tolist()); keys.extend((uniq + key_base).tolist()); names = t['names']
+            for l, tp, r, b, oid, row, is_hit in zip(left.tolist(), top.tolist(), (left + bw).tolist(), (top + t['h'][rows]).tolist(), oids, rows.tolist(), t['hit'][rows].tolist()):
+                (hits if is_hit else hurts).append((l, tp, r, b, oid, names[row]))
+    def draw(self, screen, cam_x, cam_y, cx, cy, play_w, play_h):
+        # Only on-screen agents reach draw_sprite; the margin covers sprites whose origin is just off screen
+        if self.signature is None: return
+        master = self.master; a = master.render_alpha; rx = self.prev_x + (self.x - self.prev_x) * a; ry = self.prev_y + (self.y - self.prev_y) * a
+        zoom = master.render_zoom; margin = 256 * zoom; sx = (rx - cam_x) * zoom; sy = (ry - cam_y) * zoom
+        on = self.visible & (np.abs(sx) < play_w / 2 + margin) & (np.abs(sy) < play_h / 2 + margin)
+        src = np.where(self.act_tag >= 0, self.tag_src[self.act_tag], self.profile.source_idx); idx = np.nonzero(on & (src < len(master.sources)))[0]
+        sources = master.sources; cache = master.sprite_cache; batch = []; outlines = []
+        # One Surface.blits call for the whole crowd; the scaled frames all come out of the shared sprite cache
+        for s, f, right, px, py in zip(src[idx].tolist(), self.frame_idx[idx].tolist(), self.facing_right[idx].tolist(), (cx + sx[idx]).tolist(), (cy + sy[idx]).tolist()):
+            s = sources[s]; scaled, ox, oy, _ = cache.get(s, min(max(0, f), len(s.frames)-1), zoom, right); batch.append((scaled, (int(px + ox), int(py + oy))))
+            if master.show_hitboxes: outlines.append((s, f, px, py, right))
+        screen.blits(batch, doreturn=False)
+        for s, f, px, py, right in outlines: master.draw_slices(screen, s, f, px, py, right)
 
 class AsepritePlayer:
     def __init__(self, initial_path=None):
         self.sources = []; self.profiles = []; self.cur_profile_idx = 0; self.cur_source_idx = 0
-        self.spawn_x, self.spawn_y = 400, 500; self.x, self.y = self.spawn_x, self.spawn_y
+        self.spawn_x, self.spawn_y = 400, 500; self.x, self.y = self.spawn_x, self.spawn_y; self.prev_x, self.prev_y = self.x, self.y
         self.vx = self.vy = 0; self.grounded = False; self.jumps_left = 2; self.facing_right = True; self.zoom = 3.0
         self.dash_speed = 12.0; self.jump_power = -18.0; self.gravity = 1.0; self.atk_forward_v = 15.0; self.powerbomb_speed = 35.0; self.cam_v_offset = -120
-        self.pbomb_pause_timer = 0; self.loop_counter = 0; self.cam_x, self.cam_y = 400, 300; self.cam_follow = True
-        self.platforms = [pygame.Rect(200, 350, 200, 20), pygame.Rect(500, 200, 200, 20), pygame.Rect(-200, 250, 300, 20), pygame.Rect(900, 300, 400, 20)]
-        self.bg_img = None; self.bg_path = None; self.bg_off_x = self.bg_off_y = 0; self.bg_zoom = 1.0; self.bg_alpha = 255; self.bg_parallax = 0.1; self.bg_color = [15, 15, 18]; self.grid_color = [40, 40, 50]
-        self.frame_idx = 0; self.anim_timer = 0; self.combo_step = 0; self.combo_reset_timer = 0; self.attack_buffer = 0; self.active_action_slot = None; self.active_tag_info = None; self.action_queue = []; self.action_end_frame = -1
-        self.dash_charges = 2; self.dash_cooldowns = [0, 0]; self.dash_timer = 0; self.attack_move_timer = 0; self.ai_list = []; self.swap_timer = 0; self.visible = True
+        self.pbomb_pause_timer = 0; self.loop_counter = 0; self.cam_x, self.cam_y = 400, 300; self.prev_cam_x, self.prev_cam_y = self.cam_x, self.cam_y; self.cam_follow = True
+        self.sim_accum = 0.0; self.render_alpha = 1.0; self.time_scale = 1.0; self.max_fps = 120
+        self.level_path = None; self.set_platforms([pygame.Rect(*p) for p in DEFAULT_PLATFORMS])
+        self.background = ParallaxBackground(); self.bg_color = [15, 15, 18]; self.grid_color = [40, 40, 50]
+        self.frame_idx = 0; self.anim_timer = 0; self.combo_step = 0; self.combo_reset_timer = 0; self.attack_buffer = 0; self.action_slot = -1; self.action_step = 0
+        self.dash_charges = 2; self.dash_cooldowns = [0, 0]; self.dash_timer = 0; self.attack_move_timer = 0; self.ai_list = []; self.crowds = []; self.swap_timer = 0; self.visible = True
         self.playback_speed = 1.0; self.is_paused = False; self.step_forward = False; self.show_hitboxes = True
-        self.target_w, self.target_h = 640, 360; self.show_viewport = True
-        self.shake_timer = 0; self.shake_intensity = 0; self.shake_enabled = True; self.base_shake = 1.0; self.afterimages = []; self.vfx_enabled = True; self.ghost_timer = 0
+        self.target_w, self.target_h = 640, 360; self.show_viewport = True; self.viewport_overlay = None; self.native_render = False; self.native_surf = self.native_scaled = None; self.render_zoom = self.view_scale = self.zoom; self.sprite_cache = SpriteCache(); self.atlas = TextureAtlas(); self.cache_mb = 512; self.decode_cache = ase_cache.DecodeCache(CACHE_DIR, self.cache_mb << 20); self.reloader = SourceReloader(); self.hits = HitEngine(self)
+        self.shake_timer = 0; self.shake_intensity = 0; self.shake_enabled = True; self.base_shake = 1.0; self.vfx = VfxPool(self); self.vfx_enabled = True; self.ghost_timer = 0
+        self.history_mb = 4; self.history_enabled = False; self.history = StateHistory(self, self.history_mb << 20)
+        self.lod_enabled = True; self.lod_near = 256; self.lod_far = 1024; self.lod_slices = 8; self.lod_tick = 0; self.lod_counts = [0, 0, 0]; self.view_half = (self.target_w / 2, self.target_h / 2)
         self.load_settings()
         if initial_path: self.add_source(initial_path); self.add_profile("PLAYER", 0)
 
     def save_settings(self):
-        data = {"physics": {"dash_speed": self.dash_speed, "jump_power": self.jump_power, "powerbomb_speed": self.powerbomb_speed, "cam_v_offset": self.cam_v_offset}, "combat": {"atk_forward_v": self.atk_forward_v}, "vfx": {"shake_enabled": self.shake_enabled, "vfx_enabled": self.vfx_enabled, "base_shake": self.base_shake}, "viewport": {"show_viewport": self.show_viewport, "target_w": self.target_w, "target_h": self.target_h}, "bg": {"bg_color": self.bg_color, "bg_alpha": self.bg_alpha, "bg_zoom": self.bg_zoom, "bg_parallax": self.bg_parallax, "bg_off_x": self.bg_off_x, "bg_off_y": self.bg_off_y, "bg_path": self.bg_path}}
+        data = {"physics": {"dash_speed": self.dash_speed, "jump_power": self.jump_power, "powerbomb_speed": self.powerbomb_speed, "cam_v_offset": self.cam_v_offset}, "combat": {"atk_forward_v": self.atk_forward_v}, "vfx": {"shake_enabled": self.shake_enabled, "vfx_enabled": self.vfx_enabled, "base_shake": self.base_shake}, "viewport": {"show_viewport": self.show_viewport, "native_render": self.native_render, "target_w": self.target_w, "target_h": self.target_h, "max_fps": self.max_fps}, "bg": dict({"bg_color": self.bg_color}, **self.background.to_settings()), "level": {"level_path": self.level_path}, "cache": {"cache_mb": self.cache_mb}, "history": {"history_mb": self.history_mb, "history_enabled": self.history_enabled}, "lod": {"lod_enabled": self.lod_enabled, "lod_near": self.lod_near, "lod_far": self.lod_far, "lod_slices": self.lod_slices}}
         try:
             with open("ase_settings.json", "w") as f: json.dump(data, f, indent=4)
         except: pass
@@ -240,10 +1262,20 @@ class AsepritePlayer:
                     if isinstance(cat, dict):
                         for k, v in cat.items():
                             if hasattr(self, k): setattr(self, k, v)
-                if self.bg_path and os.path.exists(self.bg_path): self.bg_img = pygame.image.load(self.bg_path).convert_alpha()
+                self.background.load_settings(data.get("bg", {})); self.decode_cache.max_bytes = int(self.cache_mb) << 20; self.history.max_bytes = int(self.history_mb) << 20
+                if self.level_path and os.path.exists(self.level_path): self.load_level(self.level_path)
             except: pass
+    def set_platforms(self, platforms):
+        self.platforms = platforms; self.platform_grid = PlatformGrid(platforms)
+    def load_level(self, path):
+        try:
+            t0 = time.perf_counter(); self.set_platforms(load_level(path)); self.level_path = path
+            log_debug(f"[LEVEL] {os.path.basename(path)}: {len(self.platforms)} platforms in {(time.perf_counter()-t0)*1000:.0f}ms")
+        except Exception as e: log_debug(f"[ERROR] Level load failed for {path}: {e}")
+    def reset_level(self):
+        self.level_path = None; self.set_platforms([pygame.Rect(*p) for p in DEFAULT_PLATFORMS])
     def save_project(self):
-        project = {"sources": [s.file_path for s in self.sources], "profiles": [{"name": p.name, "source_idx": p.source_idx, "mappings": p.mappings} for p in self.profiles], "ai_count": len(self.ai_list)}
+        project = {"sources": [s.file_path for s in self.sources], "profiles": [{"name": p.name, "source_idx": p.source_idx, "mappings": p.mappings, "auto_map": p.auto_map} for p in self.profiles], "ai_count": len(self.ai_list), "crowds": [{"profile_idx": self.profiles.index(c.profile), "count": c.n} for c in self.crowds if c.profile in self.profiles]}
         try:
             with open("ase_project.json", "w") as f: json.dump(project, f, indent=4)
         except: pass
@@ -253,89 +1285,134 @@ class AsepritePlayer:
                 with open("ase_project.json", "r") as f:
                     p = json.load(f); [self.add_source(src_p) for src_p in p.get("sources", []) if os.path.exists(src_p)]
                     for prof_data in p.get("profiles", []):
-                        new_prof = AseProfile(prof_data["name"], prof_data["source_idx"]); new_prof.mappings = prof_data["mappings"]; self.profiles.append(new_prof)
+                        new_prof = AseProfile(prof_data["name"], prof_data["source_idx"]); new_prof.mappings = prof_data["mappings"]; new_prof.auto_map = prof_data.get("auto_map", {}); self.profiles.append(new_prof)
                     if not self.profiles and self.sources: self.add_profile("PLAYER", 0)
                     for i in range(p.get("ai_count", 0)):
                         if i+1 < len(self.profiles): self.ai_list.append(AseAI(self, self.profiles[i+1]))
+                    for c in p.get("crowds", []):
+                        if c["profile_idx"] < len(self.profiles): self.add_crowd(self.profiles[c["profile_idx"]], c["count"])
             except: pass
     def add_source(self, path):
         try:
-            new_source = AseSource(path, len(self.sources)); self.sources.append(new_source); self.cur_source_idx = new_source.id
+            new_source = AseSource(path, len(self.sources), atlas=self.atlas, cache=self.decode_cache, defer=True); self.sources.append(new_source); self.cur_source_idx = new_source.id; self.reloader.load(new_source)
             return new_source.id
         except: return 0
     def add_profile(self, name, source_idx, is_npc=False):
         new_profile = AseProfile(name, source_idx); self.profiles.append(new_profile); self.auto_map_profile(new_profile)
         if is_npc: self.ai_list.append(AseAI(self, new_profile))
+    def add_crowd(self, profile, count):
+        if np is None: log_debug("[CROWD] NumPy is not installed; crowd mode unavailable"); return None
+        crowd = AseCrowd(self, profile, count); self.crowds.append(crowd); log_debug(f"[CROWD] +{count} x {profile.name} ({sum(c.n for c in self.crowds)} total)")
+        return crowd
     def auto_map_profile(self, profile):
-        if profile.source_idx >= len(self.sources): return
-        source = self.sources[profile.source_idx]; suffix = re.compile(r"(_|\s)?\(?(ready|loop|end)\)?", re.IGNORECASE)
-        for slot in profile.mappings.keys():
-            base_slot = slot.lower().replace("ComboAttack_", "attack").replace(" ", "").replace("_", "")
-            matches = []
-            for t in source.tag_list:
-                clean_t = suffix.sub("", t).lower().replace(" ", "").replace("_", "")
-                if clean_t == base_slot or (base_slot == "walk" and clean_t == "move"): matches.append([profile.source_idx, t])
-            def sort_key(item): tl = item[1].lower(); return 0 if "ready" in tl else (2 if "end" in tl else 1)
-            profile.mappings[slot] = sorted(matches, key=sort_key)
+        # Incremental: only slots whose candidate tags changed since the last auto-map are touched. A slot still holding exactly the last
+        # auto result takes the new candidates; an edited slot keeps the user's entries, loses auto tags that vanished and gains new ones
+        if profile.source_idx >= len(self.sources): return 0
+        source = self.sources[profile.source_idx]; fresh = not any(profile.mappings.values()); changed = 0
+        for slot, cur in profile.mappings.items():
+            new = [[source.id, t] for t in source.candidates(slot)]; old = profile.auto_map.get(slot)
+            if old is None and not fresh: profile.auto_map[slot] = new; continue # Mappings from a project saved without auto_map are kept as the baseline
+            if new == old: continue
+            if old is None or cur == old: profile.mappings[slot] = [list(e) for e in new]
+            else: profile.mappings[slot] = [e for e in cur if e not in old or e in new] + [list(e) for e in new if e not in old and e not in cur]
+            profile.auto_map[slot] = new; changed += 1
+        if changed: profile.rev += 1
+        return changed
     def handle_attack(self, keys):
         if self.swap_timer > 0: return
         if not self.grounded:
-            if keys[pygame.K_DOWN]: self.trigger_action("POWERBOMB", keys)
-            else: self.trigger_action("JUMPATTACK", keys)
+            if keys[pygame.K_DOWN]: self.trigger_action(S_POWERBOMB, keys)
+            else: self.trigger_action(S_JUMPATTACK, keys)
         elif self.profiles:
-            if self.active_action_slot and "ComboAttack" in str(self.active_action_slot):
+            if self.action_slot >= 0 and SLOT_FLAGS[self.action_slot] & F_COMBO:
                 if self.attack_buffer < 2: self.attack_buffer += 1
             else:
-                slot = f"ComboAttack_{self.combo_step+1}"
-                if self.profiles[0].mappings.get(slot): self.trigger_action(slot, keys)
+                slot = S_COMBO_1 + self.combo_step
+                if self.profiles[0].table.slot_mapped[slot]: self.trigger_action(slot, keys)
     def trigger_action(self, slot, keys=None):
+        # slot: an S_* index into SLOT_NAMES
         if self.swap_timer > 0 or not self.profiles: return
-        if self.active_action_slot and "ComboAttack" in str(self.active_action_slot) and slot != "DASH": return
-        profile = self.profiles[0]; tags = profile.mappings.get(slot, [])
-        if not tags and slot != "DASH": return
-        if slot == "DASH" and self.dash_charges > 0:
-            self.dash_charges -= 1; self.dash_timer = 12; self.vx = self.dash_speed if self.facing_right else -self.dash_speed; self.vy = 0; self.active_action_slot = "DASH"; self.action_queue = list(tags); self.play_next_in_queue()
+        if self.action_slot >= 0 and SLOT_FLAGS[self.action_slot] & F_COMBO and slot != S_DASH: return
+        mapped = self.profiles[0].table.slot_mapped[slot]
+        if not mapped and slot != S_DASH: return
+        if slot == S_DASH and self.dash_charges > 0:
+            if self.vfx_enabled and self.grounded: self.vfx.dust(self.x, self.y, 6)
+            self.dash_charges -= 1; self.dash_timer = 12; self.vx = self.dash_speed if self.facing_right else -self.dash_speed; self.vy = 0; self.action_slot = S_DASH; self.action_step = -1; self.play_next_in_queue()
             for i in range(2): 
                 if self.dash_cooldowns[i] <= 0: self.dash_cooldowns[i] = 90; break
             return
-        if tags:
-            self.active_action_slot = slot; self.action_queue = list(tags); self.loop_counter = 0; self.anim_timer = 0
-            if "ComboAttack" in slot:
+        if mapped:
+            self.action_slot = slot; self.action_step = -1; self.loop_counter = 0; self.anim_timer = 0
+            if SLOT_FLAGS[slot] & F_COMBO:
                 self.combo_step = (self.combo_step + 1) % 4; self.combo_reset_timer = 80; curr_keys = keys if keys is not None else pygame.key.get_pressed()
                 if curr_keys[pygame.K_RIGHT] or curr_keys[pygame.K_LEFT]: self.attack_move_timer = 15; self.facing_right = curr_keys[pygame.K_RIGHT]; mv = self.atk_forward_v * 0.4; self.vx = mv if self.facing_right else -mv
                 else: self.attack_move_timer = 0; self.vx = 0
                 if self.combo_step == 0 and self.shake_enabled: self.shake_timer = 10; self.shake_intensity = 8
-            elif slot == "POWERBOMB": self.pbomb_pause_timer = 250; self.vy = 0; self.vx = 0
+            elif slot == S_POWERBOMB: self.pbomb_pause_timer = 250; self.vy = 0; self.vx = 0
             self.play_next_in_queue()
     def play_next_in_queue(self):
-        if self.action_queue:
-            self.active_tag_info = self.action_queue.pop(0); src = self.sources[self.active_tag_info[0]]
-            if self.active_tag_info[1] in src.tags: self.frame_idx, self.action_end_frame = src.tags[self.active_tag_info[1]]; self.loop_counter = 0; self.anim_timer = 0
-            else: self.play_next_in_queue()
+        # Next tag of the playing slot's chain; past the end a buffered attack chains into the next combo step, else the action ends
+        t = self.profiles[0].table; e = t.entry(self.action_slot, self.action_step + 1)
+        if e >= 0: self.action_step += 1; self.frame_idx = t.e_from[e]; self.loop_counter = 0; self.anim_timer = 0
         else:
             if self.attack_buffer > 0:
-                self.attack_buffer -= 1; slot = f"ComboAttack_{self.combo_step+1}"
-                if self.profiles[0].mappings.get(slot): self.active_action_slot = None; self.trigger_action(slot); return
-            self.active_tag_info = None; self.active_action_slot = None; self.attack_buffer = 0; self.combo_step = 0; self.combo_reset_timer = 0
+                self.attack_buffer -= 1; slot = S_COMBO_1 + self.combo_step
+                if t.slot_mapped[slot]: self.action_slot = -1; self.trigger_action(slot); return
+            self.action_slot = -1; self.attack_buffer = 0; self.combo_step = 0; self.combo_reset_timer = 0
+    def advance(self, keys, ground_y, frame_dt):
+        # Runs whole SIM_DT steps out of the accumulated frame time; a long stall is capped at MAX_CATCHUP_STEPS and the rest dropped
+        profiler.begin("reload.poll")
+        for src, _ in self.reloader.poll():
+            # Only profiles built on this source are remapped, and only their slots whose candidates changed (manual edits stay)
+            t0 = time.perf_counter(); n = sum(self.auto_map_profile(p) for p in self.profiles if p.source_idx == src.id)
+            if n: log_debug(f"[MAP] {src.name}: {n} slots remapped in {(time.perf_counter()-t0)*1000:.2f}ms")
+        profiler.end()
+        self.sync_tables()
+        if self.history.cursor is not None: self.render_alpha = 1.0; return 0 # Scrubbing: the restored tick stays on screen until resume
+        self.sim_accum += frame_dt * self.time_scale; steps = 0
+        while self.sim_accum >= SIM_DT and steps < MAX_CATCHUP_STEPS:
+            self.prev_x, self.prev_y, self.prev_cam_x, self.prev_cam_y = self.x, self.y, self.cam_x, self.cam_y
+            for ai in self.ai_list: ai.prev_x, ai.prev_y = ai.x, ai.y
+            for crowd in self.crowds: crowd.prev_x[:] = crowd.x; crowd.prev_y[:] = crowd.y
+            profiler.begin("update"); self.update(keys, ground_y, SIM_DT); profiler.end(); profiler.begin("update.hits"); self.hits.collect(); profiler.end(); self.sim_accum -= SIM_DT; steps += 1
+            if self.vfx_enabled:
+                for ev in self.hits.new_events: l, t, w, h = ev['rect']; self.vfx.sparks(l + w / 2, t + h / 2)
+            if self.history_enabled: profiler.begin("update.history"); self.history.record(); profiler.end()
+        if not self.history_enabled and self.history.groups: self.history.clear() # Turned off: free the recording
+        if self.sim_accum >= SIM_DT: self.sim_accum %= SIM_DT
+        self.render_alpha = self.sim_accum / SIM_DT
+        return steps
+    def sync_tables(self):
+        # Recompiles the action tables of profiles whose mappings (rev) or sources (version) changed; once per frame, before any step
+        versions = tuple(s.version for s in self.sources)
+        for p in self.profiles: p.compile(self.sources, versions)
+    def current_source(self):
+        # Source the player's sprite comes from: the playing action, else the first tag mapped to the movement state
+        if not self.profiles: return 0
+        t = self.profiles[0].table; e = t.entry(self.action_slot, self.action_step)
+        if e < 0: e = t.first[self.move_state()]
+        return t.e_src[e] if e >= 0 else 0
+    def move_state(self): return S_WALK if self.grounded and abs(self.vx) > 0.5 else (S_IDLE if self.grounded else (S_JUMP if self.vy < 0 else S_FALL))
+    def render_pos(self, ent):
+        # Position between the last two sim steps for the current render frame
+        return ent.prev_x + (ent.x - ent.prev_x) * self.render_alpha, ent.prev_y + (ent.y - ent.prev_y) * self.render_alpha
     def update(self, keys, ground_y, dt):
-        if self.shake_timer > 0: self.shake_timer -= dt / 16.6
+        if self.shake_timer > 0: self.shake_timer -= dt / SIM_DT
+        was_grounded = self.grounded
         if self.vfx_enabled:
-            for ai in self.afterimages[:]:
-                ai['alpha'] -= 15 * (dt/16.6)
-                if ai['alpha'] <= 0: self.afterimages.remove(ai)
+            profiler.begin("update.vfx"); self.vfx.update(dt); profiler.end()
             if self.dash_timer > 0:
                 self.ghost_timer += dt
-                if self.ghost_timer >= 30: self.ghost_timer = 0; s_idx = self.active_tag_info[0] if self.active_tag_info else 0; self.afterimages.append({'x': self.x, 'y': self.y, 's': s_idx, 'f': self.frame_idx, 'right': self.facing_right, 'alpha': 180})
-        if pygame.time.get_ticks() % 60 == 0:
-            for src in self.sources:
-                if src.check_for_reload(): [self.auto_map_profile(p) for p in self.profiles]
+                if self.ghost_timer >= 30:
+                    e = self.profiles[0].table.entry(self.action_slot, self.action_step) if self.profiles else -1
+                    self.ghost_timer = 0; self.vfx.ghost(self.x, self.y, self.profiles[0].table.e_src[e] if e >= 0 else 0, self.frame_idx, self.facing_right)
         if self.swap_timer > 0:
             self.swap_timer -= dt
-            if self.swap_timer <= 0: self.x, self.y = self.spawn_x, self.spawn_y; self.visible = True; self.trigger_action("Swap_Enter")
+            if self.swap_timer <= 0: self.x, self.y = self.prev_x, self.prev_y = self.spawn_x, self.spawn_y; self.visible = True; self.trigger_action(S_SWAP_ENTER)
             return
         for i in range(2):
             if self.dash_cooldowns[i] > 0:
-                self.dash_cooldowns[i] -= dt/16.6
+                self.dash_cooldowns[i] -= dt/SIM_DT
                 if self.dash_cooldowns[i] <= 0: self.dash_charges = min(2, self.dash_charges + 1)
         if self.pbomb_pause_timer > 0:
             self.pbomb_pause_timer -= dt; self.vy = 0
@@ -343,256 +1420,477 @@ class AsepritePlayer:
         elif self.dash_timer > 0: self.dash_timer -= 1; self.vy = 0
         elif self.attack_move_timer > 0: self.attack_move_timer -= 1; self.vy += self.gravity * 0.5
         else:
-            self.vx *= 0.82; can_move = not self.active_tag_info or self.active_action_slot == "JUMPATTACK"
+            self.vx *= 0.82; can_move = self.action_slot < 0 or self.action_slot == S_JUMPATTACK
             if can_move:
                 if keys[pygame.K_RIGHT]: self.vx = 6.5; self.facing_right = True
                 elif keys[pygame.K_LEFT]: self.vx = -6.5; self.facing_right = False
             self.vy += self.gravity
-        self.x += self.vx * (dt/16.6); self.y += self.vy * (dt/16.6); self.grounded = False
+        self.x += self.vx * (dt/SIM_DT); self.y += self.vy * (dt/SIM_DT); self.grounded = False
         if self.y >= ground_y: 
-            if self.active_action_slot == "POWERBOMB" and self.vy > 0 and self.shake_enabled: self.shake_timer = 15; self.shake_intensity = 15
+            if self.action_slot == S_POWERBOMB and self.vy > 0 and self.shake_enabled: self.shake_timer = 15; self.shake_intensity = 15
             self.y = ground_y; self.vy = 0; self.grounded = True; self.jumps_left = 2
         if self.vy >= 0:
-            for plat in self.platforms:
+            for plat in self.platform_grid.at_point(self.x, self.y):
                 if plat.collidepoint(self.x, self.y) and self.y - self.vy <= plat.top + 10: self.y = plat.top; self.vy = 0; self.grounded = True; self.jumps_left = 2
-        if self.grounded and (self.active_action_slot == "JUMPATTACK" or self.active_action_slot == "POWERBOMB"):
-            if self.active_tag_info: self.play_next_in_queue()
+        if self.grounded and not was_grounded and self.vfx_enabled: self.vfx.dust(self.x, self.y)
+        if self.grounded and (self.action_slot == S_JUMPATTACK or self.action_slot == S_POWERBOMB): self.play_next_in_queue()
         if self.cam_follow: self.cam_x += (self.x - self.cam_x) * 0.12; self.cam_y += (self.y + self.cam_v_offset - self.cam_y) * (0.3 if self.grounded else 0.12)
-        if self.combo_reset_timer > 0 and not self.active_tag_info:
+        if self.combo_reset_timer > 0 and self.action_slot < 0:
             self.combo_reset_timer -= 1
             if self.combo_reset_timer <= 0: self.combo_step = 0
-        if self.visible:
-            if not self.active_tag_info:
-                state = "WALK" if self.grounded and abs(self.vx) > 0.5 else ("IDLE" if self.grounded else ("JUMP" if self.vy < 0 else "FALL"))
-                m = self.profiles[0].mappings.get(state, []) if self.profiles else []; target_info = m[0] if m else None
-            else: target_info = self.active_tag_info
-            if target_info:
-                src = self.sources[target_info[0]]; tr = src.tags.get(target_info[1], (0,0))
-                if self.frame_idx < tr[0] or self.frame_idx > tr[1]: self.frame_idx = tr[0]; self.anim_timer = 0
+        if self.visible and self.profiles:
+            t = self.profiles[0].table; e = t.entry(self.action_slot, self.action_step) if self.action_slot >= 0 else -1
+            if e < 0: self.action_slot = -1 # Also ends an action whose chain was remapped away
+            acting = e >= 0
+            if not acting: e = t.first[self.move_state()]
+            if e >= 0:
+                lo, hi = t.e_from[e], t.e_to[e]; durs = t.e_durs[e]
+                if self.frame_idx < lo or self.frame_idx > hi: self.frame_idx = lo; self.anim_timer = 0
                 if not self.is_paused or self.step_forward:
                     self.anim_timer += dt * self.playback_speed
-                    if self.step_forward: self.anim_timer = src.frames[self.frame_idx]['duration']; self.step_forward = False
-                if self.frame_idx < len(src.frames):
-                    dur = src.frames[self.frame_idx]['duration']
-                    if self.anim_timer >= dur:
+                    if self.step_forward: self.anim_timer = durs[self.frame_idx]; self.step_forward = False
+                if self.frame_idx < len(durs):
+                    if self.anim_timer >= durs[self.frame_idx]:
                         self.frame_idx += 1; self.anim_timer = 0
-                        if self.active_tag_info and self.frame_idx > self.action_end_frame:
-                            if target_info[1] == "Swap_Exit": self.visible = False; self.swap_timer = 500; self.active_tag_info = None; return
-                            is_skill = "SKILL" in str(self.active_action_slot); is_loop = "(loop)" in target_info[1].lower()
-                            if is_loop and is_skill and self.loop_counter < 1: self.frame_idx = tr[0]; self.loop_counter += 1
-                            elif is_loop and not is_skill: self.frame_idx = tr[0]
+                        if acting and self.frame_idx > hi:
+                            flags = t.e_flags[e]
+                            if flags & F_SWAP_EXIT: self.visible = False; self.swap_timer = 500; self.action_slot = -1; return
+                            if flags & F_LOOP and flags & F_SKILL and self.loop_counter < 1: self.frame_idx = lo; self.loop_counter += 1
+                            elif flags & F_LOOP and not flags & F_SKILL: self.frame_idx = lo
                             else: self.play_next_in_queue()
-                        elif self.frame_idx > tr[1]: self.frame_idx = tr[0]
-                else: self.frame_idx = tr[0]
-        for ai in self.ai_list: ai.update(ground_y, dt)
+                        elif self.frame_idx > hi: self.frame_idx = lo
+                else: self.frame_idx = lo
+        profiler.begin("update.ai"); self.update_ai(ground_y, dt); profiler.end(); profiler.begin("update.crowd")
+        for crowd in self.crowds: crowd.update(ground_y, dt)
+        profiler.end()
+    def update_ai(self, ground_y, dt):
+        # NPC LOD: tiered by world px past the edge of the last drawn view (view_half around the camera). NEAR and MID run every step (MID is
+        # never drawn, but NPCs come on screen already at full rate); FAR ones are time-sliced: one coarse update (and one tier check) every
+        # lod_slices steps, covering the steps skipped since. First slices are staggered so decisions spread over frames. Each tier is a profiler scope (update.ai.*)
+        self.lod_tick += 1; tick = self.lod_tick; tiers = ([], [], []); slices = max(1, int(self.lod_slices)); n_far = 0
+        if self.lod_enabled:
+            hw, hh = self.view_half; near, far = self.lod_near, self.lod_far; cam_x, cam_y = self.cam_x, self.cam_y
+            for i, ai in enumerate(self.ai_list):
+                if ai.lod_tier == AI_FAR and tick < ai.lod_due: n_far += 1; continue
+                d = max(abs(ai.x - cam_x) - hw, abs(ai.y - cam_y) - hh); tier = AI_NEAR if d <= near else (AI_MID if d <= far else AI_FAR)
+                if tier == AI_FAR:
+                    n_far += 1
+                    if ai.lod_tier != AI_FAR: ai.lod_tier = AI_FAR; ai.lod_due = tick + 1 + i % slices; continue
+                    ai.lod_due = tick + slices
+                ai.lod_tier = tier; tiers[tier].append(ai)
+        else:
+            for ai in self.ai_list: ai.lod_tier = AI_NEAR; tiers[AI_NEAR].append(ai)
+        for tier, group in enumerate(tiers):
+            self.lod_counts[tier] = n_far if tier == AI_FAR else len(group)
+            if not group: continue
+            profiler.begin("update.ai." + LOD_NAMES[tier])
+            for ai in group:
+                steps = max(1, tick - ai.lod_last); ai.lod_last = tick # An NPC leaving FAR first catches up on the steps it skipped
+                landed = not ai.grounded; ai.update(ground_y, dt, steps)
+                if landed and ai.grounded and ai.visible and self.vfx_enabled and tier != AI_FAR: self.vfx.dust(ai.x, ai.y)
+            profiler.end()
+    def lod_stats(self):
+        # Per tier: NPC count this step and mean ms per frame over the last 60 frames (profiler history)
+        parts = []
+        for t, name in enumerate(LOD_NAMES):
+            recent = list(itertools.islice(reversed(profiler.history.get("update.ai." + name, ())), 60)); parts.append(f"{name} {self.lod_counts[t]} ({sum(recent) / max(1, len(recent)):.3f}ms)")
+        return "LOD " + " / ".join(parts) + ("" if self.lod_enabled else " [off]")
     def draw_sprite(self, screen, x, y, source_idx, f_idx, facing_right, cam_x, cam_y, cx, cy):
         if source_idx >= len(self.sources): return
-        src = self.sources[source_idx]; f = src.frames[min(max(0, f_idx), len(src.frames)-1)]
-        scaled = pygame.transform.scale(f['img'], (int(f['img'].get_width()*self.zoom), int(f['img'].get_height()*self.zoom)))
-        ox, oy = f['ox']*self.zoom, f['oy']*self.zoom
-        if not facing_right: scaled = pygame.transform.flip(scaled, True, False); ox = -ox - scaled.get_width()
-        screen.blit(scaled, (int(cx + (x - cam_x)*self.zoom + ox), int(cy + (y - cam_y)*self.zoom + oy)))
-        if self.show_hitboxes:
-            for name, keys in src.slices.items():
-                active_key = None
-                for key in keys:
-                    if key['frame'] <= f_idx:
-                        if active_key is None or key['frame'] > active_key['frame']: active_key = key
-                if active_key:
-                    b = active_key['bounds']; sx = cx + (x - cam_x) * self.zoom; sy = cy + (y - cam_y) * self.zoom
-                    final_x = sx + (b['x'] - src.orig_w // 2) * self.zoom; final_y = sy + (b['y'] - src.orig_h // 2) * self.zoom
-                    final_w = b['w'] * self.zoom; final_h = b['h'] * self.zoom
-                    if not facing_right: final_x = sx - (b['x'] - src.orig_w // 2 + b['w']) * self.zoom
-                    col = (220, 38, 38) if "hit" in name.lower() else (22, 163, 74)
-                    pygame.draw.rect(screen, col, (final_x, final_y, final_w, final_h), 2)
-                    if self.zoom > 1.5: txt = pygame.font.SysFont("Arial", 10).render(name, True, col); screen.blit(txt, (final_x, final_y - 12))
+        z = self.render_zoom; src = self.sources[source_idx]; scaled, ox, oy, _ = self.sprite_cache.get(src, min(max(0, f_idx), len(src.frames)-1), z, facing_right)
+        screen.blit(scaled, (int(cx + (x - cam_x)*z + ox), int(cy + (y - cam_y)*z + oy)))
+        if self.show_hitboxes: self.draw_slices(screen, src, f_idx, cx + (x - cam_x) * z, cy + (y - cam_y) * z, facing_right)
+    def draw_slices(self, screen, src, f_idx, sx, sy, facing_right):
+        if src.slice_table and f_idx >= 0:
+            z = self.render_zoom
+            for name, bx, by, bw, bh, is_hit in src.slice_table[min(f_idx, len(src.slice_table)-1)]:
+                final_x = sx + bx * z if facing_right else sx - (bx + bw) * z; final_y = sy + by * z
+                final_w = bw * z; final_h = bh * z; col = (220, 38, 38) if is_hit else (22, 163, 74)
+                pygame.draw.rect(screen, col, (final_x, final_y, final_w, final_h), 2)
+                if z > 1.5: screen.blit(text_cache.render(text_cache.font(10), name, col), (final_x, final_y - 12))
     def draw(self, screen, play_w, play_h):
         cx, cy = play_w // 2, play_h // 2
         off_x = random.uniform(-self.shake_intensity*self.base_shake, self.shake_intensity*self.base_shake) if self.shake_timer > 0 else 0
         off_y = random.uniform(-self.shake_intensity*self.base_shake, self.shake_intensity*self.base_shake) if self.shake_timer > 0 else 0
-        cam_x, cam_y = self.cam_x + off_x, self.cam_y + off_y; gx, gy = cx - (cam_x % 100)*self.zoom, cy - (cam_y % 100)*self.zoom
+        # Manual (right-drag) camera moves between steps, so only the followed camera is interpolated
+        base_cam_x, base_cam_y = (self.prev_cam_x + (self.cam_x - self.prev_cam_x) * self.render_alpha, self.prev_cam_y + (self.cam_y - self.prev_cam_y) * self.render_alpha) if self.cam_follow else (self.cam_x, self.cam_y)
+        cam_x, cam_y = base_cam_x + off_x, base_cam_y + off_y
+        if self.native_render: self.draw_native(screen, play_w, play_h, cam_x, cam_y); return
+        self.render_zoom = self.view_scale = self.zoom; self.view_half = (play_w / 2 / self.zoom, play_h / 2 / self.zoom); self.draw_world(screen, play_w, play_h, cam_x, cam_y); self.draw_arrows(screen, play_w, play_h, cam_x, cam_y, self.zoom)
+        if self.show_viewport:
+            profiler.begin("draw.overlay"); vw, vh = self.target_w * self.zoom, self.target_h * self.zoom; vr = pygame.Rect(cx - vw//2, cy - vh//2, vw, vh); key = (play_w, play_h, tuple(vr))
+            if self.viewport_overlay is None or self.viewport_overlay[0] != key:
+                overlay = pygame.Surface((play_w, play_h), pygame.SRCALPHA); overlay.fill((0, 0, 0, 160)); pygame.draw.rect(overlay, (0, 0, 0, 0), vr); self.viewport_overlay = (key, overlay)
+            screen.blit(self.viewport_overlay[1], (0, 0)); pygame.draw.rect(screen, (255, 255, 255), vr, 1)
+            screen.blit(text_cache.render(text_cache.font(12), f"Viewport: {self.target_w}x{self.target_h} (16:9)", (255,255,255)), (vr.x, vr.y - 18)); profiler.end()
+    def draw_native(self, screen, play_w, play_h, cam_x, cam_y):
+        # The world is drawn once at 1:1 into a target_w x target_h surface (sprites come straight out of the cache unscaled), then only the
+        # part of it inside the play area gets one nearest-neighbour scale: the cost no longer grows with zoom or the number of sprites
+        tw, th = max(1, int(self.target_w)), max(1, int(self.target_h)); scale = max(1, round(self.zoom)) if self.zoom >= 1 else self.zoom
+        if self.native_surf is None or self.native_surf.get_size() != (tw, th): self.native_surf = pygame.Surface((tw, th)).convert()
+        surf = self.native_surf; surf.fill(self.bg_color); self.render_zoom = 1; self.view_scale = scale; self.view_half = (min(tw, play_w / scale) / 2, min(th, play_h / scale) / 2)
+        self.draw_world(surf, tw, th, cam_x, cam_y)
+        profiler.begin("draw.upscale"); dw, dh = int(tw * scale), int(th * scale); dx, dy = play_w // 2 - dw // 2, play_h // 2 - dh // 2
+        vis = pygame.Rect(dx, dy, dw, dh).clip(pygame.Rect(0, 0, play_w, play_h))
+        if vis.w > 0 and vis.h > 0:
+            if scale >= 1:
+                sx0, sy0 = (vis.x - dx) // scale, (vis.y - dy) // scale; sx1, sy1 = min(tw, -(-(vis.right - dx) // scale)), min(th, -(-(vis.bottom - dy) // scale))
+                sub = surf.subsurface((sx0, sy0, sx1 - sx0, sy1 - sy0)); size = (sub.get_width() * scale, sub.get_height() * scale); pos = (dx + sx0 * scale, dy + sy0 * scale)
+            else: sub = surf; size = (max(1, dw), max(1, dh)); pos = (dx, dy)
+            if self.native_scaled is None or self.native_scaled.get_size() != size: self.native_scaled = pygame.Surface(size).convert()
+            pygame.transform.scale(sub, size, self.native_scaled); screen.blit(self.native_scaled, pos)
+        profiler.end(); self.draw_arrows(screen, play_w, play_h, cam_x, cam_y, scale)
+        profiler.begin("draw.overlay"); vr = pygame.Rect(dx, dy, dw, dh); pygame.draw.rect(screen, (255, 255, 255), vr, 1)
+        screen.blit(text_cache.render(text_cache.font(12), f"Native: {tw}x{th} x{scale:g}", (255,255,255)), (max(0, vr.x), max(0, vr.y - 18))); profiler.end()
+    def draw_world(self, screen, view_w, view_h, cam_x, cam_y):
+        # Everything in world space, at render_zoom screen pixels per world pixel, centred on the camera
+        z = self.render_zoom; cx, cy = view_w // 2, view_h // 2; gx, gy = cx - (cam_x % 100)*z, cy - (cam_y % 100)*z
+        profiler.begin("draw.world")
         for i in range(-10, 20):
-            pygame.draw.line(screen, self.grid_color, (gx+i*100*self.zoom, 0), (gx+i*100*self.zoom, play_h), 1)
-            pygame.draw.line(screen, self.grid_color, (0, gy+i*100*self.zoom), (play_w, gy+i*100*self.zoom), 1)
-        if self.bg_img:
-            bw, bh = int(self.bg_img.get_width()*self.bg_zoom*self.zoom*0.5), int(self.bg_img.get_height()*self.bg_zoom*self.zoom*0.5); bs = pygame.transform.scale(self.bg_img, (bw, bh))
-            if self.bg_alpha < 255: bs.set_alpha(self.bg_alpha)
-            bx = cx + (self.bg_off_x - cam_x * self.bg_parallax) * self.zoom - bw // 2; by = cy + (self.bg_off_y - cam_y * self.bg_parallax) * self.zoom - bh // 2; screen.blit(bs, (bx, by))
-        for p in self.platforms: pygame.draw.rect(screen, (80,80,100), (cx+(p.x-cam_x)*self.zoom, cy+(p.y-cam_y)*self.zoom, p.w*self.zoom, p.h*self.zoom), border_radius=int(3*self.zoom))
-        pygame.draw.line(screen, (100,100,100), (cx+(0-cam_x)*self.zoom, cy+(500-cam_y)*self.zoom), (cx+(5000-cam_x)*self.zoom, cy+(500-cam_y)*self.zoom), 2)
-        if self.vfx_enabled:
-            for ai in self.afterimages:
-                src = self.sources[ai['s']]; f = src.frames[min(ai['f'], len(src.frames)-1)]; img = f['img'].copy(); img.fill((100, 150, 255, ai['alpha']), special_flags=pygame.BLEND_RGBA_MULT); sc = pygame.transform.scale(img, (int(img.get_width()*self.zoom), int(img.get_height()*self.zoom)))
-                ox, oy = f['ox']*self.zoom, f['oy']*self.zoom
-                if not ai['right']: sc = pygame.transform.flip(sc, True, False); ox = -ox - sc.get_width()
-                screen.blit(sc, (int(cx + (ai['x'] - cam_x)*self.zoom + ox), int(cy + (ai['y'] - cam_y)*self.zoom + oy)))
+            pygame.draw.line(screen, self.grid_color, (gx+i*100*z, 0), (gx+i*100*z, view_h), 1)
+            pygame.draw.line(screen, self.grid_color, (0, gy+i*100*z), (view_w, gy+i*100*z), 1)
+        profiler.end(); profiler.begin("draw.bg"); clip = screen.get_clip(); self.background.draw(screen, cx, cy, cam_x, cam_y, z, clip.right, clip.bottom); profiler.end()
+        profiler.begin("draw.world"); view_l, view_t = cam_x - cx / z, cam_y - cy / z
+        for p in self.platform_grid.in_rect(view_l, view_t, view_l + view_w / z, view_t + view_h / z): pygame.draw.rect(screen, (80,80,100), (cx+(p.x-cam_x)*z, cy+(p.y-cam_y)*z, p.w*z, p.h*z), border_radius=int(3*z))
+        pygame.draw.line(screen, (100,100,100), (cx+(0-cam_x)*z, cy+(500-cam_y)*z), (cx+(5000-cam_x)*z, cy+(500-cam_y)*z), 2)
+        profiler.end()
+        if self.vfx_enabled: profiler.begin("draw.vfx"); self.vfx.draw(screen, cam_x, cam_y, cx, cy, False); profiler.end()
+        profiler.begin("draw.sprites")
         if self.visible:
-            cur_s = self.active_tag_info[0] if self.active_tag_info else 0
-            if not self.active_tag_info:
-                state = "WALK" if self.grounded and abs(self.vx) > 0.5 else ("IDLE" if self.grounded else ("JUMP" if self.vy < 0 else "FALL")); m = self.profiles[0].mappings.get(state, []) if self.profiles else []; cur_s = m[0][0] if m else 0
-            self.draw_sprite(screen, self.x, self.y, cur_s, self.frame_idx, self.facing_right, cam_x, cam_y, cx, cy)
+            px, py = self.render_pos(self); self.draw_sprite(screen, px, py, self.current_source(), self.frame_idx, self.facing_right, cam_x, cam_y, cx, cy)
+        margin = 256 * z; half_w, half_h = view_w / 2 + margin, view_h / 2 + margin
         for ai in self.ai_list:
-            if ai.visible:
-                ai_s = ai.active_tag_info[0] if ai.active_tag_info else ai.profile.source_idx; self.draw_sprite(screen, ai.x, ai.y, ai_s, ai.frame_idx, ai.facing_right, cam_x, cam_y, cx, cy)
-            adx, ady = (ai.x-cam_x)*self.zoom, (ai.y-cam_y)*self.zoom
+            if not ai.visible or ai.lod_tier == AI_FAR: continue # FAR NPCs only get their edge arrow
+            ax, ay = self.render_pos(ai)
+            if abs((ax-cam_x)*z) < half_w and abs((ay-cam_y)*z) < half_h: self.draw_sprite(screen, ax, ay, ai.current_source(), ai.frame_idx, ai.facing_right, cam_x, cam_y, cx, cy)
+        profiler.end(); profiler.begin("draw.crowd")
+        for crowd in self.crowds: crowd.draw(screen, cam_x, cam_y, cx, cy, view_w, view_h)
+        profiler.end()
+        if self.vfx_enabled: profiler.begin("draw.vfx"); self.vfx.draw(screen, cam_x, cam_y, cx, cy, True); profiler.end()
+        if self.show_hitboxes:
+            profiler.begin("draw.overlay")
+            for ev in self.hits.events: l, t, w, h = ev['rect']; pygame.draw.rect(screen, (250, 204, 21), (cx + (l - cam_x) * z, cy + (t - cam_y) * z, max(1, w * z), max(1, h * z)), 1)
+            profiler.end()
+    def draw_arrows(self, screen, play_w, play_h, cam_x, cam_y, scale):
+        # Edge markers for NPCs outside the play area, drawn at screen resolution in both render modes
+        cx, cy = play_w // 2, play_h // 2
+        for ai in self.ai_list:
+            ax, ay = self.render_pos(ai); adx, ady = (ax-cam_x)*scale, (ay-cam_y)*scale
             if abs(adx)>play_w//2 or abs(ady)>play_h//2:
                 ang = math.atan2(ady, adx); px, py = cx+math.cos(ang)*(play_w//2-40), cy+math.sin(ang)*(play_h//2-40); pygame.draw.circle(screen, (220,38,38), (int(px), int(py)), 12); pygame.draw.line(screen, (255,255,255), (px, py), (px-math.cos(ang)*8, py-math.sin(ang)*8), 2)
-        if self.show_viewport:
-            vw, vh = self.target_w * self.zoom, self.target_h * self.zoom; vr = pygame.Rect(cx - vw//2, cy - vh//2, vw, vh); overlay = pygame.Surface((play_w, play_h), pygame.SRCALPHA); overlay.fill((0, 0, 0, 160)); pygame.draw.rect(overlay, (0, 0, 0, 0), vr); screen.blit(overlay, (0, 0)); pygame.draw.rect(screen, (255, 255, 255), vr, 1)
-            screen.blit(pygame.font.SysFont("Arial", 12).render(f"Viewport: {self.target_w}x{self.target_h} (16:9)", True, (255,255,255)), (vr.x, vr.y - 18))
 
-def main():
-    pygame.init(); screen = pygame.display.set_mode((1350, 850), pygame.RESIZABLE); clock = pygame.time.Clock(); player = AsepritePlayer(); show_settings = False; slot_scroll = tag_scroll = settings_scroll = 0; font_s = pygame.font.SysFont("Arial", 12); font_b = pygame.font.SysFont("Arial", 14, bold=True); font_h = pygame.font.SysFont("Arial", 11); is_dragging_cam = False; last_m_pos = (0,0); selected_slot = None
-    folds = {"PHYSICS": True, "AI & COMBAT": True, "JUICE & VFX": True, "LAYERS": True, "VIEWPORT": True, "BG IMAGE": True, "BG COLOR": True}
-    while True:
-        dt = clock.tick(60); sw, sh = screen.get_size(); sidebar_w = 450; play_w = sw - sidebar_w; play_h = sh - 70; m_pos = pygame.mouse.get_pos(); screen.fill(player.bg_color)
-        if player: player.update(pygame.key.get_pressed(), 500, dt); player.draw(screen, play_w, play_h)
-        pygame.draw.rect(screen, (25, 25, 30), (play_w, 0, sidebar_w, sh)); pygame.draw.rect(screen, (35, 35, 40), (0, 0, play_w, 70))
-        new_proj = pygame.Rect(10, 5, 120, 30); pygame.draw.rect(screen, (220, 38, 38), new_proj, border_radius=5); screen.blit(font_b.render("NEW PROJECT", True, (255,255,255)), (20, 10))
-        load_prev = pygame.Rect(140, 5, 100, 30); has_prev = os.path.exists("ase_project.json")
-        pygame.draw.rect(screen, (59, 130, 246) if has_prev else (60, 60, 70), load_prev, border_radius=5); screen.blit(font_b.render("LOAD PREV", True, (255,255,255) if has_prev else (120, 120, 120)), (152, 10))
-        add_src = pygame.Rect(250, 5, 100, 30); pygame.draw.rect(screen, (59, 130, 246), add_src, border_radius=5); screen.blit(font_b.render("+ SOURCE", True, (255,255,255)), (265, 10))
-        add_npc = pygame.Rect(360, 5, 90, 30); pygame.draw.rect(screen, (22, 163, 74), add_npc, border_radius=5); screen.blit(font_b.render("+ NPC", True, (255,255,255)), (380, 10))
-        settings_btn = pygame.Rect(play_w - 120, 5, 110, 30); pygame.draw.rect(screen, (50, 50, 60), settings_btn, border_radius=5); screen.blit(font_b.render("⚙ SETTINGS", True, (255,255,255)), (settings_btn.x+15, 10))
+class UIPanel:
+    # A cached UI surface: build(surf) only runs when the panel's key (its inputs) or its size changes
+    def __init__(self):
+        self.key = None; self.surf = None; self.builds = 0
+    def update(self, key, size, build):
+        if self.surf is not None and key == self.key and self.surf.get_size() == size: return False
+        if self.surf is None or self.surf.get_size() != size: self.surf = pygame.Surface(size)
+        self.key = key; build(self.surf); self.builds += 1
+        return True
+
+class ViewerUI:
+    # Top bar, sidebar (slots/tags or settings) and controls bar; panels are retained surfaces, rebuilt only when their inputs change
+    PHYSICS_SLIDERS = [("Dash Vel",10,50,"dash_speed",0), ("Jump Pow",10,25,"jump_power",1), ("PBomb Spd",10,60,"powerbomb_speed",0), ("Cam Offset",-400,100,"cam_v_offset",0)]
+    VFX_TOGGLES = [("Enable Shake", "shake_enabled"), ("Enable Ghost", "vfx_enabled")]
+    VIEWPORT_TOGGLES = [("Show Viewport", "show_viewport"), ("Native Render", "native_render")] # Native: world drawn at target_w x target_h, upscaled once
+    AI_TOGGLES = [("NPC LOD", "lod_enabled"), ("Rewind History", "history_enabled")] # LOD off: every NPC runs at full rate
+    BG_SLIDERS = [("BG-X",-2000,2000,"off_x",0), ("BG-Y",-2000,2000,"off_y",0), ("Scale",0.1,10,"zoom",0), ("Alpha",0,255,"alpha",0), ("Parallax",0,1,"parallax",0)] # Edit player.background.current()
+    def __init__(self):
+        self.show_profiler = False; self.profiler_panel = None; self.profiler_built = 0.0; self.timeline = None; self.timeline_drag = False; self.scrub_held = 0
+        self.show_settings = False; self.slot_scroll = self.tag_scroll = self.settings_scroll = 0; self.selected_slot = None
+        self.font_s = text_cache.font(12); self.font_b = text_cache.font(14, bold=True); self.font_h = text_cache.font(11)
+        self.folds = {"PHYSICS": True, "AI & COMBAT": True, "JUICE & VFX": True, "LAYERS": True, "VIEWPORT": True, "BG IMAGE": True, "LEVEL": True, "BG COLOR": True}
+        self.topbar = UIPanel(); self.sidebar = UIPanel(); self.controls = UIPanel(); self.widgets = []; self.dirty = []; self.full_redraw = True
+    def text(self, font, s, color): return text_cache.render(font, s, color)
+    def invalidate(self):
+        # Window resized/exposed: repaint and flip everything on the next present()
+        self.full_redraw = True
+    def draw_loading(self, screen, player, play_w):
+        # Source loading progress, drawn into the play area under the top bar while workers are busy
+        prog = player.reloader.progress()
+        if not prog: return
+        done, total = prog; bar = pygame.Rect(play_w - 230, 78, 220, 18); pygame.draw.rect(screen, (35, 35, 40), bar, border_radius=4)
+        pygame.draw.rect(screen, (59, 130, 246), (bar.x, bar.y, bar.w * done // max(1, total), bar.h), border_radius=4)
+        screen.blit(self.text(self.font_h, f"Loading sources {done}/{total}", (255, 255, 255)), (bar.x + 8, bar.y + 3))
+    def draw_timeline(self, screen, player, play_w, play_h):
+        # Rewind scrubber over the recorded span, shown while scrubbing: click/drag seeks, , . step, Enter plays on from here, End returns to live
+        h = player.history
+        if h.cursor is None: self.timeline = None; return
+        first, end = h.span(); bar = self.timeline = pygame.Rect(20, play_h - 30, play_w - 40, 12); x = bar.x + bar.w * (h.cursor - first) // max(1, end - 1 - first)
+        pygame.draw.rect(screen, (35, 35, 40), bar, border_radius=4); pygame.draw.rect(screen, (59, 130, 246), (bar.x, bar.y, x - bar.x, bar.h), border_radius=4); pygame.draw.rect(screen, (255, 255, 255), (x - 2, bar.y - 4, 4, bar.h + 8))
+        label = f"REWIND {(h.cursor - end + 1) * SIM_DT / 1000:+.2f}s  (tick {h.cursor - first}/{end - 1 - first})   , . Step (Shift x10)   Enter Resume   End Live"
+        screen.blit(self.text(self.font_h, label, (255, 255, 255)), (bar.x, bar.y - 20))
+    def seek_timeline(self, player, mx):
+        first, end = player.history.span(); bar = self.timeline; player.history.seek(first + round(min(max(0, (mx - bar.x) / bar.w), 1) * (end - 1 - first)))
+    def hold_scrub(self, player, keys, dt):
+        # Holding , or . keeps scrubbing (one tick per frame, 10 with Shift) after a short delay; the key press itself steps once
+        d = keys[pygame.K_PERIOD] - keys[pygame.K_COMMA]
+        if not d or player.history.cursor is None: self.scrub_held = 0; return
+        self.scrub_held += dt
+        if self.scrub_held > 300: player.history.step(d * (10 if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT] else 1))
+    def draw_profiler(self, screen):
+        # F3 overlay: rolling per-scope averages/max and the frame-time graph; rebuilt 4x per second, blitted every frame
+        if not self.show_profiler: return
+        now = time.perf_counter()
+        if self.profiler_panel is None or now - self.profiler_built > 0.25:
+            frames = list(profiler.frames); rows = [r for r in profiler.summary() if r[0] != "frame"][:14]; gh = 60
+            panel = pygame.Surface((320, 40 + gh + 15 * len(rows)), pygame.SRCALPHA); panel.fill((0, 0, 0, 190)); text = self.text
+            avg = sum(frames[-60:]) / max(1, len(frames[-60:])); worst = max(frames[-60:] or [0])
+            panel.blit(text(self.font_b, f"{avg:.1f}ms avg  {worst:.1f}ms max  {1000 / avg if avg else 0:.0f} fps", (255, 255, 255)), (8, 6))
+            for ms, col in ((1000 / 60, (22, 163, 74)), (1000 / 30, (220, 38, 38))): y = 30 + gh - int(min(gh, ms * gh / 50)); pygame.draw.line(panel, col, (8, y), (312, y), 1)
+            for i, ms in enumerate(frames[-304:]): pygame.draw.line(panel, (250, 204, 21) if ms > 1000 / 30 else (59, 130, 246), (8 + i, 30 + gh), (8 + i, 30 + gh - int(min(gh, ms * gh / 50))), 1)
+            for i, (name, a, m) in enumerate(rows):
+                y = 36 + gh + i * 15; panel.blit(text(self.font_h, name, (200, 200, 200)), (8, y)); panel.blit(text(self.font_h, f"{a:6.2f} / {m:6.2f} ms", (255, 255, 255)), (190, y))
+            self.profiler_panel = panel; self.profiler_built = now
+        screen.blit(self.profiler_panel, (10, 78))
+    def present(self, play_rect):
+        # The play area changes every frame; sidebar/controls only reach the display when they were rebuilt
+        if self.full_redraw: pygame.display.flip(); self.full_redraw = False
+        else: pygame.display.update([play_rect] + self.dirty)
+        self.dirty = []
+    def draw_topbar(self, screen, player, play_w, sidebar_w, sh):
+        self.new_proj = pygame.Rect(10, 5, 120, 30); self.load_prev = pygame.Rect(140, 5, 100, 30); self.has_prev = os.path.exists("ase_project.json")
+        self.add_src = pygame.Rect(250, 5, 100, 30); self.add_npc = pygame.Rect(360, 5, 90, 30); self.settings_btn = pygame.Rect(play_w - 120, 5, 110, 30)
+        key = (play_w, self.has_prev) + ((tuple(p.name for p in player.profiles), player.cur_profile_idx, tuple(s.name for s in player.sources), player.cur_source_idx) if player else ())
+        self.topbar.update(key, (max(1, play_w), 70), lambda surf: self.build_topbar(surf, player))
+        screen.blit(self.topbar.surf, (0, 0)) # Every frame: the play area is drawn underneath it
+    def build_topbar(self, surf, player):
+        surf.fill((35, 35, 40)); text = self.text
+        pygame.draw.rect(surf, (220, 38, 38), self.new_proj, border_radius=5); surf.blit(text(self.font_b, "NEW PROJECT", (255,255,255)), (20, 10))
+        pygame.draw.rect(surf, (59, 130, 246) if self.has_prev else (60, 60, 70), self.load_prev, border_radius=5); surf.blit(text(self.font_b, "LOAD PREV", (255,255,255) if self.has_prev else (120, 120, 120)), (152, 10))
+        pygame.draw.rect(surf, (59, 130, 246), self.add_src, border_radius=5); surf.blit(text(self.font_b, "+ SOURCE", (255,255,255)), (265, 10))
+        pygame.draw.rect(surf, (22, 163, 74), self.add_npc, border_radius=5); surf.blit(text(self.font_b, "+ NPC", (255,255,255)), (380, 10))
+        pygame.draw.rect(surf, (50, 50, 60), self.settings_btn, border_radius=5); surf.blit(text(self.font_b, "⚙ SETTINGS", (255,255,255)), (self.settings_btn.x+15, 10))
         if player:
             for i, p in enumerate(player.profiles):
-                tab = pygame.Rect(460+i*95, 5, 90, 30); col = (59,130,246) if player.cur_profile_idx==i else (60,60,70); pygame.draw.rect(screen, col, tab, border_radius=5); screen.blit(font_s.render(p.name[:12], True, (255,255,255)), (tab.x+5, 12))
+                tab = pygame.Rect(460+i*95, 5, 90, 30); col = (59,130,246) if player.cur_profile_idx==i else (60,60,70); pygame.draw.rect(surf, col, tab, border_radius=5); surf.blit(text(self.font_s, p.name[:12], (255,255,255)), (tab.x+5, 12))
             for i, s in enumerate(player.sources):
-                tab = pygame.Rect(10+i*110, 38, 105, 28); col = (100,100,120) if player.cur_source_idx==i else (45,45,55); pygame.draw.rect(screen, col, tab, border_radius=5); screen.blit(font_s.render(s.name[:12], True, (255,255,255)), (tab.x+5, 44))
+                tab = pygame.Rect(10+i*110, 38, 105, 28); col = (100,100,120) if player.cur_source_idx==i else (45,45,55); pygame.draw.rect(surf, col, tab, border_radius=5); surf.blit(text(self.font_s, s.name[:12], (255,255,255)), (tab.x+5, 44))
+    def draw_sidebar(self, screen, player, play_w, sidebar_w, sh, m_pos):
+        if hasattr(player, "_btn_lock"):
+            player._btn_lock -= 1
+            if player._btn_lock <= 0: delattr(player, "_btn_lock")
+        cur_p = player.profiles[player.cur_profile_idx] if player.profiles else None
+        src = player.sources[min(player.cur_source_idx, len(player.sources)-1)] if player.sources else None
+        if cur_p and self.show_settings:
+            hover = next((w[2] for w in self.widgets if w[0] == "layer" and w[1].collidepoint(m_pos)), None)
+            key = ("settings", self.settings_scroll, tuple(self.folds.values()), tuple(getattr(player, s[3]) for s in self.PHYSICS_SLIDERS), player.background.state(), tuple(getattr(player, t[1]) for t in self.VFX_TOGGLES + self.VIEWPORT_TOGGLES + self.AI_TOGGLES),
+                   src and (src.id, tuple(src.layers), tuple(sorted(src.visible_layers))), player.level_path, len(player.platforms), hover, play_w)
+            build = lambda surf: self.build_settings(surf, player, src, play_w, sidebar_w, sh, hover)
+        elif cur_p:
+            rx, ry = m_pos[0] - (play_w + 20), m_pos[1] - 475 - self.tag_scroll; hover = ry // 25 if 0 <= rx < sidebar_w - 40 and ry >= 0 and ry % 25 < 22 else -1
+            key = ("lists", id(cur_p), repr(cur_p.mappings), self.slot_scroll, self.tag_scroll, self.selected_slot, src and (src.id, src.version, src.name), player.cur_source_idx, hover)
+            build = lambda surf: self.build_lists(surf, player, cur_p, src, sidebar_w, sh, hover)
+        else: key = ("empty",); build = lambda surf: surf.fill((25, 25, 30))
+        if self.sidebar.update(key, (sidebar_w, max(1, sh)), build) or self.full_redraw: screen.blit(self.sidebar.surf, (play_w, 0)); self.dirty.append(pygame.Rect(play_w, 0, sidebar_w, sh))
+        if cur_p and self.show_settings: self.handle_settings(player, src, play_w, sidebar_w, m_pos)
+        if cur_p:
+            # HUD bits inside the play area (redrawn with it every frame)
+            for i in range(2): pygame.draw.rect(screen, (59,130,246) if i < player.dash_charges else (60,60,70), (play_w - 80 + i*35, sh - 100, 30, 10), border_radius=3)
+            if player.show_hitboxes: screen.blit(self.font_h.render(f"{player.sprite_cache.stats()} | {player.atlas.stats()} | hits {len(player.hits.events)} (total {player.hits.total}) | {player.lod_stats()}", True, (120,120,130)), (10, sh - 60))
+        key = (bool(cur_p), player.is_paused, f"{player.playback_speed:.1f}", player.time_scale, player.history_enabled, tuple(player.bg_color))
+        if self.controls.update(key, (max(1, play_w), 40), lambda surf: self.build_controls(surf, player, bool(cur_p))) or self.full_redraw: screen.blit(self.controls.surf, (0, sh - 40)); self.dirty.append(pygame.Rect(0, sh - 40, play_w, 40))
+    def build_settings(self, surf, player, src, play_w, sidebar_w, sh, hover):
+        # Draws the settings panel and records its widgets (screen rects) for handle_settings
+        surf.fill((25, 25, 30)); text = self.text; widgets = []; cy = 60 + self.settings_scroll
+        for cat in self.folds.keys():
+            hr = pygame.Rect(10, cy, sidebar_w-20, 30); pygame.draw.rect(surf, (50,50,60), hr, border_radius=5); surf.blit(text(self.font_b, f"{'+' if not self.folds[cat] else '-'} {cat}", (255,255,255)), (hr.x+10, hr.y+7)); cy += 35
+            if self.folds[cat]:
+                if cat == "PHYSICS":
+                    for i, (l, mn, mx, at, inv) in enumerate(self.PHYSICS_SLIDERS):
+                        y = cy+i*45; surf.blit(text(self.font_s, l, (150,150,150)), (20, y)); pygame.draw.rect(surf, (60,60,70), (80, y+5, sidebar_w-120, 8)); v = getattr(player, at); n = (v-mn)/(mx-mn) if not inv else (-v-mn)/(mx-mn); pygame.draw.circle(surf, (59,130,246), (int(80+n*(sidebar_w-120)), y+9), 8)
+                        widgets.append(("slider", pygame.Rect(play_w+80, y, sidebar_w-120, 20).inflate(0,10), (at, mn, mx, inv)))
+                    cy += 185
+                elif cat in ("JUICE & VFX", "VIEWPORT", "AI & COMBAT"):
+                    toggles = {"JUICE & VFX": self.VFX_TOGGLES, "VIEWPORT": self.VIEWPORT_TOGGLES}.get(cat, self.AI_TOGGLES)
+                    for i, (l, at) in enumerate(toggles):
+                        y = cy+i*40; surf.blit(text(self.font_s, l, (150,150,150)), (20, y)); btn = pygame.Rect(sidebar_w-60, y-5, 40, 20); val = getattr(player, at); pygame.draw.rect(surf, (22, 163, 74) if val else (220, 38, 38), btn, border_radius=10); pygame.draw.circle(surf, (255,255,255), (btn.x+30 if val else btn.x+10, btn.y+10), 8)
+                        widgets.append(("toggle", btn.move(play_w, 0), at))
+                    cy += len(toggles) * 40 + 10
+                elif cat == "LAYERS" and src:
+                    for l_name in src.layers:
+                        ly = cy; is_vis = l_name in src.visible_layers; l_rect = pygame.Rect(15, ly-2, sidebar_w-30, 24)
+                        if hover == l_name: pygame.draw.rect(surf, (60,60,70), l_rect, border_radius=4)
+                        pygame.draw.rect(surf, (22, 163, 74) if is_vis else (60, 60, 70), (20, ly+2, 16, 16), border_radius=3); surf.blit(text(self.font_s, l_name[:30], (255,255,255) if is_vis else (150,150,150)), (45, ly+2))
+                        widgets.append(("layer", l_rect.move(play_w, 0), l_name)); cy += 28
+                    cy += 10
+                elif cat == "BG IMAGE":
+                    bg_btn = pygame.Rect(20, cy, 150, 30); pygame.draw.rect(surf, (100,100,110), bg_btn, border_radius=5); surf.blit(text(self.font_b, "ADD BG LAYER", (255,255,255)), (bg_btn.x+20, bg_btn.y+5)); widgets.append(("bg_load", bg_btn.move(play_w, 0), None))
+                    cy += 40; bg = player.background
+                    for i, layer in enumerate(bg.layers):
+                        row = pygame.Rect(15, cy-2, sidebar_w-30, 24); sel = i == bg.selected
+                        if sel: pygame.draw.rect(surf, (60,60,70), row, border_radius=4)
+                        surf.blit(text(self.font_s, f"{i+1}. {os.path.basename(layer.path) if layer.path else 'image'}"[:28], (255,255,255) if sel else (150,150,150) if layer.img else (220,38,38)), (20, cy+2)); widgets.append(("bg_layer", pygame.Rect(row.x, row.y, row.w-100, row.h).move(play_w, 0), i))
+                        for j, (lbl, at) in enumerate((("X", "tile_x"), ("Y", "tile_y"))):
+                            btn = pygame.Rect(sidebar_w-110+j*30, cy, 24, 20); pygame.draw.rect(surf, (22, 163, 74) if getattr(layer, at) else (60, 60, 70), btn, border_radius=3); surf.blit(text(self.font_s, lbl, (255,255,255)), (btn.x+7, btn.y+2)); widgets.append(("bg_tile", btn.move(play_w, 0), (i, at)))
+                        rm = pygame.Rect(sidebar_w-45, cy, 24, 20); pygame.draw.rect(surf, (220, 38, 38), rm, border_radius=3); surf.blit(text(self.font_s, "x", (255,255,255)), (rm.x+8, rm.y+2)); widgets.append(("bg_remove", rm.move(play_w, 0), i))
+                        cy += 28
+                    layer = bg.current()
+                    if layer:
+                        cy += 10
+                        for i, (l, mn, mx, at, inv) in enumerate(self.BG_SLIDERS):
+                            y = cy+i*40; surf.blit(text(self.font_s, l, (150,150,150)), (20, y)); pygame.draw.rect(surf, (60,60,70), (80, y+5, sidebar_w-120, 8)); v = getattr(layer, at); n = (v-mn)/(mx-mn); pygame.draw.circle(surf, (220,38,38), (int(80+n*(sidebar_w-120)), y+9), 8)
+                            widgets.append(("bg_slider", pygame.Rect(play_w+80, y, sidebar_w-120, 20).inflate(0,10), (at, mn, mx)))
+                        cy += 210
+                    else: cy += 10
+                elif cat == "LEVEL":
+                    lv_btn = pygame.Rect(20, cy, 150, 30); pygame.draw.rect(surf, (100,100,110), lv_btn, border_radius=5); surf.blit(text(self.font_b, "LOAD LEVEL", (255,255,255)), (lv_btn.x+30, lv_btn.y+5))
+                    rs_btn = pygame.Rect(180, cy, 90, 30); pygame.draw.rect(surf, (60,60,70), rs_btn, border_radius=5); surf.blit(text(self.font_b, "DEFAULT", (255,255,255)), (rs_btn.x+14, rs_btn.y+5))
+                    widgets.append(("level_load", lv_btn.move(play_w, 0), None)); widgets.append(("level_reset", rs_btn.move(play_w, 0), None))
+                    surf.blit(text(self.font_s, f"{os.path.basename(player.level_path) if player.level_path else 'Default'}: {len(player.platforms)} platforms", (150,150,150)), (20, cy+38))
+                    cy += 65
+                else: cy += 10
+        pygame.draw.line(surf, (59, 130, 246), (0, 0), (0, sh), 2); self.widgets = widgets
+    def handle_settings(self, player, src, play_w, sidebar_w, m_pos):
+        # Mouse input against the widgets recorded by the last build; any change shows up in the panel key next frame
+        if not pygame.mouse.get_pressed()[0]: return
+        for kind, rect, arg in self.widgets:
+            if not rect.collidepoint(m_pos): continue
+            if kind == "slider":
+                at, mn, mx, inv = arg; v = mn+(m_pos[0]-(play_w+80))/(sidebar_w-120)*(mx-mn); setattr(player, at, -v if inv else v); player.save_settings()
+            elif kind == "toggle" and not hasattr(player, "_btn_lock"): setattr(player, arg, not getattr(player, arg)); player._btn_lock = 10; player.save_settings()
+            elif kind == "layer" and src and not hasattr(player, "_btn_lock"):
+                if not src.set_layer_visible(arg, arg not in src.visible_layers): player.reloader.request(src)
+                player._btn_lock = 15
+            elif kind == "bg_slider" and player.background.current():
+                at, mn, mx = arg; setattr(player.background.current(), at, max(mn, min(mx, mn+(m_pos[0]-(play_w+80))/(sidebar_w-120)*(mx-mn)))); player.save_settings()
+            elif kind == "bg_load":
+                p = select_file([("Image", "*.png *.jpg *.bmp")]); 
+                if p: player.background.add(BgLayer(p)); player.save_settings()
+            elif kind in ("bg_layer", "bg_tile", "bg_remove") and not hasattr(player, "_btn_lock"):
+                if kind == "bg_layer": player.background.selected = arg
+                elif kind == "bg_tile": layer = player.background.layers[arg[0]]; setattr(layer, arg[1], not getattr(layer, arg[1]))
+                else: player.background.remove(arg)
+                player._btn_lock = 10; player.save_settings()
+            elif kind == "level_load":
+                p = select_file([("Level", "*.json *.tmj")]); 
+                if p: player.load_level(p); player.save_settings()
+            elif kind == "level_reset": player.reset_level(); player.save_settings()
+    def build_lists(self, surf, player, cur_p, src, sidebar_w, sh, hover):
+        surf.fill((25, 25, 30)); text = self.text; slot_clip = surf.subsurface((10, 85, sidebar_w-20, 380)) # Subsurfaces clip the scrolled lists
+        for i, a in enumerate(cur_p.mappings.keys()):
+            r = pygame.Rect(10, i*38+self.slot_scroll, sidebar_w-40, 34)
+            if r.bottom < 0 or r.top > 380: continue
+            is_sel = self.selected_slot == a; pygame.draw.rect(slot_clip, (59,130,246) if is_sel else (45,45,50), r, border_radius=5); slot_clip.blit(text(self.font_b, a, (255,255,255)), (r.x+10, r.y+3))
+            ms = ", ".join([f"{m[1]}" for m in cur_p.mappings[a]]); slot_clip.blit(text(self.font_s, f"-> {ms[:45]}", (200,200,200) if not is_sel else (255,255,255)), (r.x+10, r.y+18))
+        if src:
+            pygame.draw.rect(surf, (20,20,25), (15, 475, sidebar_w-30, sh-490), border_radius=5); surf.blit(text(self.font_b, f"TAGS FROM: {src.name[:20]}", (100,100,100)), (20, 455))
+            cs = surf.subsurface((20, 475, sidebar_w-40, max(0, sh-495)))
+            for idx, t in enumerate(src.tag_list):
+                tr = pygame.Rect(0, idx*25+self.tag_scroll, sidebar_w-40, 22)
+                if tr.bottom < 0 or tr.top > cs.get_height(): continue
+                is_m = self.selected_slot and [player.cur_source_idx, t] in cur_p.mappings[self.selected_slot]; pygame.draw.rect(cs, (59,130,246) if is_m else ((70,70,80) if idx == hover else (40,40,45)), tr, border_radius=3); cs.blit(text(self.font_s, t, (255,255,255)), (tr.x+10, tr.y+4))
+    def build_controls(self, surf, player, has_profile):
+        if not has_profile: surf.fill(player.bg_color); return
+        surf.fill((30, 30, 35)); text = self.text; ctrl = [("Z", "Atk"), ("X", "Dash"), ("C/B/N", "Skill"), ("T", "Swap"), ("G", "Crowd+200"), ("P", "Pause" if not player.is_paused else "Play"), ("O", "Step"), ("[ ]", f"Spd:{player.playback_speed:.1f}"), ("- =", f"Time:x{player.time_scale:g}"), ("F5", "Refresh"), (", .", "Rewind" if player.history_enabled else "Rewind: off"), ("F3/F9", "Prof/Trace"), ("H", "Hitbox"), ("R-Drag", "Cam"), ("F", "Reset")]
+        tx = 20
+        for k, d in ctrl:
+            kw, dw = self.font_h.size(k)[0], self.font_h.size(d)[0]
+            pygame.draw.rect(surf, (45,45,50), (tx-5, 8, kw+dw+25, 24), border_radius=4); surf.blit(text(self.font_h, k, (59,130,246)), (tx, 13)); surf.blit(text(self.font_h, f": {d}", (255,255,255)), (tx+kw, 13)); tx += kw+dw+35
+
+def main():
+    pygame.init(); screen = pygame.display.set_mode((1350, 850), pygame.RESIZABLE); clock = pygame.time.Clock(); player = AsepritePlayer(); ui = ViewerUI(); is_dragging_cam = False; last_m_pos = (0,0)
+    while True:
+        profiler.begin("idle"); dt = clock.tick(player.max_fps); profiler.end(); profiler.frame(); sw, sh = screen.get_size(); sidebar_w = 450; play_w = sw - sidebar_w; play_h = sh - 70; m_pos = pygame.mouse.get_pos()
+        play_rect = pygame.Rect(0, 0, play_w, sh - 40); screen.fill(player.bg_color, play_rect); screen.set_clip(play_rect) # Sprites must not spill into the retained sidebar/controls pixels
+        if player: player.advance(pygame.key.get_pressed(), 500, dt); player.draw(screen, play_w, play_h); ui.draw_loading(screen, player, play_w); ui.draw_timeline(screen, player, play_w, play_h)
+        profiler.begin("ui.profiler"); ui.draw_profiler(screen); profiler.end()
+        screen.set_clip(None)
+        profiler.begin("ui.topbar"); ui.draw_topbar(screen, player, play_w, sidebar_w, sh); profiler.end()
+        profiler.begin("ui.events")
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 if player: player.save_project(); player.save_settings()
                 pygame.quit(); sys.exit()
-            if event.type == pygame.VIDEORESIZE: screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+            if event.type == pygame.VIDEORESIZE: screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE); ui.invalidate()
+            if event.type == pygame.VIDEOEXPOSE: ui.invalidate()
             if event.type == pygame.DROPFILE:
-                if not player.profiles: player.add_source(event.file); player.add_profile("PLAYER", 0)
+                if event.file.lower().endswith((".json", ".tmj")): player.load_level(event.file); player.save_settings()
+                elif not player.profiles: player.add_source(event.file); player.add_profile("PLAYER", 0)
                 else: sid = player.add_source(event.file); player.add_profile(f"NPC_{len(player.profiles)}", sid, is_npc=True)
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 3 and m_pos[0] < play_w: is_dragging_cam = True; last_m_pos = m_pos; player.cam_follow = False
-                if new_proj.collidepoint(m_pos):
+                if event.button == 1 and ui.timeline and ui.timeline.inflate(0, 16).collidepoint(m_pos): ui.timeline_drag = True
+                if ui.new_proj.collidepoint(m_pos):
                     p = select_file([("Aseprite", "*.aseprite *.ase")]); 
-                    if p: player = AsepritePlayer(p)
-                if load_prev.collidepoint(m_pos) and has_prev: player.load_project()
-                if add_src.collidepoint(m_pos) and player:
+                    if p: player.reloader.stop(); player = AsepritePlayer(p)
+                if ui.load_prev.collidepoint(m_pos) and ui.has_prev: player.load_project()
+                if ui.add_src.collidepoint(m_pos) and player:
                     p = select_file([("Aseprite", "*.aseprite *.ase")]); 
                     if p: player.add_source(p)
-                if add_npc.collidepoint(m_pos) and player:
+                if ui.add_npc.collidepoint(m_pos) and player:
                     p = select_file([("Aseprite", "*.aseprite *.ase")]); 
                     if p: sid = player.add_source(p); player.add_profile(f"NPC_{len(player.profiles)}", sid, is_npc=True)
-                if settings_btn.collidepoint(m_pos): show_settings = not show_settings; settings_scroll = 0
+                if ui.settings_btn.collidepoint(m_pos): ui.show_settings = not ui.show_settings; ui.settings_scroll = 0
                 if player:
                     for i in range(len(player.profiles)):
                         if pygame.Rect(460+i*95, 5, 90, 30).collidepoint(m_pos): player.cur_profile_idx = i
                     for i in range(len(player.sources)):
                         if pygame.Rect(10+i*110, 38, 105, 28).collidepoint(m_pos): player.cur_source_idx = i
                     if play_w < m_pos[0] < sw:
-                        if show_settings:
-                            if event.button == 4: settings_scroll = min(0, settings_scroll + 40)
-                            if event.button == 5: settings_scroll -= 40
+                        if ui.show_settings:
+                            if event.button == 4: ui.settings_scroll = min(0, ui.settings_scroll + 40)
+                            if event.button == 5: ui.settings_scroll -= 40
                         else:
                             if m_pos[1] < 450:
-                                if event.button == 4: slot_scroll = min(0, slot_scroll + 40)
-                                if event.button == 5: slot_scroll -= 40
+                                if event.button == 4: ui.slot_scroll = min(0, ui.slot_scroll + 40)
+                                if event.button == 5: ui.slot_scroll -= 40
                             else:
-                                if event.button == 4: tag_scroll = min(0, tag_scroll + 40)
-                                if event.button == 5: tag_scroll -= 40
+                                if event.button == 4: ui.tag_scroll = min(0, ui.tag_scroll + 40)
+                                if event.button == 5: ui.tag_scroll -= 40
                             if event.button == 1 and player.profiles:
                                 cur_p = player.profiles[player.cur_profile_idx]
                                 for i, action in enumerate(cur_p.mappings.keys()):
-                                    rect = pygame.Rect(play_w+20, 80+i*38+slot_scroll, sidebar_w-40, 34)
-                                    if rect.collidepoint(m_pos) and 80 < rect.top < 450: selected_slot = action
-                                if selected_slot and player.sources:
+                                    rect = pygame.Rect(play_w+20, 80+i*38+ui.slot_scroll, sidebar_w-40, 34)
+                                    if rect.collidepoint(m_pos) and 80 < rect.top < 450: ui.selected_slot = action
+                                if ui.selected_slot and player.sources:
                                     src = player.sources[min(player.cur_source_idx, len(player.sources)-1)]
                                     for idx, tag in enumerate(src.tag_list):
-                                        t_rect = pygame.Rect(play_w+20, 480+idx*25+tag_scroll, sidebar_w-40, 22)
+                                        t_rect = pygame.Rect(play_w+20, 480+idx*25+ui.tag_scroll, sidebar_w-40, 22)
                                         if t_rect.collidepoint(m_pos) and t_rect.top >= 475:
                                             target = [player.cur_source_idx, tag]
-                                            if target in cur_p.mappings[selected_slot]: cur_p.mappings[selected_slot].remove(target)
-                                            else: cur_p.mappings[selected_slot].append(target)
+                                            if target in cur_p.mappings[ui.selected_slot]: cur_p.mappings[ui.selected_slot].remove(target)
+                                            else: cur_p.mappings[ui.selected_slot].append(target)
+                                            cur_p.rev += 1
                 if event.button == 3 and play_w < m_pos[0] < sw and player.profiles:
                     cur_p = player.profiles[player.cur_profile_idx]
                     for i, action in enumerate(cur_p.mappings.keys()):
-                        if pygame.Rect(play_w+20, 80+i*38+slot_scroll, sidebar_w-40, 34).collidepoint(m_pos): cur_p.mappings[action] = []
+                        if pygame.Rect(play_w+20, 80+i*38+ui.slot_scroll, sidebar_w-40, 34).collidepoint(m_pos): cur_p.mappings[action] = []; cur_p.rev += 1
             if event.type == pygame.MOUSEBUTTONUP and event.button == 3: is_dragging_cam = False
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 1: ui.timeline_drag = False
             if event.type == pygame.KEYDOWN and player:
-                if event.key == pygame.K_F5: [s.export_and_load() for s in player.sources]; [player.auto_map_profile(p) for p in player.profiles]
+                if event.key == pygame.K_F5: log_debug(f"[CACHE] {player.sprite_cache.stats()} | {player.atlas.stats()} | {player.background.stats()} | {player.history.stats()} | {player.lod_stats()}"); [player.reloader.request(s) for s in player.sources]
+                if event.key in (pygame.K_COMMA, pygame.K_PERIOD): player.history.step((1 if event.key == pygame.K_PERIOD else -1) * (10 if event.mod & pygame.KMOD_SHIFT else 1))
+                if event.key == pygame.K_RETURN: player.history.resume()
+                if event.key == pygame.K_END: player.history.live()
+                if player.history.cursor is not None and event.key in (pygame.K_SPACE, pygame.K_UP, pygame.K_z, pygame.K_x, pygame.K_c, pygame.K_b, pygame.K_n, pygame.K_v, pygame.K_t): continue # Gameplay input would edit the shown past tick
                 if event.key in [pygame.K_SPACE, pygame.K_UP] and player.jumps_left > 0: player.vy = player.jump_power; player.grounded = False; player.jumps_left -= 1
                 if event.key == pygame.K_z: player.handle_attack(pygame.key.get_pressed())
-                if event.key == pygame.K_x: player.trigger_action("DASH")
-                if event.key == pygame.K_c: player.trigger_action("SKILL 1")
-                if event.key == pygame.K_b: player.trigger_action("SKILL 2")
-                if event.key == pygame.K_n: player.trigger_action("SKILL 3")
-                if event.key == pygame.K_v: player.trigger_action("HURT")
-                if event.key == pygame.K_t: player.trigger_action("Swap_Exit")
+                if event.key == pygame.K_x: player.trigger_action(S_DASH)
+                if event.key == pygame.K_c: player.trigger_action(S_SKILL_1)
+                if event.key == pygame.K_b: player.trigger_action(S_SKILL_2)
+                if event.key == pygame.K_n: player.trigger_action(S_SKILL_3)
+                if event.key == pygame.K_v: player.trigger_action(S_HURT)
+                if event.key == pygame.K_t: player.trigger_action(S_SWAP_EXIT)
+                if event.key == pygame.K_g and player.profiles:
+                    if pygame.key.get_mods() & pygame.KMOD_CTRL: player.crowds.clear()
+                    else: player.add_crowd(player.profiles[player.cur_profile_idx], 200)
                 if event.key == pygame.K_f: player.cam_follow = True
+                if event.key == pygame.K_F3: ui.show_profiler = not ui.show_profiler; ui.profiler_panel = None
+                if event.key == pygame.K_F9: profiler.export_trace(time.strftime("ase_trace_%Y%m%d_%H%M%S.json"), 10)
                 if event.key == pygame.K_h: player.show_hitboxes = not player.show_hitboxes
                 if event.key == pygame.K_p: player.is_paused = not player.is_paused
                 if event.key == pygame.K_o: player.step_forward = True
                 if event.key == pygame.K_LEFTBRACKET: player.playback_speed = max(0.1, player.playback_speed - 0.1)
                 if event.key == pygame.K_RIGHTBRACKET: player.playback_speed = min(5.0, player.playback_speed + 0.1)
+                if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS): player.time_scale = max(0.25, player.time_scale - 0.25) # Simulation rate (slow-mo / fast-forward); [ ] only speed up animations
+                if event.key in (pygame.K_EQUALS, pygame.K_KP_PLUS): player.time_scale = min(4.0, player.time_scale + 0.25)
             if event.type == pygame.MOUSEWHEEL and m_pos[0] < play_w: player.zoom = max(0.1, min(player.zoom + event.y * 0.2, 20.0))
-        if is_dragging_cam: dx, dy = m_pos[0] - last_m_pos[0], m_pos[1] - last_m_pos[1]; player.cam_x -= dx / player.zoom; player.cam_y -= dy / player.zoom; last_m_pos = m_pos
-        if player.profiles:
-            cur_p = player.profiles[player.cur_profile_idx]
-            if show_settings:
-                set_surf = pygame.Surface((sidebar_w, sh), pygame.SRCALPHA); cy = 60 + settings_scroll
-                for cat in folds.keys():
-                    hr = pygame.Rect(10, cy, sidebar_w-20, 30); pygame.draw.rect(set_surf, (50,50,60), hr, border_radius=5); set_surf.blit(font_b.render(f"{'+' if not folds[cat] else '-'} {cat}", True, (255,255,255)), (hr.x+10, hr.y+7)); cy += 35
-                    if folds[cat]:
-                        if cat == "PHYSICS":
-                            for i, (l, mn, mx, at, inv) in enumerate([("Dash Vel",10,50,"dash_speed",0), ("Jump Pow",10,25,"jump_power",1), ("PBomb Spd",10,60,"powerbomb_speed",0), ("Cam Offset",-400,100,"cam_v_offset",0)]):
-                                y = cy+i*45; set_surf.blit(font_s.render(l, True, (150,150,150)), (20, y)); sl = pygame.Rect(80, y+5, sidebar_w-120, 8); pygame.draw.rect(set_surf, (60,60,70), sl); v = getattr(player, at); n = (v-mn)/(mx-mn) if not inv else (-v-mn)/(mx-mn); pygame.draw.circle(set_surf, (59,130,246), (int(80+n*(sidebar_w-120)), y+9), 8)
-                                if pygame.mouse.get_pressed()[0] and pygame.Rect(play_w+80, y, sidebar_w-120, 20).inflate(0,10).collidepoint(m_pos): setattr(player, at, mn+(m_pos[0]-(play_w+80))/(sidebar_w-120)*(mx-mn) if not inv else -(mn+(m_pos[0]-(play_w+80))/(sidebar_w-120)*(mx-mn))); player.save_settings()
-                            cy += 185
-                        elif cat == "JUICE & VFX":
-                            for i, (l, at) in enumerate([("Enable Shake", "shake_enabled"), ("Enable Ghost", "vfx_enabled")]):
-                                y = cy+i*40; set_surf.blit(font_s.render(l, True, (150,150,150)), (20, y)); btn = pygame.Rect(sidebar_w-60, y-5, 40, 20); val = getattr(player, at); pygame.draw.rect(set_surf, (22, 163, 74) if val else (220, 38, 38), btn, border_radius=10); pygame.draw.circle(set_surf, (255,255,255), (btn.x+30 if val else btn.x+10, btn.y+10), 8)
-                                if pygame.mouse.get_pressed()[0] and pygame.Rect(play_w+btn.x, y-5, btn.w, btn.h).collidepoint(m_pos):
-                                    if not hasattr(player, "_btn_lock"): setattr(player, at, not val); player._btn_lock = 10; player.save_settings()
-                            if hasattr(player, "_btn_lock"): 
-                                player._btn_lock -= 1
-                                if player._btn_lock <= 0: delattr(player, "_btn_lock")
-                            cy += 90
-                        elif cat == "LAYERS" and player.sources:
-                            src = player.sources[min(player.cur_source_idx, len(player.sources)-1)]
-                            for l_name in src.layers:
-                                ly = cy; is_vis = l_name in src.visible_layers; l_rect = pygame.Rect(15, ly-2, sidebar_w-30, 24); hvr = pygame.Rect(play_w+15, ly-2, sidebar_w-30, 24).collidepoint(m_pos)
-                                if hvr: pygame.draw.rect(set_surf, (60,60,70), l_rect, border_radius=4)
-                                pygame.draw.rect(set_surf, (22, 163, 74) if is_vis else (60, 60, 70), (20, ly+2, 16, 16), border_radius=3); set_surf.blit(font_s.render(l_name[:30], True, (255,255,255) if is_vis else (150,150,150)), (45, ly+2))
-                                if pygame.mouse.get_pressed()[0] and hvr and not hasattr(player, "_btn_lock"):
-                                    if is_vis: src.visible_layers.remove(l_name)
-                                    else: src.visible_layers.add(l_name)
-                                    src.export_and_load(); player.auto_map_profile(cur_p); player._btn_lock = 15
-                                cy += 28
-                            cy += 10
-                        elif cat == "BG IMAGE":
-                            bg_btn = pygame.Rect(20, cy, 150, 30); pygame.draw.rect(set_surf, (100,100,110), bg_btn, border_radius=5); set_surf.blit(font_b.render("LOAD BG IMG", True, (255,255,255)), (bg_btn.x+25, bg_btn.y+5))
-                            if pygame.mouse.get_pressed()[0] and pygame.Rect(play_w+20, cy, 150, 30).collidepoint(m_pos):
-                                p = select_file([("Image", "*.png *.jpg *.bmp")]); 
-                                if p: player.bg_img = pygame.image.load(p).convert_alpha(); player.bg_path = p; player.save_settings()
-                            cy += 40
-                            for i, (l, mn, mx, at) in enumerate([("BG-X",-2000,2000,"bg_off_x"), ("BG-Y",-2000,2000,"bg_off_y"), ("Scale",0.1,10,"bg_zoom"), ("Alpha",0,255,"bg_alpha"), ("Parallax",0,1,"bg_parallax")]):
-                                y = cy+i*40; set_surf.blit(font_s.render(l, True, (150,150,150)), (20, y)); sl = pygame.Rect(80, y+5, sidebar_w-120, 8); pygame.draw.rect(set_surf, (60,60,70), sl); v = getattr(player, at); n = (v-mn)/(mx-mn); pygame.draw.circle(set_surf, (220,38,38), (int(80+n*(sidebar_w-120)), y+9), 8)
-                                if pygame.mouse.get_pressed()[0] and pygame.Rect(play_w+80, y, sidebar_w-120, 20).inflate(0,10).collidepoint(m_pos): setattr(player, at, mn+(m_pos[0]-(play_w+80))/(sidebar_w-120)*(mx-mn)); player.save_settings()
-                            cy += 210
-                        else: cy += 10
-                screen.blit(set_surf, (play_w, 0)); pygame.draw.line(screen, (59, 130, 246), (play_w, 0), (play_w, sh), 2)
-            else:
-                slot_clip = pygame.Surface((sidebar_w-20, 380), pygame.SRCALPHA)
-                for i, a in enumerate(cur_p.mappings.keys()):
-                    r = pygame.Rect(10, i*38+slot_scroll, sidebar_w-40, 34); is_sel = selected_slot == a; pygame.draw.rect(slot_clip, (59,130,246) if is_sel else (45,45,50), r, border_radius=5); slot_clip.blit(font_b.render(a, True, (255,255,255)), (r.x+10, r.y+3))
-                    ms = ", ".join([f"{m[1]}" for m in cur_p.mappings[a]]); slot_clip.blit(font_s.render(f"-> {ms[:45]}", True, (200,200,200) if not is_sel else (255,255,255)), (r.x+10, r.y+18))
-                screen.blit(slot_clip, (play_w+10, 85))
-                if player.sources:
-                    pygame.draw.rect(screen, (20,20,25), (play_w+15, 475, sidebar_w-30, sh-490), border_radius=5); src = player.sources[min(player.cur_source_idx, len(player.sources)-1)]; screen.blit(font_b.render(f"TAGS FROM: {src.name[:20]}", True, (100,100,100)), (play_w+20, 455)); cs = pygame.Surface((sidebar_w-40, sh-495), pygame.SRCALPHA)
-                    for idx, t in enumerate(src.tag_list):
-                        tr = pygame.Rect(0, idx*25+tag_scroll, sidebar_w-40, 22); is_m = selected_slot and [player.cur_source_idx, t] in cur_p.mappings[selected_slot]; h = tr.move(play_w+20, 475).collidepoint(m_pos); pygame.draw.rect(cs, (59,130,246) if is_m else ((70,70,80) if h else (40,40,45)), tr, border_radius=3); cs.blit(font_s.render(t, True, (255,255,255)), (tr.x+10, tr.y+4))
-                    screen.blit(cs, (play_w+20, 475))
-            for i in range(2): pygame.draw.rect(screen, (59,130,246) if i < player.dash_charges else (60,60,70), (play_w - 80 + i*35, sh - 100, 30, 10), border_radius=3)
-            pygame.draw.rect(screen, (30, 30, 35), (0, sh-40, play_w, 40)); ctrl = [("Z", "Atk"), ("X", "Dash"), ("C/B/N", "Skill"), ("T", "Swap"), ("P", "Pause" if not player.is_paused else "Play"), ("O", "Step"), ("[ ]", f"Spd:{player.playback_speed:.1f}"), ("F5", "Refresh"), ("H", "Hitbox"), ("R-Drag", "Cam"), ("F", "Reset")]
-            tx = 20
-            for k, d in ctrl:
-                pygame.draw.rect(screen, (45,45,50), (tx-5, sh-32, font_h.size(k)[0]+font_h.size(d)[0]+25, 24), border_radius=4); screen.blit(font_h.render(k, True, (59,130,246)), (tx, sh-27)); screen.blit(font_h.render(f": {d}", True, (255,255,255)), (tx+font_h.size(k)[0], sh-27)); tx += font_h.size(k)[0]+font_h.size(d)[0]+35
-        pygame.display.flip()
+        if ui.timeline_drag and ui.timeline: ui.seek_timeline(player, m_pos[0])
+        ui.hold_scrub(player, pygame.key.get_pressed(), dt)
+        if is_dragging_cam: dx, dy = m_pos[0] - last_m_pos[0], m_pos[1] - last_m_pos[1]; player.cam_x -= dx / player.view_scale; player.cam_y -= dy / player.view_scale; last_m_pos = m_pos
+        profiler.end(); profiler.begin("ui.sidebar"); ui.draw_sidebar(screen, player, play_w, sidebar_w, sh, m_pos); profiler.end()
+        profiler.begin("ui.present"); ui.present(play_rect); profiler.end()
 
 if __name__ == "__main__": main()
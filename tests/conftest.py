@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+
+# Headless (SDL dummy driver); ase_viewer reads config.json/ase_settings.json from the cwd and resets its log on import,
+# so the session runs from a temp folder and the viewer is imported only after the chdir
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_FILE = os.path.join(REPO_DIR, "Testfiles", "Test01.aseprite")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy"); os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, REPO_DIR)
+
+@pytest.fixture(scope="session")
+def pygame(tmp_path_factory):
+    work = tmp_path_factory.mktemp("work"); os.environ["ASE_DEBUG_LOG"] = str(work / "ase_debug.log"); os.chdir(work)
+    import pygame
+    pygame.init(); pygame.display.set_mode((1350, 850))
+    yield pygame
+    pygame.quit()
+
+@pytest.fixture(scope="session")
+def viewer(pygame):
+    import ase_viewer
+    return ase_viewer
+
+@pytest.fixture(scope="session")
+def bench(viewer):
+    import ase_bench
+    return ase_bench
@@ -0,0 +1,63 @@
+import json
+import random
+import hashlib
+import pytest
+
+# Digests of scripted runs recorded on the version that matched tags by name every tick (before ActionTable); the table-driven
+# animation must reproduce them exactly
+STRING_MAPPING_TRACE = "c07ff7b6e3af191f8ec6d79c5bfa4664eba5e8be"
+STRING_MAPPING_CROWD = "7f101145c8dcdc603656f54b9bdc57fe6cfaab1d"
+TAGS = [("Idle", 4), ("Walk", 6), ("Jump", 2), ("Fall", 2), ("Attack1", 3), ("Attack2", 4), ("ComboAttack_1", 3), ("ComboAttack_2", 3), ("ComboAttack_3", 3), ("ComboAttack_4", 5), ("JumpAttack", 3),
+        ("PowerBomb (ready)", 2), ("PowerBomb (loop)", 3), ("PowerBomb (end)", 2), ("DASH", 3), ("Skill 1 (ready)", 2), ("Skill 1 (loop)", 3), ("Skill 1 (end)", 2), ("SKILL 2", 4), ("Skill 3 (loop)", 2),
+        ("Hurt", 2), ("Swap_Enter", 3), ("Swap_Exit", 3)]
+
+class Keys(dict):
+    def __getitem__(self, k): return self.get(k, False)
+
+def bundle(pygame, seed):
+    rng = random.Random(seed); frames = []; tags = {}
+    for name, n in TAGS:
+        tags[name] = (len(frames), len(frames) + n - 1)
+        for _ in range(n):
+            surf = pygame.Surface((40, 60), pygame.SRCALPHA); surf.fill((rng.randint(0, 255), 100, 100, 255)); frames.append({'img': surf, 'ox': -20, 'oy': -60, 'duration': rng.choice([50, 80, 100, 140])})
+    slices = {"hurtbox": [{'frame': 0, 'bounds': {'x': 44, 'y': 4, 'w': 40, 'h': 60}}], "hitbox": [{'frame': 3, 'bounds': {'x': 64, 'y': 30, 'w': 40, 'h': 20}}]}
+    return {'frames': frames, 'tags': tags, 'slices': slices, 'tag_list': sorted(tags), 'orig_w': 128, 'orig_h': 128, 'layer_cels': None}
+
+def test_scripted_run_matches_string_mapping_version(pygame, viewer):
+    # Combos with buffering, skill ready/loop/end chains, a cross-source chain, swaps, pause/step and 3 NPCs over 6000 ticks
+    random.seed(5); p = viewer.AsepritePlayer(); p.lod_enabled = False
+    for i in range(4): p.sources.append(viewer.AseSource(f"s{i}.aseprite", i, data=bundle(pygame, i), atlas=p.atlas))
+    p.add_profile("PLAYER", 0); p.profiles[0].mappings["SKILL 2"].append([1, "Walk"])
+    for i in range(1, 4): p.add_profile(f"NPC_{i}", i, is_npc=True)
+    p.profiles[1].mappings["ComboAttack_2"] += [[1, "Jump"], [2, "Fall"]]
+    for pr in p.profiles: pr.rev += 1
+    S = viewer.SLOT_NAMES.index; rng = random.Random(9); trace = []
+    for tick in range(6000):
+        keys = Keys(); keys[pygame.K_RIGHT if (tick // 150) % 2 == 0 else pygame.K_LEFT] = rng.random() < 0.7; r = rng.random()
+        if r < 0.03: p.handle_attack(keys)
+        elif r < 0.035: p.trigger_action(S("DASH"))
+        elif r < 0.04: p.trigger_action(S(rng.choice(["SKILL 1", "SKILL 2", "SKILL 3", "HURT"])))
+        elif r < 0.042: p.trigger_action(S("Swap_Exit"))
+        elif r < 0.06 and p.jumps_left > 0: p.vy = p.jump_power; p.grounded = False; p.jumps_left -= 1
+        elif r < 0.065: keys[pygame.K_DOWN] = True; p.handle_attack(keys)
+        if tick == 3000: p.is_paused = True
+        if tick == 3100: p.is_paused = False
+        if tick in (3050, 3051): p.step_forward = True
+        p.sim_accum = 0; p.advance(keys, 500, viewer.SIM_DT)
+        row = [round(p.x, 3), round(p.y, 3), p.frame_idx, p.current_source(), p.visible, p.combo_step, p.attack_buffer]
+        for a in p.ai_list: row += [round(a.x, 3), round(a.y, 3), a.frame_idx, a.visible, a.decision]
+        trace.append(row)
+    p.reloader.stop()
+    assert hashlib.sha1(json.dumps(trace).encode()).hexdigest() == STRING_MAPPING_TRACE
+
+def test_crowd_run_matches_string_mapping_version(pygame, viewer, bench, monkeypatch):
+    # 300 crowd agents with a chained DASH and an extra combo entry; the crowd's NumPy RNG is pinned
+    if viewer.np is None: pytest.skip("crowds need NumPy")
+    rng_factory = viewer.np.random.default_rng; monkeypatch.setattr(viewer.np.random, "default_rng", lambda *a: rng_factory(7))
+    random.seed(0); p = bench.build_player(viewer, pygame, dict(bench.DEFAULTS, crowd=300))
+    p.profiles[-1].mappings["DASH"] = [[0, "DASH"], [0, "IDLE"]]; p.profiles[-1].mappings["ComboAttack_3"].append([0, "Swap_Exit"]); p.profiles[-1].rev += 1
+    c = p.crowds[0]; out = []
+    for _ in range(1500):
+        p.sim_accum = 0; p.advance(bench.BenchKeys(), 500, viewer.SIM_DT); out.append([c.frame_idx.tolist(), viewer.np.round(c.x, 3).tolist(), c.visible.tolist()])
+    p.reloader.stop()
+    assert hashlib.sha1(json.dumps(out).encode()).hexdigest() == STRING_MAPPING_CROWD
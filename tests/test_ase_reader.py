@@ -0,0 +1,31 @@
+import os
+import pytest
+from conftest import TEST_FILE
+
+# Testfiles/Test01.aseprite: one layer, 18 frames of 100ms on a 600x600 canvas, three tags
+EXPECTED_TAGS = {"Idle": (0, 7), "move": (8, 12), "jump": (13, 17)}
+
+def check_bundle(data):
+    assert len(data['frames']) == 18
+    assert (data['orig_w'], data['orig_h']) == (600, 600)
+    assert data['tags'] == EXPECTED_TAGS and data['tag_list'] == sorted(EXPECTED_TAGS)
+    assert all(f['duration'] == 100 for f in data['frames'])
+    assert (data['frames'][0]['ox'], data['frames'][0]['oy']) == (-25, -72)
+
+def test_ase_reader_parses_test01():
+    import ase_reader
+    doc = ase_reader.AseFile(TEST_FILE)
+    assert (doc.width, doc.height) == (600, 600) and len(doc.frames) == 18
+    assert {name: (t['from'], t['to']) for name, t in doc.tags.items()} == EXPECTED_TAGS
+    assert doc.layer_names() == ["Layer 1"]
+
+def test_native_decode(viewer):
+    src = viewer.AseSource(TEST_FILE, 0, defer=True); layers, visible = src.read_layers()
+    check_bundle(src.decode_native(visible))
+
+def test_cli_decode(viewer):
+    # Needs a real Aseprite install: $ASEPRITE or the path the viewer found/configured
+    exe = os.environ.get("ASEPRITE") or viewer.ase_manager.path
+    if not exe or not os.path.exists(exe): pytest.skip("Aseprite executable not available (set ASEPRITE)")
+    viewer.ase_manager.path = exe; src = viewer.AseSource(TEST_FILE, 0, defer=True); layers, visible = src.read_layers()
+    check_bundle(src.decode_cli(visible, layers))
@@ -0,0 +1,47 @@
+import re
+import random
+
+def reference_map(source, profile):
+    # The auto-map before the per-source tag index: every slot rescans every tag (kept here as the oracle)
+    suffix = re.compile(r"(_|\s)?\(?(ready|loop|end)\)?", re.IGNORECASE); out = {}
+    for slot in profile.mappings.keys():
+        base_slot = slot.lower().replace("ComboAttack_", "attack").replace(" ", "").replace("_", "")
+        matches = []
+        for t in source.tag_list:
+            clean_t = suffix.sub("", t).lower().replace(" ", "").replace("_", "")
+            if clean_t == base_slot or (base_slot == "walk" and clean_t == "move"): matches.append([profile.source_idx, t])
+        def sort_key(item): tl = item[1].lower(); return 0 if "ready" in tl else (2 if "end" in tl else 1)
+        out[slot] = sorted(matches, key=sort_key)
+    return out
+
+def random_tags(rng, slots, n):
+    base = slots + ["Move", "walk", "Attack1", "idle"] + [f"misc{i}" for i in range(n)]; out = []
+    for _ in range(n):
+        b = rng.choice(base); b = rng.choice([b, b.upper(), b.replace("_", " ")]); out.append(b + rng.choice(["", " (ready)", "_loop", "(end)", " End", "_Ready", ""]))
+    return sorted(set(out))
+
+def source_with(pygame, viewer, tags):
+    frame = {'img': pygame.Surface((1, 1), pygame.SRCALPHA), 'ox': 0, 'oy': 0, 'duration': 100}
+    return viewer.AseSource("x.aseprite", 0, data={'frames': [frame], 'tags': {t: (0, 0) for t in tags}, 'slices': {}, 'tag_list': tags, 'orig_w': 1, 'orig_h': 1, 'layer_cels': None})
+
+def test_fresh_auto_map_matches_reference(pygame, viewer):
+    rng = random.Random(3); slots = list(viewer.AseProfile("", 0).mappings); player = viewer.AsepritePlayer()
+    for _ in range(200):
+        src = source_with(pygame, viewer, random_tags(rng, slots, rng.randint(0, 80))); player.sources[:] = [src]
+        profile = viewer.AseProfile("P", 0); player.auto_map_profile(profile)
+        assert profile.mappings == reference_map(src, profile)
+    player.reloader.stop()
+
+def test_incremental_remap_keeps_manual_edits(pygame, viewer):
+    player = viewer.AsepritePlayer(); tags = ["Idle", "Walk_loop", "Walk (ready)", "ComboAttack_1", "DASH"]; src = source_with(pygame, viewer, tags); player.sources[:] = [src]
+    profile = viewer.AseProfile("P", 0); player.profiles.append(profile); player.auto_map_profile(profile)
+    profile.mappings["IDLE"] = []; profile.mappings["DASH"].append([0, "Idle"]) # Manual edits
+    src.tag_list = tags + ["Walk (end)", "Dash_end"]; src.build_tag_index()
+    assert player.auto_map_profile(profile) == 2
+    assert profile.mappings["IDLE"] == [] # Untouched slot: its candidates did not change
+    assert profile.mappings["WALK"] == [[0, "Walk (ready)"], [0, "Walk_loop"], [0, "Walk (end)"]] # Unedited: takes the new auto result
+    assert profile.mappings["DASH"] == [[0, "DASH"], [0, "Idle"], [0, "Dash_end"]] # Edited: keeps the manual entry, gains the new tag
+    src.tag_list = ["Idle", "Walk_loop", "Dash_end"]; src.build_tag_index()
+    assert player.auto_map_profile(profile) == 3
+    assert profile.mappings["WALK"] == [[0, "Walk_loop"]] and profile.mappings["DASH"] == [[0, "Idle"], [0, "Dash_end"]] and profile.mappings["ComboAttack_1"] == []
+    player.reloader.stop()
@@ -0,0 +1,29 @@
+import random
+import pytest
+
+def noise(pg, w, h, seed=1):
+    rng = random.Random(seed); img = pg.Surface((w, h), pg.SRCALPHA)
+    for y in range(0, h, 4):
+        for x in range(0, w, 4): img.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256), 255), (x, y, 4, 4))
+    return img
+
+def render(pg, layer, cam, zoom, size=(320, 240)):
+    screen = pg.Surface(size, pg.SRCALPHA); layer.draw(screen, size[0] // 2, size[1] // 2, cam[0], cam[1], zoom, *size)
+    return pg.image.tobytes(screen, "RGBA")
+
+@pytest.mark.parametrize("tile", [(True, True), (True, False), (False, True)])
+def test_big_tile_window_matches_whole_tile(pygame, viewer, tile):
+    # Integer scale (s = 2): the windowed cache must give the same pixels as scaling the whole tile, across seams and camera moves
+    img = noise(pygame, 200, 160)
+    whole = viewer.BgLayer(img=img, zoom=1.0, parallax=1.0, tile_x=tile[0], tile_y=tile[1]); whole.TILE_CACHE_VIEWS = 10 ** 9
+    window = viewer.BgLayer(img=img, zoom=1.0, parallax=1.0, tile_x=tile[0], tile_y=tile[1]); window.TILE_CACHE_VIEWS = 0
+    for cam in [(0, 0), (37, -12), (95, 61), (-140, 83), (400, -333), (401, -333)]:
+        assert render(pygame, window, cam, 4.0) == render(pygame, whole, cam, 4.0)
+        assert window.cache.get_width() <= 2 * 320 + 2 and window.cache.get_height() <= 2 * 240 + 2
+    assert window.builds < 6 # Small pans reuse the cached window
+
+def test_high_zoom_tile_cache_is_view_sized(pygame, viewer):
+    # A 2000px tile at zoom 20 would be 20000x20000 scaled; only a window around the view is cached
+    layer = viewer.BgLayer(img=noise(pygame, 2000, 2000), zoom=1.0, tile_x=True, tile_y=True)
+    render(pygame, layer, (0, 0), 20.0)
+    assert layer.cache.get_width() * layer.cache.get_height() <= (2 * 320 + 2) * (2 * 240 + 2)
@@ -0,0 +1,17 @@
+import os
+import shutil
+from conftest import TEST_FILE
+
+def test_decode_hashes_and_parses_one_buffer(viewer, tmp_path, monkeypatch):
+    # A save between hashing and parsing must not cache new content under the old digest: both use the bytes read once
+    monkeypatch.setattr(viewer.ase_manager, "path", None); monkeypatch.setattr(viewer.ase_manager, "get_path", lambda: None)
+    path = tmp_path / "t.aseprite"; shutil.copy(TEST_FILE, path); good = path.read_bytes()
+    cache = viewer.ase_cache.DecodeCache(str(tmp_path / "cache")); src = viewer.AseSource(str(path), 0, cache=cache, defer=True)
+    buf = src.read_source(); layers, visible = src.read_layers(buf)
+    path.write_bytes(good[:len(good) // 2]) # "saved" after the read
+    data = src.decode(visible, layers, buf); assert data is not None and len(data['frames']) == 18
+    key = cache.key(cache.digest(good), visible); assert os.path.exists(cache.path(key))
+    assert cache.digest(good) == cache.file_digest(TEST_FILE)
+    assert src.decode(visible, layers) is None # The truncated file on disk fails and is not cached
+    assert [f for _, _, files in os.walk(cache.root) for f in files] == [os.path.basename(cache.path(key))]
+    path.write_bytes(good); hits = cache.hits; assert len(src.decode(visible, layers)['frames']) == 18 and cache.hits == hits + 1
@@ -0,0 +1,38 @@
+import pytest
+
+def needs_numpy(viewer):
+    if viewer.np is None: pytest.skip("separable blend modes need NumPy")
+
+def solid(pg, color, size=(4, 4)):
+    img = pg.Surface(size, pg.SRCALPHA); img.fill(color); return img
+
+def pixel(viewer, cels, layers=("base", "top")):
+    out = viewer.composite_cels(cels, set(layers), 8, 8)
+    return tuple(out['img'].get_at((0, 0)))
+
+@pytest.mark.parametrize("mode, expected", [(1, (100, 50, 0)), (2, (228, 178, 255)), (10, (72, 28, 255)), (16, (255, 228, 255)), (17, (72, 0, 0))])
+def test_separable_blend_modes(pygame, viewer, mode, expected):
+    # Opaque backdrop (200, 100, 0) under an opaque (128, 128, 255) layer: the result is B(backdrop, source) straight
+    needs_numpy(viewer)
+    base = solid(pygame, (200, 100, 0, 255)); top = solid(pygame, (128, 128, 255, 255))
+    r, g, b, a = pixel(viewer, [("base", base, 0, 0, 255, 0), ("top", top, 0, 0, 255, mode)])
+    assert a == 255 and max(abs(r - expected[0]), abs(g - expected[1]), abs(b - expected[2])) <= 1
+
+def test_blend_over_transparent_and_opacity(pygame, viewer):
+    # No backdrop: a blended layer draws like Normal; at half opacity Multiply mixes halfway between backdrop and product
+    needs_numpy(viewer)
+    top = solid(pygame, (128, 128, 255, 255))
+    assert pixel(viewer, [("top", top, 0, 0, 255, 1)], ("top",)) == (128, 128, 255, 255)
+    base = solid(pygame, (200, 100, 0, 255))
+    r, g, b, a = pixel(viewer, [("base", base, 0, 0, 255, 0), ("top", top, 0, 0, 128, 1)])
+    assert a == 255 and abs(r - 150) <= 1 and abs(g - 75) <= 1 and b == 0
+
+def test_hidden_blend_layer_is_skipped(pygame, viewer):
+    base = solid(pygame, (200, 100, 0, 255)); top = solid(pygame, (128, 128, 255, 255))
+    assert pixel(viewer, [("base", base, 0, 0, 255, 0), ("top", top, 0, 0, 255, 1)], ("base",)) == (200, 100, 0, 255)
+
+def test_non_separable_mode_needs_cli(pygame, viewer):
+    # Hue/Saturation/Color/Luminosity raise so decode() falls back to the CLI export
+    base = solid(pygame, (200, 100, 0, 255)); top = solid(pygame, (128, 128, 255, 255))
+    assert not viewer.blend_supported(12)
+    with pytest.raises(ValueError): pixel(viewer, [("base", base, 0, 0, 255, 0), ("top", top, 0, 0, 255, 12)])
@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from conftest import REPO_DIR
+
+def test_convert_keeps_log_out_of_the_output(tmp_path):
+    out = tmp_path / "out"; log = tmp_path / "convert.log"
+    res = subprocess.run([sys.executable, os.path.join(REPO_DIR, "ase_convert.py"), os.path.join(REPO_DIR, "Testfiles"), "--out", str(out), "--log", str(log)], cwd=tmp_path, capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    assert sorted(os.listdir(out)) == ["Test01.json", "Test01.png", "ase_convert_manifest.json"]
+    assert "Test01.aseprite" in log.read_text() and not any(n.startswith("temp_") for n in os.listdir(tmp_path))
+    assert len(json.loads((out / "Test01.json").read_text())["frames"]) == 18
+
+def test_concurrent_cli_exports_use_their_own_files(pygame, viewer, tmp_path, monkeypatch):
+    # Stand-in for Aseprite: writes a 1-frame sheet whose color identifies the source, after a pause so both exports overlap
+    seen = []; lock = threading.Lock()
+    def fake_run(cmd, **kw):
+        png, data = cmd[cmd.index("--sheet") + 1], cmd[cmd.index("--data") + 1]; color = 10 if cmd[cmd.index("--trim") - 1].endswith("a.aseprite") else 20
+        with lock: seen.append(png)
+        time.sleep(0.05); img = pygame.Surface((2, 2), pygame.SRCALPHA); img.fill((color, 0, 0, 255)); pygame.image.save(img, png)
+        with open(data, "w") as f: json.dump({"frames": [{"frame": {"x": 0, "y": 0, "w": 2, "h": 2}, "spriteSourceSize": {"x": 0, "y": 0}, "sourceSize": {"w": 2, "h": 2}, "duration": 100}], "meta": {}}, f)
+    monkeypatch.setattr(viewer.subprocess, "run", fake_run); monkeypatch.setattr(viewer.ase_manager, "path", "aseprite")
+    paths = [tmp_path / "a.aseprite", tmp_path / "b.aseprite"]; [p.write_bytes(b"") for p in paths]
+    srcs = [viewer.AseSource(str(p), 0, defer=True) for p in paths]; out = {}
+    threads = [threading.Thread(target=lambda s=s: out.__setitem__(s.file_path, s.decode_cli({"L"}, ["L"]))) for s in srcs]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(set(seen)) == 2 and not any(os.path.exists(os.path.dirname(p)) for p in seen)
+    assert [out[str(p)]['frames'][0]['img'].get_at((0, 0))[0] for p in paths] == [10, 20]
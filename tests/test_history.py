@@ -0,0 +1,32 @@
+import random
+
+def build(pygame, viewer, bench, npcs=6):
+    random.seed(3); return bench.build_player(viewer, pygame, dict(bench.DEFAULTS, npcs=npcs, spread=3000))
+
+def run(viewer, bench, player, ticks):
+    for t in range(ticks): player.advance(bench.BenchKeys(), 500, viewer.SIM_DT)
+
+def snapshot(ai): return tuple(getattr(ai, k) for k in ("x", "y", "vx", "vy", "frame_idx", "decision"))
+
+def test_history_is_off_by_default(pygame, viewer, bench):
+    player = build(pygame, viewer, bench); run(viewer, bench, player, 30)
+    assert not player.history_enabled and player.history.span() == (0, 0)
+    player.history_enabled = True; run(viewer, bench, player, 30); assert player.history.span() == (0, 30)
+    player.history_enabled = False; run(viewer, bench, player, 1); assert not player.history.groups
+    player.reloader.stop()
+
+def test_restore_after_npc_removed_keeps_records_on_their_npc(pygame, viewer, bench):
+    # Removing an NPC shifts later list positions: records are matched by uid, so every survivor gets its own past state back
+    player = build(pygame, viewer, bench); player.history_enabled = True
+    run(viewer, bench, player, 40); tick = player.history.end - 1; past = {ai.uid: snapshot(ai) for ai in player.ai_list}
+    run(viewer, bench, player, 40); del player.ai_list[1]; run(viewer, bench, player, 5)
+    player.history.seek(tick)
+    assert player.ai_list and all(snapshot(ai) == past[ai.uid] for ai in player.ai_list)
+    player.history.live(); player.reloader.stop()
+
+def test_history_round_trip_is_exact(pygame, viewer, bench):
+    player = build(pygame, viewer, bench); player.history_enabled = True; states = []
+    for _ in range(150): run(viewer, bench, player, 1); states.append([snapshot(ai) for ai in player.ai_list] + [(player.x, player.y, player.frame_idx)])
+    for tick in (0, 1, 119, 120, 149):
+        player.history.seek(tick); assert [snapshot(ai) for ai in player.ai_list] + [(player.x, player.y, player.frame_idx)] == states[tick]
+    player.history.live(); player.reloader.stop()
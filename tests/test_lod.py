@@ -0,0 +1,47 @@
+import json
+import random
+import hashlib
+import pytest
+
+def build(pygame, viewer, bench, npcs=1, lod=True):
+    random.seed(0); player = bench.build_player(viewer, pygame, dict(bench.DEFAULTS, npcs=npcs, lod=lod)); player.sync_tables()
+    return player
+
+def state(ai): return (ai.x, ai.y, ai.vx, ai.vy)
+
+@pytest.mark.parametrize("steps", [2, 8, 30])
+@pytest.mark.parametrize("start", [{"vx": 8.0}, {"vx": -6.0, "vy": -12.0, "y": 0.0, "grounded": False}])
+def test_coarse_update_moves_like_full_rate(pygame, viewer, bench, steps, start):
+    # One update(steps=n) must land where n single steps do: a coasting NPC decelerates (geometric sum), an airborne one accelerates
+    player = build(pygame, viewer, bench); ais = []
+    for _ in range(2):
+        ai = viewer.AseAI(player, player.profiles[1]); ai.x = 5000.0; ai.y = 500.0; ai.decision = "IDLE"; ai.ai_timer = 10 ** 6
+        for k, v in start.items(): setattr(ai, k, v)
+        ais.append(ai)
+    for _ in range(steps): ais[0].update(500, viewer.SIM_DT)
+    ais[1].update(500, viewer.SIM_DT, steps)
+    assert state(ais[1]) == pytest.approx(state(ais[0]), abs=1e-9)
+    player.reloader.stop()
+
+def test_npc_leaving_far_tier_matches_full_rate(pygame, viewer, bench):
+    # An NPC walking in from far away is updated coarsely while FAR; from the step it leaves FAR its position and frame match full rate
+    def run(lod):
+        player = build(pygame, viewer, bench, lod=lod); ai = player.ai_list[0]; ai.x = ai.prev_x = 4000; ai.decision = "WALK_L"; ai.ai_timer = 10 ** 6; player.cam_x = 400; out = []
+        for _ in range(1000): player.update_ai(500, viewer.SIM_DT); out.append((round(ai.x, 6), ai.frame_idx, ai.lod_tier))
+        player.reloader.stop(); return out
+    full, lod = run(False), run(True)
+    tiers = [t for _, _, t in lod]; assert tiers[0] == viewer.AI_FAR and tiers[-1] != viewer.AI_FAR
+    assert all(a[:2] == b[:2] for a, b in zip(full, lod) if b[2] != viewer.AI_FAR)
+
+# Digest of a scripted 6000-tick run (8 NPCs, attacks every 50 ticks) recorded on the version before NPC LOD existed
+PRE_LOD_TRACE = "56d62204cd8663a0742323a2490f454115a405ef"
+
+def test_lod_off_trace_matches_pre_lod_version(pygame, viewer, bench):
+    player = build(pygame, viewer, bench, npcs=8, lod=False); random.seed(1); h = hashlib.sha1()
+    for t in range(6000):
+        keys = bench.scripted_input(viewer, pygame, player, t, dict(bench.DEFAULTS))
+        if t % 50 == 0: keys[pygame.K_z] = True
+        player.update(keys, 500, viewer.SIM_DT); player.hits.collect()
+        h.update(json.dumps([[round(a.x, 6), round(a.y, 6), a.frame_idx, a.action_slot, a.decision, a.visible] for a in player.ai_list] + [round(player.x, 6), round(player.y, 6), player.frame_idx]).encode())
+    player.reloader.stop()
+    assert all(ai.lod_tier == viewer.AI_NEAR for ai in player.ai_list) and h.hexdigest() == PRE_LOD_TRACE
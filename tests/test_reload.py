@@ -0,0 +1,42 @@
+import time
+import shutil
+from conftest import TEST_FILE
+
+def pump(viewer, bench, player, done, timeout=10.0):
+    # Main-loop stand-in: advance() polls the reloader and remaps profiles, exactly as between frames
+    end = time.time() + timeout
+    while time.time() < end:
+        player.advance(bench.BenchKeys(), 500, 0)
+        if done(): return True
+        time.sleep(0.01)
+    return False
+
+def test_failed_reload_keeps_last_good_source(viewer, bench, tmp_path, monkeypatch):
+    # A file read mid-save fails both decoders: frames, tags and the hand-edited chain must survive it and the next good reload
+    monkeypatch.setattr(viewer.ase_manager, "path", None); monkeypatch.setattr(viewer.ase_manager, "get_path", lambda: None) # No CLI fallback, no picker dialog
+    path = tmp_path / "t.aseprite"; shutil.copy(TEST_FILE, path); good = path.read_bytes()
+    player = viewer.AsepritePlayer(); sid = player.add_source(str(path)); src = player.sources[sid]
+    assert pump(viewer, bench, player, lambda: src.loaded)
+    player.add_profile("PLAYER", sid); profile = player.profiles[0]
+    profile.mappings["IDLE"] = [(sid, "Idle"), (sid, "jump")]; profile.rev += 1; chain = list(profile.mappings["IDLE"])
+    path.write_bytes(good[:len(good) // 2]); assert src.decode(src.visible_layers) is None
+    version = src.version; player.reloader.request(src); assert pump(viewer, bench, player, lambda: player.reloader.progress() is None)
+    assert src.version == version and len(src.frames) == 18 and set(src.tags) == {"Idle", "move", "jump"}
+    assert profile.mappings["IDLE"] == chain
+    path.write_bytes(good); player.reloader.request(src); assert pump(viewer, bench, player, lambda: src.version > version)
+    assert len(src.frames) == 18 and profile.mappings["IDLE"] == chain
+    player.reloader.stop()
+
+def test_first_load_failure_gets_placeholder(viewer, tmp_path, monkeypatch):
+    monkeypatch.setattr(viewer.ase_manager, "path", None); monkeypatch.setattr(viewer.ase_manager, "get_path", lambda: None)
+    path = tmp_path / "bad.aseprite"; path.write_bytes(open(TEST_FILE, "rb").read()[:100])
+    src = viewer.AseSource(str(path), 0)
+    assert src.loaded and len(src.frames) == 1 and not src.tags
+
+def test_frames_are_hashed_on_the_decode_side(viewer, monkeypatch):
+    # decode() (worker) returns a finished FrameTable; apply() (main thread) must not hash frames again
+    src = viewer.AseSource(TEST_FILE, 0, defer=True); layers, visible = src.read_layers(); data = src.decode(visible, layers)
+    assert isinstance(data['frames'], viewer.FrameTable) and len(data['frames']) == 18
+    calls = []; blake2b = viewer.hashlib.blake2b
+    monkeypatch.setattr(viewer.hashlib, "blake2b", lambda *a, **kw: calls.append(1) or blake2b(*a, **kw))
+    src.apply(data); assert not calls and src.frames is data['frames'] and src.loaded
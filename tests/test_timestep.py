@@ -0,0 +1,10 @@
+def run(viewer, bench, player, frames, frame_dt):
+    return sum(player.advance(bench.BenchKeys(), 500, frame_dt) for _ in range(frames))
+
+def test_time_scale_scales_simulation_steps(viewer, bench):
+    # One render frame per SIM_DT: x1 runs one step per frame, x0.5 every other frame, x2 two per frame
+    player = viewer.AsepritePlayer()
+    for scale, expected in ((1.0, 60), (0.5, 30), (2.0, 120)):
+        player.time_scale = scale; player.sim_accum = 0.0
+        assert run(viewer, bench, player, 60, viewer.SIM_DT) == expected
+    player.reloader.stop()